@@ -0,0 +1,240 @@
+# answer_cache.py
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from retrieval import tokenize
+
+PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_question(question):
+    """Lowercase, strip punctuation and collapse whitespace"""
+    return " ".join(PUNCTUATION_RE.sub(" ", question.lower()).split())
+
+
+def context_fingerprint(text_chunks, images=()):
+    """
+    Hash of the retrieved context; changes whenever the passages (or the
+    ImageStore keys of the pictures) sent to the LLM change
+    """
+    digest = hashlib.sha256()
+    for chunk in text_chunks:
+        digest.update(chunk.encode("utf-8"))
+        digest.update(b"\0")
+    for key in images:
+        digest.update(b"\1")
+        digest.update(key.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def context_passages(text_chunks, images=()):
+    """
+    Digests of the retrieved passages (and picture keys) one by one, so two
+    contexts can be compared by overlap when their fingerprints differ
+    """
+    digests = {hashlib.sha256(chunk.encode("utf-8")).hexdigest()[:16] for chunk in text_chunks}
+    return frozenset(digests.union(images))
+
+
+def _unindex(index, value, key):
+    keys = index.get(value)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del index[value]
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    created: float
+    latency: float  # seconds the original LLM call took
+    tokens: frozenset
+    passages: frozenset = frozenset()  # context_passages() of the context it answered
+
+
+class AnswerCache:
+    """
+    LRU + TTL cache of LLM answers keyed on (normalized question, context
+    fingerprint), with optional SQLite persistence.
+
+    When similarity_threshold is set, a miss falls back to the cached answer
+    with the highest token-set Jaccard similarity, so trivially rephrased
+    questions reuse an answer. A rephrased question often retrieves a slightly
+    different context, so candidates are the entries for the same context
+    plus, when the caller passes the context's passages, entries whose
+    passages overlap them by at least context_overlap (Jaccard).
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600.0, db_path=None, similarity_threshold=None,
+                 context_overlap=0.5):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.context_overlap = context_overlap
+        self._entries = OrderedDict()
+        self._by_fingerprint = {}
+        self._by_passage = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.latency_saved = 0.0
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "question TEXT, fingerprint TEXT, answer TEXT, created REAL, latency REAL, "
+                "passages TEXT DEFAULT '', PRIMARY KEY (question, fingerprint))"
+            )
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(answers)")]
+            if "passages" not in columns:
+                self._db.execute("ALTER TABLE answers ADD COLUMN passages TEXT DEFAULT ''")
+            self._db.commit()
+            self._load()
+
+    def _load(self):
+        rows = self._db.execute(
+            "SELECT question, fingerprint, answer, created, latency, passages FROM answers "
+            "WHERE created >= ? ORDER BY created DESC LIMIT ?",
+            (time.time() - self.ttl, self.max_entries),
+        ).fetchall()
+        for question, fingerprint, answer, created, latency, passages in reversed(rows):
+            self._store((question, fingerprint), CachedAnswer(answer, created, latency, frozenset(tokenize(question)),
+                                                              frozenset((passages or "").split())))
+        self._db.execute("DELETE FROM answers WHERE created < ?", (time.time() - self.ttl,))
+        self._db.commit()
+
+    # -- in-memory bookkeeping ---------------------------------------------
+
+    def _store(self, key, entry):
+        replaced = self._entries.pop(key, None)
+        if replaced is not None:
+            for passage in replaced.passages:
+                _unindex(self._by_passage, passage, key)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        self._by_fingerprint.setdefault(key[1], set()).add(key)
+        for passage in entry.passages:
+            self._by_passage.setdefault(passage, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        _unindex(self._by_fingerprint, key[1], key)
+        for passage in entry.passages:
+            _unindex(self._by_passage, passage, key)
+        if self._db is not None:
+            self._db.execute("DELETE FROM answers WHERE question = ? AND fingerprint = ?", key)
+            self._db.commit()
+
+    def _fresh(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry.created > self.ttl:
+            self._remove(key)
+            return None
+        return entry
+
+    def _nearest(self, tokens, fingerprint, passages, now):
+        candidates = set(self._by_fingerprint.get(fingerprint, ()))
+        for passage in passages:
+            candidates.update(self._by_passage.get(passage, ()))
+        best_key, best_score = None, 0.0
+        for key in candidates:
+            entry = self._fresh(key, now)
+            if entry is None or not tokens or not entry.tokens:
+                continue
+            if key[1] != fingerprint and \
+                    len(passages & entry.passages) / len(passages | entry.passages) < self.context_overlap:
+                continue
+            score = len(tokens & entry.tokens) / len(tokens | entry.tokens)
+            if score > best_score:
+                best_key, best_score = key, score
+        if best_key is not None and best_score >= self.similarity_threshold:
+            return best_key
+        return None
+
+    # -- public API ----------------------------------------------------------
+
+    def get(self, question, fingerprint, passages=frozenset()):
+        """
+        Return the cached answer for a question and context, or None.
+        `passages` (see context_passages) lets a near-duplicate question match
+        an answer given for an overlapping context.
+        """
+        key = (normalize_question(question), fingerprint)
+        now = time.time()
+        with self._lock:
+            entry = self._fresh(key, now)
+            if entry is None and self.similarity_threshold is not None:
+                near_key = self._nearest(frozenset(tokenize(question)), fingerprint, frozenset(passages), now)
+                if near_key is not None:
+                    key, entry = near_key, self._entries[near_key]
+                    self.near_hits += 1
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.latency_saved += entry.latency
+            return entry.answer
+
+    def get_stale(self, question):
+        """
+        The newest cached answer to a question for any context and regardless
+        of age, or None: the fallback when the LLM cannot be reached
+        """
+        normalized = normalize_question(question)
+        with self._lock:
+            entries = [entry for (q, _), entry in self._entries.items() if q == normalized]
+            if not entries:
+                return None
+            self.stale_hits += 1
+            return max(entries, key=lambda entry: entry.created).answer
+
+    def put(self, question, fingerprint, answer, latency=0.0, passages=frozenset()):
+        """Cache an answer together with how long it took to produce"""
+        normalized = normalize_question(question)
+        entry = CachedAnswer(answer, time.time(), latency, frozenset(tokenize(question)), frozenset(passages))
+        with self._lock:
+            self._store((normalized, fingerprint), entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?)",
+                    (normalized, fingerprint, answer, entry.created, latency, " ".join(sorted(entry.passages))),
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_fingerprint.clear()
+            self._by_passage.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM answers")
+                self._db.commit()
+
+    def stats(self):
+        """Hit/miss counters and the LLM latency avoided by cache hits"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "near_duplicate_hits": self.near_hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "latency_saved_seconds": round(self.latency_saved, 3),
+            }
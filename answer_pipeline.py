@@ -0,0 +1,180 @@
+# answer_pipeline.py
+
+import asyncio
+import copy
+import logging
+import time
+from dataclasses import dataclass, field
+
+from knowledge_base import format_passages, passage_label
+from retrieval import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StageResult:
+    """
+    What a stage found for a question.
+
+    `context` holds prompt text chunks for the LLM; `answer` is a final answer
+    that needs no LLM call. A stage that is not `confident` lets the pipeline
+    fall through to the next one. `images` are ImageStore keys of pictures
+    that go with the context.
+    """
+    confident: bool
+    context: list = field(default_factory=list)
+    answer: str = None
+    sources: list = field(default_factory=list)
+    images: list = field(default_factory=list)
+
+
+@dataclass
+class PipelineOutcome:
+    source: str
+    result: StageResult
+    timings: dict  # stage name -> milliseconds, for every stage that finished
+
+
+class Stage:
+    """One source of answers. Subclasses set `name` and implement run()."""
+
+    name = "stage"
+
+    def __init__(self, budget=None):
+        self.budget = budget  # seconds; None means no per-stage limit
+
+    async def run(self, question, run_blocking):
+        raise NotImplementedError
+
+
+class AnswerPipeline:
+    """
+    Runs stages tier by tier. Stages within a tier run concurrently and are
+    ranked by their order in the tier; the first confident stage in that order
+    wins, and the remaining stages are cancelled without being awaited. A stage
+    that exceeds its budget or raises counts as not confident.
+    """
+
+    def __init__(self, tiers, run_blocking):
+        self.tiers = tiers
+        self.run_blocking = run_blocking
+
+    async def _timed(self, stage, question, timings):
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(stage.run(question, self.run_blocking), stage.budget)
+        except asyncio.TimeoutError:
+            logger.warning("Stage %s exceeded its %gs budget", stage.name, stage.budget)
+            result = None
+        except Exception as e:
+            logger.warning("Stage %s failed: %s", stage.name, e)
+            result = None
+        # Cancelled stages propagate CancelledError above and get no timing
+        timings[stage.name] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    def with_knowledge_base(self, knowledge_base):
+        """A copy of the pipeline whose DocumentStages search `knowledge_base` (such as a SearchBatch)"""
+        tiers = [[copy.copy(stage) for stage in tier] for tier in self.tiers]
+        for tier in tiers:
+            for stage in tier:
+                if isinstance(stage, DocumentStage):
+                    stage.knowledge_base = knowledge_base
+        return AnswerPipeline(tiers, self.run_blocking)
+
+    async def run(self, question):
+        """Return the PipelineOutcome of the winning stage, or None if no stage was confident"""
+        timings = {}
+        for tier in self.tiers:
+            tasks = [asyncio.ensure_future(self._timed(stage, question, timings)) for stage in tier]
+            try:
+                for stage, task in zip(tier, tasks):
+                    result = await task
+                    if result is not None and result.confident:
+                        return PipelineOutcome(stage.name, result, timings)
+            finally:
+                for task in tasks:
+                    if not task.done():
+                        task.cancel()
+        return None
+
+
+class DocumentStage(Stage):
+    """
+    Local documents; confident when a retrieved passage covers enough of the
+    question. Pictures tied to the retrieved passages come along, up to
+    `max_images`.
+    """
+
+    name = "Document"
+
+    def __init__(self, knowledge_base, top_k=5, min_coverage=0.5, budget=None, max_images=3):
+        super().__init__(budget)
+        self.knowledge_base = knowledge_base
+        self.top_k = top_k
+        self.min_coverage = min_coverage
+        self.max_images = max_images
+
+    async def run(self, question, run_blocking):
+        results = await run_blocking(self.knowledge_base.search, question, k=self.top_k)
+        terms = set(tokenize(question))
+        coverage = 0.0
+        if terms:
+            coverage = max((len(terms & set(tokenize(p.text))) / len(terms) for p, _ in results), default=0.0)
+        return StageResult(
+            confident=coverage >= self.min_coverage,
+            context=format_passages(results),
+            sources=list(dict.fromkeys(passage_label(p) for p, _ in results)),
+            images=self.knowledge_base.passage_images(results, self.max_images) if self.max_images else [],
+        )
+
+
+class BusinessCentralStage(Stage):
+    """Microsoft Learn page for the Business Central topic the question routes to"""
+
+    name = "Business Central"
+
+    def __init__(self, router, docs, fetch, budget=None):
+        super().__init__(budget)
+        self.router = router
+        self.docs = docs
+        self.fetch = fetch
+
+    async def run(self, question, run_blocking):
+        topic, _ = self.router.route(question)
+        if topic is None:
+            return StageResult(confident=False)
+        url = self.docs[topic]["url"]
+        content = await run_blocking(self.fetch, url)
+        # fetch_microsoft_learn_content returns a short placeholder when the page is unreachable
+        confident = bool(content) and len(content) > 100 and not content.startswith("Microsoft Learn Resource:")
+        return StageResult(confident=confident, context=[content], sources=[url])
+
+
+class TrustedSourcesStage(Stage):
+    """A link to the most relevant Microsoft Learn resource, without an LLM call"""
+
+    name = "Trusted Sources"
+
+    def __init__(self, router, resources, budget=None):
+        super().__init__(budget)
+        self.router = router
+        self.resources = resources
+
+    async def run(self, question, run_blocking):
+        topic, _ = self.router.route(question)
+        if topic is None:
+            return StageResult(confident=False)
+        link = self.resources[topic]
+        return StageResult(confident=True, answer=f"Here's a relevant Microsoft Learn resource: {link}",
+                           sources=[link])
+
+
+class GeminiStage(Stage):
+    """Gemini without retrieved context; always confident"""
+
+    name = "Gemini"
+
+    async def run(self, question, run_blocking):
+        return StageResult(confident=True)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Cold vs warm /ask/ latency as the Documents folder grows.
+
+Builds synthetic DOCX corpora of increasing size, points the document stage at each
+one and times the first request (cold: nothing cached) against the following
+requests (warm: served from CorpusStore). Gemini is replaced by a stub so
+only document handling is measured.
+
+Usage: python benchmarks/bench_corpus.py [sizes...]   (default: 4 40 400 2000)
+"""
+
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.synthetic import write_corpus
+from corpus_store import CorpusStore
+from knowledge_base import KnowledgeBase
+
+
+def make_corpus(folder, count, seed=0):
+    """Write `count` small DOCX files with paragraphs and a table"""
+    write_corpus(folder, count, seed=seed, kinds=("docx",))
+
+
+def time_request(client):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        response = client.post("/ask/", data={"question": "What is the delivery note header?"})
+    elapsed = time.perf_counter() - start
+    response.raise_for_status()
+    return elapsed
+
+
+async def stub_llm(query, text_chunks, images):
+    return "stub answer"
+
+
+def run(sizes, warm_requests=20):
+    main.query_gemini_async = stub_llm
+    client = TestClient(main.app)
+
+    print(f"{'files':>8} {'cold ms':>10} {'warm p50 ms':>12} {'warm max ms':>12}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as root:
+            folder = os.path.join(root, "Documents")
+            os.makedirs(folder)
+            make_corpus(folder, size)
+
+            # refresh_interval=0 rescans the folder on every request (worst case)
+            corpus = CorpusStore(folder, cache_dir=os.path.join(root, "cache"), refresh_interval=0)
+            main.answer_pipeline.tiers[0][0].knowledge_base = KnowledgeBase(
+                corpus, embedding_cache_dir=os.path.join(root, "embeddings"))
+            cold = time_request(client)
+            warm = [time_request(client) for _ in range(warm_requests)]
+
+            print(f"{size:>8} {cold * 1000:>10.1f} {statistics.median(warm) * 1000:>12.2f} "
+                  f"{max(warm) * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [4, 40, 400, 2000]
+    run(sizes)
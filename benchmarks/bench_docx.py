@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+DOCX extraction time: the direct XML reader against python-docx.
+
+Times document_parser.parse_docx_xml and parse_docx_python on every DOCX
+file in a folder (by default Documents/), taking the median of several runs
+per file, and reports how much text each produced.
+
+Usage: python benchmarks/bench_docx.py [folder] [repeats]   (default: Documents 20)
+"""
+
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from document_parser import parse_docx_python, parse_docx_xml
+
+
+def median_seconds(parse, path, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        text = parse(path)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), text
+
+
+def run(folder, repeats):
+    paths = sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.endswith(".docx"))
+    totals = {"python-docx": 0.0, "xml": 0.0}
+    for path in paths:
+        python_seconds, python_text = median_seconds(parse_docx_python, path, repeats)
+        xml_seconds, xml_text = median_seconds(parse_docx_xml, path, repeats)
+        totals["python-docx"] += python_seconds
+        totals["xml"] += xml_seconds
+        print(f"{os.path.basename(path)}  ({os.path.getsize(path) / 1e3:.0f} kB)")
+        print(f"  python-docx {python_seconds * 1000:7.2f} ms  {len(python_text):6d} chars")
+        print(f"  xml         {xml_seconds * 1000:7.2f} ms  {len(xml_text):6d} chars  "
+              f"{python_seconds / xml_seconds:5.1f}x faster")
+    if paths:
+        print(f"Total over {len(paths)} files: python-docx {totals['python-docx'] * 1000:.2f} ms, "
+              f"xml {totals['xml'] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, "Documents"),
+        int(sys.argv[2]) if len(sys.argv) > 2 else 20)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Ingestion throughput in files/s and MB/s, serial vs the process pool.
+
+Writes a mixed synthetic corpus (DOCX, PDF and TXT), parses it once with
+parse_file in a loop and once with ingestion.ingest, and checks both
+produce the same text.
+
+Usage: python benchmarks/bench_ingestion.py [files] [workers]   (default: 300, cpu count)
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import write_corpus
+from document_parser import parse_file
+from ingestion import ingest
+
+
+def report(label, seconds, count, size):
+    print(f"  {label:<10} {seconds:6.2f} s  {count / seconds:7.1f} files/s  "
+          f"{size / seconds / 1e6:6.2f} MB/s")
+
+
+def run(count, workers=None):
+    with tempfile.TemporaryDirectory() as folder:
+        paths = write_corpus(folder, count, kinds=("docx", "pdf", "txt"))
+        size = sum(os.path.getsize(path) for path in paths)
+        print(f"Files: {count}  total: {size / 1e6:.1f} MB  workers: {workers or os.cpu_count()}")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            serial = {path: parse_file(path) for path in paths}
+            serial_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            parallel = {result.path: result.text for result in ingest(paths, max_workers=workers)}
+            parallel_seconds = time.perf_counter() - start
+
+        assert parallel == serial, "parallel ingestion produced different text"
+        report("serial", serial_seconds, count, size)
+        report("parallel", parallel_seconds, count, size)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+        int(sys.argv[2]) if len(sys.argv) > 2 else None)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Peak RSS of PDF text extraction as the document grows.
+
+Writes scanned-manual-like PDFs (one full-page image plus a few lines of text
+per page) of increasing page counts and extracts each one in a fresh
+subprocess, once by reading the whole file into PdfReader and once with
+document_parser.iter_pdf_pages. Peak RSS is the subprocess's ru_maxrss;
+peak private memory samples RssAnon, which leaves out the mapped file pages
+that are only page cache and can be reclaimed by the kernel at any time.
+
+Usage: python benchmarks/bench_pdf_memory.py [pages...]   (default: 50 200 800 2000)
+(Linux only: reads /proc/self/status)
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import write_pdf
+
+MEASURE = """
+import resource, sys, threading, time
+sys.path.insert(0, {root!r})
+mode, path = sys.argv[1:]
+peak_private = [0]
+
+def sample():
+    while True:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("RssAnon:"):
+                    peak_private[0] = max(peak_private[0], int(line.split()[1]))
+        time.sleep(0.001)
+
+threading.Thread(target=sample, daemon=True).start()
+start = time.perf_counter()
+if mode == "whole":
+    from PyPDF2 import PdfReader
+    pages = [page.extract_text() for page in PdfReader(path).pages]
+else:
+    from document_parser import iter_pdf_pages
+    pages = [text for _, text in iter_pdf_pages(path)]
+seconds = time.perf_counter() - start
+print(len(pages), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, peak_private[0], seconds)
+"""
+
+
+def measure(mode, path):
+    output = subprocess.run([sys.executable, "-c", MEASURE.format(root=ROOT), mode, path],
+                            check=True, capture_output=True, text=True).stdout.split()
+    return int(output[0]), int(output[1]) / 1024, int(output[2]) / 1024, float(output[3])
+
+
+def run(page_counts, image_bytes=256 * 1024):
+    with tempfile.TemporaryDirectory() as folder:
+        for count in page_counts:
+            path = os.path.join(folder, f"manual_{count}.pdf")
+            write_pdf(path, [[f"Page {n} of the manual", "Reason codes are mandatory"]
+                             for n in range(1, count + 1)], image_bytes=image_bytes)
+            size = os.path.getsize(path) / 1e6
+            for mode in ("whole", "streaming"):
+                pages, rss, private, seconds = measure(mode, path)
+                print(f"  {count:5d} pages  {size:7.1f} MB  {mode:<9}  peak RSS {rss:7.1f} MB  "
+                      f"private {private:7.1f} MB  {seconds:6.2f} s")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or [50, 200, 800, 2000])
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+BM25 and embedding index build time and per-query search latency.
+
+Usage: python benchmarks/bench_retrieval.py [passages]   (default: 10000)
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embeddings import EmbeddingIndex
+from retrieval import BM25Index, Passage
+
+QUERIES = [
+    "Functional Responsible for Delivery Note Header- AVA",
+    "reason code and reason field mandatory",
+    "how do I post a purchase invoice",
+    "warehouse bin put-away setup",
+    "What is the definition of Business Central",
+]
+
+
+def make_passages(count, seed=0):
+    rng = random.Random(seed)
+    # Zipf-like vocabulary so a few terms are very common, like real text
+    vocab = [f"term{i}" for i in range(20000)]
+    vocab[:20] = ("delivery note header reason code mandatory invoice purchase "
+                  "warehouse bin setup business central functional responsible "
+                  "posting vendor customer item").split()
+    weights = [1.0 / (rank + 1) for rank in range(len(vocab))]
+    return [
+        Passage("synthetic", i, " ".join(rng.choices(vocab, weights, k=120)))
+        for i in range(count)
+    ]
+
+
+def report(search, repeats):
+    for query in QUERIES:
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            search(query, k=5)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f"  p50 {statistics.median(timings) * 1e6:7.0f} us  "
+              f"p99 {timings[int(len(timings) * 0.99) - 1] * 1e6:7.0f} us  {query!r}")
+
+
+def run(count, repeats=200):
+    passages = make_passages(count)
+
+    start = time.perf_counter()
+    index = BM25Index(passages)
+    build = time.perf_counter() - start
+    print(f"BM25 passages: {count}  postings: {len(index.doc_ids)}  build: {build * 1000:.0f} ms")
+    report(index.search, repeats)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        embeddings = EmbeddingIndex(cache_dir)
+        start = time.perf_counter()
+        embeddings.sync([("synthetic", passages)])
+        build = time.perf_counter() - start
+        print(f"Embeddings passages: {count}  dim: {embeddings.backend.dim}  build: {build * 1000:.0f} ms")
+        report(embeddings.search, repeats)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Topic routing accuracy and per-query cost on a labelled query set.
+
+Compares the original nested substring loops of query_business_central
+(which fell back to a Gemini round trip when nothing matched) with
+bc_query.bc_router. A null label means "no specific topic" (general overview).
+
+Usage: python benchmarks/bench_topic_router.py
+"""
+
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from bc_query import BC_DOCS, bc_router
+
+LLM_FALLBACK = "<gemini>"
+
+
+def legacy_route(query):
+    """The original keyword loop; returns LLM_FALLBACK where it used to call Gemini"""
+    query_lower = query.lower()
+    best_match = None
+    best_score = 0
+    for section, data in BC_DOCS.items():
+        score = 0
+        for keyword in data["keywords"]:
+            if keyword in query_lower:
+                score += 1
+        if score > best_score:
+            best_score = score
+            best_match = section
+    return best_match if best_score else LLM_FALLBACK
+
+
+def router_route(query):
+    return bc_router.route(query)[0]
+
+
+def evaluate(name, route, labelled, repeats=200):
+    correct = llm_calls = 0
+    for item in labelled:
+        topic = route(item["query"])
+        if topic == LLM_FALLBACK:
+            llm_calls += 1
+        elif topic == item["topic"]:
+            correct += 1
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for item in labelled:
+            route(item["query"])
+    per_query = (time.perf_counter() - start) / (repeats * len(labelled))
+
+    print(f"{name:>8}  accuracy {correct}/{len(labelled)} ({correct / len(labelled):.0%})  "
+          f"LLM round trips {llm_calls}  {per_query * 1e6:.1f} us/query (excluding LLM)")
+
+
+def run():
+    with open(os.path.join(ROOT, "benchmarks", "data", "topic_queries.json"), encoding="utf-8") as f:
+        labelled = json.load(f)
+    evaluate("legacy", legacy_route, labelled)
+    evaluate("router", router_route, labelled)
+
+
+if __name__ == "__main__":
+    run()
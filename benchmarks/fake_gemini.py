@@ -0,0 +1,110 @@
+"""A local stand-in for the Gemini API, for tests and benchmarks"""
+
+import asyncio
+import threading
+from collections import deque
+
+import google.ai.generativelanguage as glm
+import grpc
+
+SERVICE = "google.ai.generativelanguage.v1beta.GenerativeService"
+
+
+def make_response(text):
+    return glm.GenerateContentResponse(candidates=[glm.Candidate(
+        content=glm.Content(parts=[glm.Part(text=text)], role="model"),
+        finish_reason=glm.Candidate.FinishReason.STOP,
+    )])
+
+
+class FakeGemini:
+    """
+    gRPC server speaking Gemini's GenerativeService protocol on localhost,
+    run on its own event loop thread. Point an LLMClient at `endpoint`.
+
+    Every call answers `answer` after `delay` seconds (streams send it word
+    by word). fail_next() queues gRPC status codes the next calls fail with,
+    e.g. RESOURCE_EXHAUSTED for a 429 or UNAVAILABLE for a 503.
+    """
+
+    def __init__(self, answer="fake answer", delay=0.0):
+        self.answer = answer
+        self.delay = delay
+        self.endpoint = None
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = []
+        self._failures = deque()
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    def fail_next(self, *codes):
+        self._failures.extend(codes)
+
+    async def _begin(self, request, context):
+        self.calls += 1
+        self.requests.append(request)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self._failures:
+                code = self._failures.popleft()
+                await context.abort(code, f"fake failure: {code.name}")
+        except BaseException:
+            self.in_flight -= 1
+            raise
+
+    async def _generate(self, request, context):
+        await self._begin(request, context)
+        self.in_flight -= 1
+        return make_response(self.answer)
+
+    async def _stream(self, request, context):
+        await self._begin(request, context)
+        try:
+            words = self.answer.split(" ")
+            for i, word in enumerate(words):
+                yield make_response(word if i == len(words) - 1 else word + " ")
+        finally:
+            self.in_flight -= 1
+
+    async def _start_server(self):
+        handler = grpc.method_handlers_generic_handler(SERVICE, {
+            "GenerateContent": grpc.unary_unary_rpc_method_handler(
+                self._generate,
+                request_deserializer=glm.GenerateContentRequest.deserialize,
+                response_serializer=glm.GenerateContentResponse.serialize),
+            "StreamGenerateContent": grpc.unary_stream_rpc_method_handler(
+                self._stream,
+                request_deserializer=glm.GenerateContentRequest.deserialize,
+                response_serializer=glm.GenerateContentResponse.serialize),
+        })
+        self._server = grpc.aio.server()
+        self._server.add_generic_rpc_handlers((handler,))
+        port = self._server.add_insecure_port("127.0.0.1:0")
+        await self._server.start()
+        self.endpoint = f"127.0.0.1:{port}"
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="fake-gemini", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start_server(), self._loop).result(10)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            asyncio.run_coroutine_threadsafe(self._server.stop(None), self._loop).result(10)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(10)
+            self._loop.close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Cold-start import time of the app, measured with `python -X importtime`.
+
+Imports `main` (or --module) in fresh interpreters, without GEMINI_API_KEY
+and with the background crawler and watcher off, and reports the median
+cumulative import time plus the modules that cost the most. It fails when
+the median is over the budget, or when one of the heavy SDKs the app
+imports lazily (LAZY_MODULES) was imported anyway.
+
+Usage: python benchmarks/import_time.py [--module main] [--budget-ms 800] [--runs 5] [--top 15]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Milliseconds `import main` may take on a developer machine; 0.4-0.65 s today
+IMPORT_BUDGET_MS = 800
+
+# Loaded on first use only: each one adds from 50 ms to over half a second to startup
+LAZY_MODULES = ("google.generativeai", "google.ai.generativelanguage", "grpc", "PIL", "bs4", "pandas", "PyPDF2")
+
+PROBE = "import json, sys, {module}; print(json.dumps(sorted(sys.modules)))"
+
+
+def parse_importtime(stderr):
+    """{module: (self us, cumulative us)} from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if not own.strip().isdigit():
+            continue  # the column header
+        modules[name.strip()] = (int(own), int(cumulative))
+    return modules
+
+
+def profile(module="main"):
+    """
+    Import `module` in a fresh interpreter. Returns (cumulative milliseconds,
+    {module: (self us, cumulative us)}, names of every module loaded).
+    """
+    env = dict(os.environ, DOCUMENT_WATCH="0", LEARN_PREFETCH="0", LOG_LEVEL="WARNING")
+    env.pop("GEMINI_API_KEY", None)
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE.format(module=module)],
+                               cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    modules = parse_importtime(completed.stderr)
+    return modules[module][1] / 1000, modules, json.loads(completed.stdout.splitlines()[-1])
+
+
+def run(module="main", budget_ms=IMPORT_BUDGET_MS, runs=5, top=15):
+    """Print the report; returns the problems found (over budget, eager heavy imports)"""
+    results = [profile(module) for _ in range(runs)]
+    times = sorted(milliseconds for milliseconds, _, _ in results)
+    median = statistics.median(times)
+    _, modules, loaded = results[len(results) // 2]
+
+    print(f"import {module}: median {median:.0f} ms over {runs} runs "
+          f"(min {times[0]:.0f}, max {times[-1]:.0f}), budget {budget_ms} ms")
+    print(f"{'module':<56} {'self ms':>8} {'cumulative ms':>14}")
+    for name, (own, cumulative) in sorted(modules.items(), key=lambda item: -item[1][1])[:top]:
+        print(f"{name:<56} {own / 1000:>8.1f} {cumulative / 1000:>14.1f}")
+
+    problems = []
+    if median > budget_ms:
+        problems.append(f"import {module} took {median:.0f} ms, over the {budget_ms} ms budget")
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    if eager:
+        problems.append(f"imported eagerly: {', '.join(eager)}")
+    for problem in problems:
+        print(problem)
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="how many of the slowest modules to list")
+    args = parser.parse_args()
+    return 1 if run(args.module, args.budget_ms, args.runs, args.top) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
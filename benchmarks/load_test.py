@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Concurrent /ask/ throughput with a local stub LLM, before and after the
+non-blocking request path.
+
+Starts the app under uvicorn on a local port and fires CONCURRENCY requests at
+a time. "blocking" mounts a copy of the old handler, which ran retrieval and a
+synchronous LLM call directly on the event loop; "async" is the real /ask/.
+Static file latency is sampled while the questions are in flight to show
+whether the event loop is stalled.
+
+Usage: python benchmarks/load_test.py [requests] [concurrency] [llm_latency_s]
+"""
+
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GEMINI_API_KEY", "load-test")
+
+import httpx
+import uvicorn
+from fastapi import Form
+
+import main
+from answer_cache import AnswerCache
+from knowledge_base import format_passages
+
+QUESTION = "Who is the functional responsible for the delivery note header?"
+
+
+def install_stub_llm(latency):
+    """Replace Gemini with a stub that takes `latency` seconds to answer"""
+
+    def stub_llm(query, text_chunks, images):
+        time.sleep(latency)
+        return f"stub answer using {len(text_chunks)} passages"
+
+    async def stub_llm_async(query, text_chunks, images):
+        await asyncio.sleep(latency)
+        return f"stub answer using {len(text_chunks)} passages"
+
+    @main.app.post("/ask/blocking")
+    async def ask_blocking(question: str = Form(...)):
+        # The request path as it was: everything runs on the event loop
+        results = main.knowledge_base.search(question, k=main.TOP_K_PASSAGES)
+        return {"answer": stub_llm(question, format_passages(results), [])}
+
+    main.query_gemini_async = stub_llm_async
+    # Every request asks the same question; measure the pipeline, not the answer cache
+    main.answer_cache = AnswerCache(max_entries=0)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def fire(base_url, path, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    static_latencies = []
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(path, data={"question": QUESTION})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        async def probe_static():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/styles.css")
+                static_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.05)
+
+        prober = asyncio.ensure_future(probe_static())
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await prober
+
+    return elapsed, latencies, static_latencies
+
+
+def run(total=64, concurrency=16, latency=0.25):
+    install_stub_llm(latency)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    base_url = f"http://127.0.0.1:{port}"
+    print(f"{total} requests, concurrency {concurrency}, stub LLM latency {latency * 1000:.0f} ms")
+    print(f"{'path':>10} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'static p50 ms':>14} {'static max ms':>14}")
+    for name, path in (("blocking", "/ask/blocking"), ("async", "/ask/")):
+        elapsed, latencies, static = asyncio.run(fire(base_url, path, total, concurrency))
+        latencies.sort()
+        print(f"{name:>10} {total / elapsed:>8.1f} {statistics.median(latencies) * 1000:>8.0f} "
+              f"{latencies[int(len(latencies) * 0.99) - 1] * 1000:>8.0f} "
+              f"{statistics.median(static) * 1000:>14.1f} {max(static) * 1000:>14.1f}")
+
+    server.should_exit = True
+    thread.join()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run(int(args[0]) if len(args) > 0 else 64,
+          int(args[1]) if len(args) > 1 else 16,
+          float(args[2]) if len(args) > 2 else 0.25)
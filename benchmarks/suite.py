@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the question-answering path, saving results as JSON so
+runs can be compared across commits.
+
+Groups:
+  parse     parse_documents on synthetic DOCX/PDF corpora of growing size
+  retrieve  KnowledgeBase.search and bc_router.route on the labelled queries,
+            and KnowledgeBase.search_many on a batch of 500 questions
+  html      Learn page text extraction on the saved pages in test_fixtures/learn
+            and a synthetic full-size page, plus fetch_microsoft_learn_content
+  e2e       /ask/ through the FastAPI TestClient against a local fake Gemini
+            server, sequential (p50/p99 latency) and concurrent (throughput),
+            and one POST /ask/batch of 500 questions
+  startup   `import main` in a fresh interpreter (benchmarks/import_time.py
+            breaks it down by module and checks it against a budget)
+
+Every benchmark is called once to warm up, then timed call by call for at
+least --min-time seconds and --min-rounds calls. Network access is never
+needed: Learn pages come from a fake session serving saved HTML.
+
+Usage:
+  python benchmarks/suite.py run [-k SUBSTRING] [--quick] [--output PATH]
+  python benchmarks/suite.py compare BASE.json HEAD.json [--threshold 0.1]
+
+run writes benchmarks/results/<commit>.json by default; compare prints the
+median of each benchmark side by side and exits with status 1 when one got
+slower by more than the threshold.
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import learn_page, write_corpus
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+LEARN_FIXTURES = os.path.join(ROOT, "test_fixtures", "learn")
+TOPIC_QUERIES = os.path.join(ROOT, "benchmarks", "data", "topic_queries.json")
+
+QUESTIONS = [
+    "Who is the functional responsible for the delivery note header?",
+    "Why are the reason code and reason field mandatory?",
+    "How do I count and adjust inventory?",
+    "How do I post a purchase invoice from a vendor?",
+]
+
+BENCHMARKS = []  # (name, group, factory)
+
+
+def benchmark(name, group):
+    """
+    Register a benchmark. The factory is a generator: it sets up, yields
+    (callable, items per call) and cleans up after the timings.
+    """
+    def register(factory):
+        BENCHMARKS.append((name, group, factory))
+        return factory
+    return register
+
+
+# -- timing -------------------------------------------------------------------
+
+def measure(func, min_time=1.0, min_rounds=5, max_rounds=10000):
+    """Seconds per call of func, after one untimed warm-up call"""
+    func()
+    times = []
+    deadline = time.perf_counter() + min_time
+    while len(times) < max_rounds and (len(times) < min_rounds or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(times, items=1):
+    ordered = sorted(times)
+    median = statistics.median(ordered)
+    return {
+        "rounds": len(ordered),
+        "min": ordered[0],
+        "median": median,
+        "mean": statistics.fmean(ordered),
+        "stddev": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        "p99": percentile(ordered, 0.99),
+        "max": ordered[-1],
+        "items_per_call": items,
+        "items_per_second": items / median if median else None,
+    }
+
+
+# -- parse ----------------------------------------------------------------------
+
+def _parse_benchmark(size):
+    @benchmark(f"parse_documents[{size}]", "parse")
+    def parse_corpus():
+        from document_parser import parse_documents
+
+        with tempfile.TemporaryDirectory() as folder:
+            write_corpus(folder, size, kinds=("docx", "pdf"))
+            yield (lambda: parse_documents(folder)), size
+
+
+for _size in (10, 50, 200):
+    _parse_benchmark(_size)
+
+
+# -- retrieve -------------------------------------------------------------------
+
+def indexed_corpus(root, size=400):
+    """A refreshed KnowledgeBase over `size` synthetic text files under `root`"""
+    from corpus_store import CorpusStore
+    from knowledge_base import KnowledgeBase
+
+    folder = os.path.join(root, "Documents")
+    os.makedirs(folder)
+    write_corpus(folder, size, kinds=("txt",))
+    corpus = CorpusStore(folder, cache_dir=os.path.join(root, "cache"), parse_workers=1)
+    knowledge_base = KnowledgeBase(corpus, embedding_cache_dir=os.path.join(root, "embeddings"),
+                                   auto_refresh=False)
+    knowledge_base.refresh()
+    return knowledge_base
+
+
+def batch_questions(count, seed=0):
+    """`count` distinct synthetic questions in the vocabulary of write_corpus"""
+    from benchmarks.synthetic import sentence
+
+    rng = random.Random(seed)
+    return [f"{sentence(rng, 8)} ({n})" for n in range(count)]
+
+
+@benchmark("knowledge_base_search[400 docs]", "retrieve")
+def knowledge_base_search():
+    with tempfile.TemporaryDirectory() as root:
+        knowledge_base = indexed_corpus(root)
+
+        def search():
+            for question in QUESTIONS:
+                knowledge_base.search(question, k=5)
+
+        yield search, len(QUESTIONS)
+
+
+@benchmark("knowledge_base_search_many[400 docs, 500 questions]", "retrieve")
+def knowledge_base_search_many(count=500):
+    """Retrieval for a POST /ask/batch: every question scored in matrix blocks"""
+    with tempfile.TemporaryDirectory() as root:
+        knowledge_base = indexed_corpus(root)
+        questions = batch_questions(count)
+        yield (lambda: knowledge_base.search_many(questions, k=5)), count
+
+
+@benchmark("topic_routing", "retrieve")
+def topic_routing():
+    from bc_query import bc_router
+
+    with open(TOPIC_QUERIES, "r", encoding="utf-8") as f:
+        queries = [item["query"] for item in json.load(f)]
+
+    def route():
+        for query in queries:
+            bc_router.route(query)
+
+    yield route, len(queries)
+
+
+# -- html -----------------------------------------------------------------------
+
+def saved_learn_pages():
+    """{name: HTML bytes}: the saved Learn pages plus a synthetic full-size article"""
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(LEARN_FIXTURES, "*.html"))):
+        with open(path, "rb") as f:
+            pages[os.path.basename(path)] = f.read()
+    pages["synthetic-article.html"] = learn_page(random.Random(0)).encode("utf-8")
+    return pages
+
+
+class SavedPageSession:
+    """Stands in for requests.Session, answering every GET with the same saved page"""
+
+    class Response:
+        status_code = 200
+        headers = {}
+
+        def __init__(self, content):
+            self.content = content
+
+        def raise_for_status(self):
+            pass
+
+    def __init__(self, content):
+        self.content = content
+        self.requests = 0
+
+    def get(self, url, timeout=None, headers=None):
+        self.requests += 1
+        return self.Response(self.content)
+
+
+def _extraction_benchmark(name, html):
+    @benchmark(f"extract_learn_text[{name}]", "html")
+    def extract():
+        from learn_fetcher import extract_learn_text
+
+        yield (lambda: extract_learn_text(html, "https://learn.microsoft.com/en-us/test")), 1
+
+
+for _name, _html in saved_learn_pages().items():
+    _extraction_benchmark(_name, _html)
+
+
+@benchmark("fetch_microsoft_learn_content[cold]", "html")
+def fetch_cold():
+    """Download (from the saved page) + extraction + cache write, the path of a first visit"""
+    import bc_query
+    from learn_fetcher import LearnFetcher
+
+    html = saved_learn_pages()["synthetic-article.html"]
+    original = bc_query.learn_fetcher
+    with tempfile.TemporaryDirectory() as cache_dir:
+        counter = iter(range(10 ** 9))
+
+        def fetch():
+            # A new URL every call, so each one misses the cache
+            bc_query.fetch_microsoft_learn_content(f"https://learn.microsoft.com/en-us/page-{next(counter)}")
+
+        bc_query.learn_fetcher = LearnFetcher(cache_dir, ttl=3600, session=SavedPageSession(html))
+        try:
+            yield fetch, 1
+        finally:
+            bc_query.learn_fetcher = original
+
+
+# -- end to end -------------------------------------------------------------------
+
+class AskApp:
+    """
+    main.app wired for benchmarking: Gemini is a local FakeGemini answering
+    after `llm_latency` seconds, Learn pages come from SavedPageSession and the
+    answer cache is disabled so every request runs the whole pipeline.
+    """
+
+    def __init__(self, llm_latency=0.0):
+        self.llm_latency = llm_latency
+
+    def __enter__(self):
+        from fastapi.testclient import TestClient
+
+        import bc_query
+        import llm_utils
+        import main
+        from answer_cache import AnswerCache
+        from benchmarks.fake_gemini import FakeGemini
+        from learn_fetcher import LearnFetcher
+        from llm_client import LLMClient
+
+        self.fake = FakeGemini(answer="A benchmark answer from the fake Gemini server.",
+                               delay=self.llm_latency).start()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.saved = (llm_utils.llm, main.answer_cache, bc_query.learn_fetcher)
+        llm_utils.llm = LLMClient(endpoint=self.fake.endpoint, max_concurrency=16)
+        main.answer_cache = AnswerCache(max_entries=0)
+        bc_query.learn_fetcher = LearnFetcher(self.cache_dir.name, ttl=3600,
+                                              session=SavedPageSession(saved_learn_pages()["synthetic-article.html"]))
+        self.client = TestClient(main.app).__enter__()
+        self.counter = 0
+        return self
+
+    def ask(self):
+        question = QUESTIONS[self.counter % len(QUESTIONS)]
+        self.counter += 1
+        # The suffix makes every prompt unique, so concurrent requests are not coalesced
+        response = self.client.post("/ask/", data={"question": f"{question} ({self.counter})"})
+        response.raise_for_status()
+
+    def ask_batch(self, questions):
+        response = self.client.post("/ask/batch", json={"questions": questions})
+        response.raise_for_status()
+        return response.text.count("\n")
+
+    def __exit__(self, *exc):
+        import bc_query
+        import llm_utils
+        import main
+
+        self.client.__exit__(*exc)
+        llm_utils.llm, main.answer_cache, bc_query.learn_fetcher = self.saved
+        self.fake.stop()
+        self.cache_dir.cleanup()
+
+
+@benchmark("ask_e2e[sequential]", "e2e")
+def ask_sequential():
+    """Latency of one /ask/ at a time; the fake LLM answers instantly, so this is the app's own overhead"""
+    with AskApp() as app:
+        yield app.ask, 1
+
+
+@benchmark("ask_e2e[concurrency=8, llm=100ms]", "e2e")
+def ask_concurrent(concurrency=8, batch=32):
+    """Throughput of batches of requests, 8 in flight, with a 100 ms LLM"""
+    with AskApp(llm_latency=0.1) as app, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        def fire():
+            for future in [pool.submit(app.ask) for _ in range(batch)]:
+                future.result()
+
+        yield fire, batch
+
+
+@benchmark("ask_batch[500 questions, llm=100ms]", "e2e")
+def ask_batch(count=500):
+    """
+    One POST /ask/batch of 500 questions (50 asked twice) with a 100 ms LLM;
+    asking them one at a time would take at least 45 s in LLM calls alone
+    """
+    # Suffixed like AskApp.ask, so the distinct questions are not coalesced
+    questions = [f"{QUESTIONS[n % len(QUESTIONS)]} ({n})" for n in range(count - 50)]
+    questions += questions[:50]
+    with AskApp(llm_latency=0.1) as app:
+        yield (lambda: app.ask_batch(questions)), count
+
+
+# -- startup --------------------------------------------------------------------
+
+@benchmark("import_main", "startup")
+def import_main():
+    """Wall time of a fresh interpreter importing main, as a cold start on Render does"""
+    from benchmarks.import_time import profile
+
+    yield (lambda: profile("main")), 1
+
+
+# -- running and comparing --------------------------------------------------------
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, dirty
+
+
+def run(selected=None, min_time=1.0, min_rounds=5, output=None):
+    commit, dirty = git_commit()
+    results = {}
+    print(f"{'benchmark':<48} {'rounds':>6} {'median ms':>10} {'p99 ms':>10} {'items/s':>10}")
+    for name, group, factory in BENCHMARKS:
+        if selected and not any(s in name or s == group for s in selected):
+            continue
+        cases = factory()
+        func, items = next(cases)
+        try:
+            stats = summarize(measure(func, min_time, min_rounds), items)
+        finally:
+            cases.close()
+        stats["group"] = group
+        results[name] = stats
+        print(f"{name:<48} {stats['rounds']:>6} {stats['median'] * 1000:>10.2f} {stats['p99'] * 1000:>10.2f} "
+              f"{stats['items_per_second']:>10.1f}")
+
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "benchmarks": results,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{commit or 'unknown'}{'-dirty' if dirty else ''}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    return report
+
+
+def compare(base, head, threshold=0.1):
+    """Print median changes between two result files; returns the names that regressed"""
+    print(f"{base.get('commit')} -> {head.get('commit')}")
+    print(f"{'benchmark':<48} {'base ms':>10} {'head ms':>10} {'change':>8}")
+    regressions = []
+    for name, stats in head["benchmarks"].items():
+        before = base["benchmarks"].get(name)
+        if before is None:
+            print(f"{name:<48} {'-':>10} {stats['median'] * 1000:>10.2f} {'new':>8}")
+            continue
+        change = stats["median"] / before["median"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<48} {before['median'] * 1000:>10.2f} {stats['median'] * 1000:>10.2f} "
+              f"{change * 100:>+7.1f}%{flag}")
+    return regressions
+
+
+def configure_environment():
+    """Settings read when main is imported, so this must run before the e2e benchmarks"""
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    # No background threads or crawls: they would run during the timings
+    os.environ.setdefault("DOCUMENT_WATCH", "0")
+    os.environ.setdefault("LEARN_PREFETCH", "0")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("GRPC_VERBOSITY", "ERROR")
+
+
+def main():
+    configure_environment()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run benchmarks and save the results as JSON")
+    run_parser.add_argument("-k", dest="selected", action="append",
+                            help="only benchmarks whose name contains this (or a group name); repeatable")
+    run_parser.add_argument("--min-time", type=float, default=1.0, help="seconds to time each benchmark")
+    run_parser.add_argument("--min-rounds", type=int, default=5)
+    run_parser.add_argument("--quick", action="store_true", help="shorthand for --min-time 0.2 --min-rounds 3")
+    run_parser.add_argument("--output", help="result file (default: benchmarks/results/<commit>.json)")
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="relative median slowdown counted as a regression (default 0.1)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        if args.quick:
+            args.min_time, args.min_rounds = 0.2, 3
+        run(args.selected, args.min_time, args.min_rounds, args.output)
+        return 0
+    with open(args.base, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.head, "r", encoding="utf-8") as f:
+        head = json.load(f)
+    return 1 if compare(base, head, args.threshold) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
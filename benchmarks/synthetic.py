@@ -0,0 +1,122 @@
+"""Synthetic documents for benchmarks and tests"""
+
+import os
+import random
+
+WORDS = ("delivery note header reason code mandatory inventory item ledger "
+         "posting vendor customer invoice warehouse location approval "
+         "workflow journal setup dimension currency payment").split()
+
+
+def sentence(rng, words=40):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def write_docx(path, rng, paragraphs=8):
+    """A small DOCX with a heading, paragraphs and a 3x2 table"""
+    import docx
+
+    doc = docx.Document()
+    doc.add_heading(os.path.basename(path), level=1)
+    for _ in range(paragraphs):
+        doc.add_paragraph(sentence(rng))
+    table = doc.add_table(rows=3, cols=2)
+    for row in table.rows:
+        for cell in row.cells:
+            cell.text = sentence(rng, 5)
+    doc.save(path)
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages, image_bytes=0):
+    """
+    Write a minimal PDF with a text layer; `pages` is a list of lists of lines.
+    Uses the built-in Helvetica font, so no font embedding is needed. With
+    `image_bytes`, every page also draws an uncompressed grayscale image of
+    about that size, like a scanned manual. Objects are written as they are
+    generated, so large files do not have to fit in memory.
+    """
+    offsets = {}
+    with open(path, "wb") as f:
+        def write_object(number, body):
+            offsets[number] = f.tell()
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        write_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        side = int(image_bytes ** 0.5)
+        kids = []
+        number = 4
+        for page, lines in enumerate(pages):
+            xobjects = b""
+            drawing = ""
+            if side:
+                pixels = bytes((page + i) % 251 for i in range(side)) * side
+                write_object(number, b"<< /Type /XObject /Subtype /Image /Width %d /Height %d "
+                                     b"/ColorSpace /DeviceGray /BitsPerComponent 8 /Length %d >>\n"
+                                     b"stream\n" % (side, side, len(pixels)) + pixels + b"\nendstream")
+                xobjects = b" /XObject << /Im1 %d 0 R >>" % number
+                drawing = "q 595 0 0 842 0 0 cm /Im1 Do Q "
+                number += 1
+            stream = (drawing + "BT /F1 10 Tf 50 800 Td 12 TL " + " ".join(
+                f"({_pdf_escape(line)}) Tj T*" for line in lines) + " ET").encode("latin-1", "replace")
+            write_object(number, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+            write_object(number + 1, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                                     b"/Resources << /Font << /F1 3 0 R >>%s >> /Contents %d 0 R >>"
+                                     % (xobjects, number))
+            kids.append(b"%d 0 R" % (number + 1))
+            number += 2
+        write_object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids)))
+
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % number)
+        for n in range(1, number):
+            f.write(b"%010d 00000 n \n" % offsets[n])
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (number, xref))
+
+
+def write_corpus(folder, count, seed=0, kinds=("docx",)):
+    """Write `count` files cycling through `kinds` (docx, pdf, txt); returns their paths"""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        kind = kinds[i % len(kinds)]
+        path = os.path.join(folder, f"note_{i:05d}.{kind}")
+        if kind == "docx":
+            write_docx(path, rng)
+        elif kind == "pdf":
+            write_pdf(path, [[sentence(rng, 12) for _ in range(40)] for _ in range(3)])
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n\n".join(sentence(rng) for _ in range(20)))
+        paths.append(path)
+    return paths
+
+
+def learn_page(rng, sections=30, nav_links=400):
+    """
+    HTML shaped like a Microsoft Learn article: header, a long navigation
+    tree, inline scripts, the article in <main> and a footer. About 90 KB
+    with the defaults, close to a real Business Central page.
+    """
+    nav = "".join(f'<li><a href="/en-us/dynamics365/business-central/page-{i}">{sentence(rng, 4)}</a></li>'
+                  for i in range(nav_links))
+    article = []
+    for i in range(sections):
+        article.append(f'<h2 id="section-{i}">{sentence(rng, 5)}</h2>')
+        article.extend(f"<p>{sentence(rng, 45)}</p>" for _ in range(3))
+        article.append("<ul>" + "".join(f"<li>{sentence(rng, 14)}</li>" for _ in range(4)) + "</ul>")
+    return (
+        '<!DOCTYPE html><html lang="en-us"><head><meta charset="utf-8" />'
+        "<title>Synthetic article - Business Central | Microsoft Learn</title>"
+        f"<script>var msDocs = {{ data: \"{'x' * 4000}\" }};</script>"
+        '</head><body><div class="header-holder"><nav id="ms--site-header">Learn Documentation</nav></div>'
+        f'<nav class="sidebar"><ul>{nav}</ul></nav>'
+        f'<div class="mainContainer"><main id="main" role="main" class="content">'
+        f'<h1>{sentence(rng, 4)}</h1>{"".join(article)}</main></div>'
+        "<footer>Privacy &amp; Cookies Terms of Use Trademarks</footer></body></html>"
+    )
@@ -0,0 +1,267 @@
+# context_packer.py
+
+import hashlib
+import logging
+import math
+import re
+import statistics
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import numpy as np
+
+from retrieval import tokenize
+
+TOKEN_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+SENTENCE_RE = re.compile(r"[^.!?\n]+(?:[.!?]+|\n|$)")
+
+# Roughly how many characters of a word one Gemini token covers
+CHARS_PER_TOKEN = 4
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=65536)
+def estimate_tokens(text):
+    """
+    Local approximation of Gemini's token count: every punctuation mark is a
+    token and a word costs one token per CHARS_PER_TOKEN characters, which
+    is the ratio Google documents for Gemini on English text.
+    """
+    return sum(math.ceil(len(piece) / CHARS_PER_TOKEN) for piece in TOKEN_PIECE_RE.findall(text))
+
+
+class GeminiTokenCounter:
+    """
+    Exact counts from Gemini's count_tokens API, cached by text hash since
+    each count is a network round trip. Falls back to estimate_tokens when
+    the API is unavailable.
+    """
+
+    def __init__(self, model_name, max_entries=10000):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._model = None
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, text):
+        key = hashlib.sha256(text.encode("utf-8")).digest()
+        with self._lock:
+            if key in self._counts:
+                self._counts.move_to_end(key)
+                return self._counts[key]
+        try:
+            if self._model is None:
+                import google.generativeai as genai
+                self._model = genai.GenerativeModel(self.model_name)
+            count = self._model.count_tokens(text).total_tokens
+        except Exception as e:
+            logger.warning("count_tokens failed, using the local estimate: %s", e)
+            return estimate_tokens(text)
+        with self._lock:
+            self._counts[key] = count
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return count
+
+
+# MinHash: one universal hash family (a * x + b) mod p over 32-bit shingle hashes
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _shingles(text, size=3):
+    words = tokenize(text)
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures of word 3-shingles; the share of equal slots estimates Jaccard similarity"""
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = np.random.RandomState(seed)
+        # 31-bit coefficients times 32-bit shingle hashes stay below 2**64: no uint64 overflow
+        self.a = rng.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+
+    def signature(self, text):
+        shingles = _shingles(text)
+        if not shingles:
+            return None
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+             for s in shingles),
+            dtype=np.uint64, count=len(shingles),
+        )
+        permuted = (np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+    @staticmethod
+    def similarity(first, second):
+        return float(np.mean(first == second))
+
+
+def split_label(text):
+    """Split a "[source]\ntext" chunk into its label line and body; the label is "" when absent"""
+    if text.startswith("[") and "\n" in text:
+        label, body = text.split("\n", 1)
+        if label.endswith("]"):
+            return label, body
+    return "", text
+
+
+def compress_passage(question, text, max_tokens, count_tokens=estimate_tokens):
+    """
+    Shorten a passage to at most `max_tokens` by keeping the sentences that
+    share the most terms with the question, in their original order. The
+    first line (usually a "[source]" label) is always kept.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    label, body = split_label(text)
+    budget = max_tokens - (count_tokens(label) if label else 0)
+    terms = set(tokenize(question))
+    sentences = [m.group(0) for m in SENTENCE_RE.finditer(body) if m.group(0).strip()]
+    ranked = sorted(range(len(sentences)),
+                    key=lambda i: (-len(terms & set(tokenize(sentences[i]))), i))
+    keep = set()
+    used = 0
+    for i in ranked:
+        cost = count_tokens(sentences[i])
+        if used + cost <= budget:
+            keep.add(i)
+            used += cost
+    compressed = " ".join(sentences[i].strip() for i in sorted(keep))
+    return f"{label}\n{compressed}" if label else compressed
+
+
+@dataclass
+class PackedContext:
+    chunks: list
+    tokens: int
+    budget: int
+    candidates: int
+    duplicates: int = 0
+    compressed: int = 0
+    skipped: int = 0  # chunks that did not fit even compressed
+
+    def summary(self):
+        return {
+            "tokens": self.tokens,
+            "budget": self.budget,
+            "passages": len(self.chunks),
+            "candidates": self.candidates,
+            "duplicates": self.duplicates,
+            "compressed": self.compressed,
+            "skipped": self.skipped,
+        }
+
+
+class ContextPacker:
+    """
+    Fits retrieved context into a prompt token budget.
+
+    Chunks are taken best first (by `scores`, or in the order given, which
+    is rank order for every answer stage). Near-duplicates of a chunk
+    already taken (MinHash Jaccard estimate >= `duplicate_threshold`) are
+    dropped, chunks over `max_chunk_tokens` are compressed, and a chunk that
+    no longer fits the remaining budget is compressed to fit when at least
+    `min_chunk_tokens` remain, otherwise skipped in favour of smaller ones.
+    """
+
+    def __init__(self, budget=3000, max_chunk_tokens=800, min_chunk_tokens=60,
+                 duplicate_threshold=0.8, count_tokens=estimate_tokens):
+        self.budget = budget
+        self.max_chunk_tokens = max_chunk_tokens
+        self.min_chunk_tokens = min_chunk_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.count_tokens = count_tokens
+        self.minhash = MinHasher()
+
+    def pack(self, question, chunks, scores=None):
+        order = range(len(chunks))
+        if scores is not None:
+            order = sorted(order, key=lambda i: -scores[i])
+        packed = PackedContext([], self.count_tokens(question), self.budget, len(chunks))
+        signatures = []
+        for i in order:
+            chunk = chunks[i]
+            # Compare bodies only, so the same text filed under two names is still a duplicate
+            signature = self.minhash.signature(split_label(chunk)[1])
+            if signature is not None and any(
+                    MinHasher.similarity(signature, seen) >= self.duplicate_threshold for seen in signatures):
+                packed.duplicates += 1
+                continue
+
+            remaining = self.budget - packed.tokens
+            limit = min(self.max_chunk_tokens, remaining)
+            tokens = self.count_tokens(chunk)
+            if tokens > limit:
+                if limit < self.min_chunk_tokens:
+                    packed.skipped += 1
+                    continue
+                chunk = compress_passage(question, chunk, limit, self.count_tokens)
+                tokens = self.count_tokens(chunk)
+                if not split_label(chunk)[1].strip() or tokens > limit:
+                    packed.skipped += 1
+                    continue
+                packed.compressed += 1
+
+            packed.chunks.append(chunk)
+            packed.tokens += tokens
+            if signature is not None:
+                signatures.append(signature)
+        return packed
+
+
+@dataclass
+class PromptRecord:
+    tokens: int
+    passages: int
+    latency: float  # seconds the LLM call took
+    extra: dict = field(default_factory=dict)
+
+
+class PromptMetrics:
+    """Prompt size and LLM latency of the most recent requests, for tuning the token budget"""
+
+    def __init__(self, window=500):
+        self._records = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.total_requests = 0
+        self.total_tokens = 0
+
+    def record(self, packed, latency):
+        with self._lock:
+            self._records.append(PromptRecord(packed.tokens, len(packed.chunks), latency, packed.summary()))
+            self.total_requests += 1
+            self.total_tokens += packed.tokens
+
+    def stats(self):
+        with self._lock:
+            records = list(self._records)
+            summary = {"requests": self.total_requests, "prompt_tokens_total": self.total_tokens,
+                       "window": len(records)}
+        if not records:
+            return summary
+        tokens = sorted(r.tokens for r in records)
+        latencies = sorted(r.latency for r in records)
+        summary.update({
+            "prompt_tokens_p50": statistics.median(tokens),
+            "prompt_tokens_p95": tokens[min(len(tokens) - 1, int(len(tokens) * 0.95))],
+            "prompt_tokens_max": tokens[-1],
+            "latency_p50_ms": round(statistics.median(latencies) * 1000, 1),
+            "latency_p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+            "duplicates_dropped": sum(r.extra.get("duplicates", 0) for r in records),
+            "passages_compressed": sum(r.extra.get("compressed", 0) for r in records),
+        })
+        # Milliseconds of LLM latency per 1000 prompt tokens, from a least-squares fit
+        if len(records) >= 2 and len(set(tokens)) > 1:
+            slope = np.polyfit([r.tokens for r in records], [r.latency for r in records], 1)[0]
+            summary["latency_ms_per_1k_tokens"] = round(float(slope) * 1e6, 1)
+        return summary
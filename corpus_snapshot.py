@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Build-time corpus snapshot: the documents, their passages, the BM25 postings
+and the passage embeddings in one versioned file, so the server maps it in
+milliseconds instead of parsing and indexing at startup.
+
+Layout: 8-byte magic, format version and header length (two little-endian
+uint32), a JSON header, then 64-byte aligned sections of raw arrays. The
+header lists the documents and, for every section, its offset (from the
+start of the section data), dtype and shape. Passage text is one contiguous
+UTF-8 buffer with an int64 offsets array; `PassageView`s decode a passage
+only when its text is read.
+
+The file is opened with a read-only shared mmap, so several workers on one
+machine share its pages through the OS page cache.
+
+Usage:
+  python corpus_snapshot.py build [--documents Documents] [--learn] [--output PATH]
+  python corpus_snapshot.py info [PATH]
+
+build runs in render.yaml's buildCommand; --learn also crawls the Microsoft
+Learn catalog and indexes it with the documents.
+"""
+
+import argparse
+import asyncio
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from corpus_store import CorpusDocument, CorpusStore
+from document_parser import is_paged
+from image_store import ImageStore
+from knowledge_base import CORPUS, KnowledgeBase
+from retrieval import BM25Index
+
+MAGIC = b"DPSNAPSH"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<8sII")
+
+# Where the build writes the snapshot and the server looks for it
+DEFAULT_PATH = os.getenv("CORPUS_SNAPSHOT", os.path.join(".cache", "corpus.snapshot"))
+
+
+class SnapshotError(ValueError):
+    """The file is missing, truncated, or written by another format version"""
+
+
+class PassageView:
+    """
+    A passage of a snapshot, read from its arrays on access. Compares equal
+    to a Passage with the same fields.
+    """
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    @property
+    def source(self):
+        return self._table.sources[self._table.document[self._row]]
+
+    @property
+    def index(self):
+        return int(self._table.number[self._row])
+
+    @property
+    def text(self):
+        offsets = self._table.offsets
+        return str(self._table.text[offsets[self._row]:offsets[self._row + 1]], "utf-8")
+
+    @property
+    def page(self):
+        page = int(self._table.page[self._row])
+        return page or None
+
+    def _key(self):
+        return (self.source, self.index, self.text, self.page)
+
+    def __eq__(self, other):
+        if not hasattr(other, "text"):
+            return NotImplemented
+        return self._key() == (other.source, other.index, other.text, other.page)
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"PassageView(source={self.source!r}, index={self.index}, page={self.page})"
+
+
+class PassageTable:
+    """
+    The passages of a snapshot (or a contiguous range of them) as a sequence
+    of PassageViews, created on indexing rather than up front.
+    """
+
+    __slots__ = ("text", "offsets", "document", "number", "page", "sources", "start", "stop")
+
+    def __init__(self, text, offsets, document, number, page, sources, start=0, stop=None):
+        self.text = text
+        self.offsets = offsets
+        self.document = document
+        self.number = number
+        self.page = page
+        self.sources = sources
+        self.start = start
+        self.stop = len(document) if stop is None else stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return PassageTable(self.text, self.offsets, self.document, self.number, self.page,
+                                self.sources, self.start + start, self.start + max(start, stop))
+        row = int(item)
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("passage index out of range")
+        return PassageView(self, self.start + row)
+
+    def __iter__(self):
+        for row in range(self.start, self.stop):
+            yield PassageView(self, row)
+
+
+def _align(n):
+    return -(-n // ALIGNMENT) * ALIGNMENT
+
+
+def _utf8_buffer(texts):
+    """Concatenated UTF-8 of `texts` and the int64 offsets of each one's bytes"""
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def write_snapshot(knowledge_base, path=DEFAULT_PATH):
+    """
+    Index the knowledge base's current documents and write them to `path`.
+    The file is replaced atomically, so a server mapping the old one keeps
+    reading it undisturbed. Returns the header written.
+    """
+    index_snapshot = knowledge_base.refresh()
+    index = index_snapshot.index
+    indexed = knowledge_base.indexed
+    documents = [document for _, document, _ in indexed]
+    passage_document = np.empty(len(index), dtype=np.int32)
+    start = 0
+    header_documents = []
+    for i, (origin, document, count) in enumerate(indexed):
+        passage_document[start:start + count] = i
+        header_documents.append({
+            "origin": origin,
+            "path": document.path,
+            "mtime": document.mtime,
+            "size": document.size,
+            "sha256": document.sha256,
+            "passages": [start, count],
+            "images": [list(anchor) for anchor in document.images],
+            "paged": document.paged,
+        })
+        start += count
+    if start != len(index):
+        raise RuntimeError("Indexed documents do not account for every passage")
+
+    passage_text, passage_offsets = _utf8_buffer(p.text for p in index.passages)
+    document_text, document_offsets = _utf8_buffer(d.text for d in documents)
+    terms, _ = _utf8_buffer(["\n".join(index.term_ids)])
+    sections = {
+        "passage_text": passage_text,
+        "passage_offsets": passage_offsets,
+        "passage_document": passage_document,
+        "passage_number": np.fromiter((p.index for p in index.passages), dtype=np.int32, count=len(index)),
+        "passage_page": np.fromiter((p.page or 0 for p in index.passages), dtype=np.int32, count=len(index)),
+        "document_text": document_text,
+        "document_offsets": document_offsets,
+        "terms": terms,
+        "postings_offsets": np.asarray(index.offsets, dtype=np.int64),
+        "postings_doc_ids": np.asarray(index.doc_ids, dtype=np.int32),
+        "postings_weights": np.asarray(index.weights, dtype=np.float32),
+        "vectors": np.ascontiguousarray(index_snapshot.vectors, dtype=np.float32),
+    }
+
+    layout = {}
+    offset = 0
+    for name, array in sections.items():
+        layout[name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset = _align(offset + array.nbytes)
+    header = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "passage_size": knowledge_base.passage_size,
+        "passage_overlap": knowledge_base.passage_overlap,
+        "embedder": knowledge_base.embeddings.backend.name,
+        "k1": index.k1,
+        "b": index.b,
+        "documents": header_documents,
+        "sections": layout,
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _align(_PREAMBLE.size + len(header_bytes))
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in sections.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+    return header
+
+
+class CorpusSnapshot:
+    """
+    A snapshot file mapped into memory. `documents` lists (origin, CorpusDocument,
+    first passage, passage count) in passage order; `passages`, `index` and
+    `vectors` are views over the mapping, so opening copies no passage data.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        start = time.perf_counter()
+        self.path = path
+        try:
+            with open(path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"Cannot map {path}: {e}") from e
+        if len(self._mmap) < _PREAMBLE.size:
+            raise SnapshotError(f"{path} is not a corpus snapshot")
+        magic, version, header_size = _PREAMBLE.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a corpus snapshot")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+        try:
+            self.header = json.loads(self._mmap[_PREAMBLE.size:_PREAMBLE.size + header_size])
+        except ValueError as e:
+            raise SnapshotError(f"{path} has a corrupt header: {e}") from e
+        self._data_start = _align(_PREAMBLE.size + header_size)
+
+        self.created = self.header["created"]
+        self.passage_size = self.header["passage_size"]
+        self.passage_overlap = self.header["passage_overlap"]
+        self.embedder = self.header["embedder"]
+
+        document_text = memoryview(self._mmap)[self._section_range("document_text")]
+        document_offsets = self._array("document_offsets")
+        self.documents = []
+        for i, entry in enumerate(self.header["documents"]):
+            text = str(document_text[document_offsets[i]:document_offsets[i + 1]], "utf-8")
+            document = CorpusDocument(path=entry["path"], mtime=entry["mtime"], size=entry["size"],
+                                      sha256=entry["sha256"], text=text,
+                                      images=tuple(tuple(anchor) for anchor in entry.get("images", ())),
+                                      paged=entry.get("paged", is_paged(entry["path"])))
+            self.documents.append((entry["origin"], document, *entry["passages"]))
+
+        self.passages = PassageTable(
+            memoryview(self._mmap)[self._section_range("passage_text")],
+            self._array("passage_offsets"),
+            self._array("passage_document"),
+            self._array("passage_number"),
+            self._array("passage_page"),
+            [entry["path"] for entry in self.header["documents"]],
+        )
+        terms = str(self._mmap[self._section_range("terms")], "utf-8")
+        self.index = BM25Index.from_arrays(
+            self.passages,
+            {term: tid for tid, term in enumerate(terms.split("\n"))} if terms else {},
+            self._array("postings_offsets"),
+            self._array("postings_doc_ids"),
+            self._array("postings_weights"),
+            k1=self.header["k1"],
+            b=self.header["b"],
+        )
+        self.vectors = self._array("vectors")
+        self.load_seconds = time.perf_counter() - start
+
+    def _section_range(self, name):
+        section = self.header["sections"][name]
+        start = self._data_start + section["offset"]
+        nbytes = int(np.prod(section["shape"])) * np.dtype(section["dtype"]).itemsize
+        if start + nbytes > len(self._mmap):
+            raise SnapshotError(f"{self.path} is truncated")
+        return slice(start, start + nbytes)
+
+    def _array(self, name):
+        section = self.header["sections"][name]
+        dtype = np.dtype(section["dtype"])
+        span = self._section_range(name)
+        count = (span.stop - span.start) // dtype.itemsize
+        if count == 0:
+            return np.empty(section["shape"], dtype=dtype)
+        return np.frombuffer(self._mmap, dtype=dtype, count=count, offset=span.start).reshape(section["shape"])
+
+    def corpus_documents(self):
+        """Documents that came from the documents folder"""
+        return [document for origin, document, _, _ in self.documents if origin == CORPUS]
+
+    def external_documents(self):
+        """{source name: documents} for documents added with set_external_documents()"""
+        external = {}
+        for origin, document, _, _ in self.documents:
+            if origin != CORPUS:
+                external.setdefault(origin, []).append(document)
+        return external
+
+    def info(self):
+        return {
+            "path": self.path,
+            "format_version": FORMAT_VERSION,
+            "created": self.created,
+            "bytes": len(self._mmap),
+            "documents": len(self.documents),
+            "passages": len(self.passages),
+            "images": sum(len(document.images) for _, document, _, _ in self.documents),
+            "terms": len(self.index.term_ids),
+            "embedder": self.embedder,
+            "passage_size": self.passage_size,
+            "passage_overlap": self.passage_overlap,
+            "load_ms": round(self.load_seconds * 1000, 1),
+        }
+
+
+def open_snapshot(path=DEFAULT_PATH):
+    """The snapshot at `path`, or None when there is none"""
+    if not os.path.exists(path):
+        return None
+    return CorpusSnapshot(path)
+
+
+def build(folder, output, learn=False):
+    """Parse and index `folder` (and the Learn catalog with `learn`) into a snapshot at `output`"""
+    start = time.perf_counter()
+    corpus = CorpusStore(folder, image_store=ImageStore())
+    corpus.refresh(force=True)
+    knowledge_base = KnowledgeBase(corpus, auto_refresh=False)
+    if learn:
+        # Imported here: it pulls in the Learn fetcher, which only --learn needs
+        from learn_crawler import LearnCrawler
+
+        crawler = LearnCrawler()
+        asyncio.run(crawler.crawl())
+        knowledge_base.set_external_documents("learn", crawler.documents())
+        print(f"Crawled {len(crawler.pages)}/{len(crawler.urls)} Learn pages")
+    header = write_snapshot(knowledge_base, output)
+    passages = sum(count for _, _, count in knowledge_base.indexed)
+    print(f"Wrote {output}: {len(header['documents'])} documents, {passages} passages, "
+          f"{os.path.getsize(output) / 1024:.0f} KiB in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="parse and index the documents into a snapshot")
+    build_parser.add_argument("--documents", default="Documents", help="documents folder, as the server names it")
+    build_parser.add_argument("--learn", action="store_true", help="also crawl and index the Learn catalog")
+    build_parser.add_argument("--output", default=DEFAULT_PATH)
+    info_parser = commands.add_parser("info", help="describe a snapshot")
+    info_parser.add_argument("path", nargs="?", default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build(args.documents, args.output, learn=args.learn)
+        return 0
+    try:
+        print(json.dumps(CorpusSnapshot(args.path).info(), indent=2))
+    except SnapshotError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
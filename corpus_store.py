@@ -0,0 +1,329 @@
+# corpus_store.py
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from document_parser import is_paged, parse_file
+from ingestion import ingest
+from metrics import record, span
+
+logger = logging.getLogger(__name__)
+
+# Marker returned by CorpusStore._lookup for files whose text is not cached yet
+NEEDS_PARSE = object()
+
+
+@dataclass(frozen=True)
+class CorpusDocument:
+    """Extracted text of one file in the documents folder"""
+    path: str
+    mtime: float
+    size: int
+    sha256: str
+    text: str
+    images: tuple = ()  # (page, offset, ImageStore key) of the pictures in the document
+    paged: bool = False  # text is split into pages with PAGE_BREAK (PDFs)
+
+
+def hash_file(path, block_size=1 << 20):
+    """Return the SHA-256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CorpusStore:
+    """
+    Parses the documents folder once and keeps the extracted text in memory
+    and on disk, keyed by path, mtime, size and content hash.
+
+    refresh() only stats the folder; a file is re-hashed when its mtime or
+    size changed and only re-parsed when its content hash changed, so warm
+    requests do no document I/O at all. When several files need parsing they
+    are fanned out across a process pool (see ingestion.ingest).
+
+    With an `image_store`, the pictures in PDF and DOCX files are extracted
+    while they are parsed and stored there, and each document lists where
+    they sit in its text. The list is cached next to the text.
+    """
+
+    def __init__(self, folder_path="Documents", cache_dir=None, refresh_interval=2.0, parse_workers=None,
+                 image_store=None):
+        self.folder_path = folder_path
+        self.parse_workers = parse_workers
+        self.image_store = image_store
+        self.cache_dir = cache_dir or os.getenv("CORPUS_CACHE_DIR", os.path.join(".cache", "corpus"))
+        self.refresh_interval = refresh_interval
+        self.generation = 0
+        self._documents = {}
+        self._manifest = {}
+        self._last_scan = None
+        self._lock = threading.Lock()
+        self._load_manifest()
+
+    # -- on-disk cache -----------------------------------------------------
+
+    def _manifest_path(self):
+        return os.path.join(self.cache_dir, "manifest.json")
+
+    def _checkpoint_dir(self):
+        return os.path.join(self.cache_dir, "pages")
+
+    def _text_path(self, sha256):
+        return os.path.join(self.cache_dir, "texts", f"{sha256}.txt")
+
+    def _images_path(self, sha256):
+        return os.path.join(self.cache_dir, "texts", f"{sha256}.images.json")
+
+    def _load_manifest(self):
+        try:
+            with open(self._manifest_path(), "r", encoding="utf-8") as f:
+                self._manifest = json.load(f)
+        except (OSError, ValueError):
+            self._manifest = {}
+
+    def _save_manifest(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self._manifest_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp_path, self._manifest_path())
+
+    def _read_cached_text(self, sha256):
+        try:
+            with open(self._text_path(sha256), "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_cached_text(self, sha256, text):
+        path = self._text_path(sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def _read_cached_images(self, sha256):
+        try:
+            with open(self._images_path(sha256), "r", encoding="utf-8") as f:
+                return tuple(tuple(anchor) for anchor in json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def _write_cached_images(self, sha256, images):
+        path = self._images_path(sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(images, f)
+        os.replace(tmp_path, path)
+
+    # -- scanning ----------------------------------------------------------
+
+    def _is_candidate(self, name):
+        # Skip hidden files and Office lock files such as "~$report.docx"
+        return not name.startswith((".", "~$"))
+
+    def scan(self, paths=None):
+        """
+        Return {path: (mtime, size)} for every candidate file in the folder,
+        or only for those of `paths` that still exist.
+        """
+        found = {}
+        if paths is not None:
+            for path in paths:
+                if not self._is_candidate(os.path.basename(path)):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if os.path.isfile(path):
+                    found[path] = (stat.st_mtime, stat.st_size)
+            return found
+        if not os.path.isdir(self.folder_path):
+            return found
+        with os.scandir(self.folder_path) as entries:
+            for entry in entries:
+                if not self._is_candidate(entry.name) or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                found[entry.path] = (stat.st_mtime, stat.st_size)
+        return found
+
+    def _lookup(self, path, mtime, size):
+        """
+        Return (sha256, text, images) for a file without parsing it. text is
+        None for files known to yield no text and NEEDS_PARSE when it must be
+        extracted.
+        """
+        entry = self._manifest.get(path)
+        if entry and entry["mtime"] == mtime and entry["size"] == size:
+            sha256 = entry["sha256"]
+        else:
+            sha256 = hash_file(path)
+
+        if entry and entry["sha256"] == sha256 and entry["parsed"] is False:
+            return sha256, None, ()
+        current = self._documents.get(path)
+        if current is not None and current.sha256 == sha256:
+            # Only the mtime changed (a fresh checkout, say)
+            return sha256, current.text, current.images
+        # Content-addressed, so this also finds the same content under another name
+        text = self._read_cached_text(sha256)
+        if text is None:
+            return sha256, NEEDS_PARSE, ()
+        images = self._read_cached_images(sha256)
+        if images is None and self.image_store is not None and path.endswith((".pdf", ".docx")):
+            # Text cached before pictures were extracted
+            return sha256, NEEDS_PARSE, ()
+        return sha256, text, images or ()
+
+    def _parse_many(self, paths):
+        """Yield (path, text, images) for files that must be parsed, in parallel when there are several"""
+        if len(paths) <= 1 or self.parse_workers == 1:
+            for path in paths:
+                images = self.image_store.collector() if self.image_store is not None else None
+                try:
+                    with span("parse"):
+                        text = parse_file(path, checkpoint_dir=self._checkpoint_dir(), images=images)
+                except Exception as e:
+                    logger.error("Error processing %s: %s", os.path.basename(path), e)
+                    text = None
+                yield path, text, tuple(images or ())
+            return
+        for result in ingest(paths, max_workers=self.parse_workers,
+                             checkpoint_dir=self._checkpoint_dir(), image_store=self.image_store):
+            if result.error:
+                logger.error("Error processing %s: %s", os.path.basename(result.path), result.error)
+            else:
+                record("parse", result.seconds)
+            yield result.path, result.text, result.images
+
+    def _apply(self, path, mtime, size, sha256, text, images=()):
+        """Record a file's extracted text and pictures; returns True if the document set changed"""
+        self._manifest[path] = {
+            "mtime": mtime,
+            "size": size,
+            "sha256": sha256,
+            "parsed": bool(text),
+        }
+        current = self._documents.get(path)
+        if not text:
+            return self._documents.pop(path, None) is not None
+        self._documents[path] = CorpusDocument(path=path, mtime=mtime, size=size, sha256=sha256, text=text,
+                                               images=images, paged=is_paged(path))
+        return current is None or current.sha256 != sha256 or current.images != images
+
+    def refresh(self, force=False, paths=None):
+        """
+        Pick up added, changed and deleted files.
+        With `paths`, only those files are re-examined (a file watcher knows
+        which ones were touched); otherwise the whole folder is scanned.
+        Returns True when the set of extracted documents changed.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if (not force and paths is None and self._last_scan is not None
+                    and now - self._last_scan < self.refresh_interval):
+                return False
+            if paths is None:
+                self._last_scan = now
+            else:
+                paths = {os.path.join(self.folder_path, os.path.basename(path)) for path in paths}
+
+            found = self.scan(paths)
+            examined = paths if paths is not None else set(self._documents) | set(self._manifest)
+            changed = False
+            manifest_before = dict(self._manifest)
+
+            for path in examined:
+                if path not in found:
+                    changed |= self._documents.pop(path, None) is not None
+                    self._manifest.pop(path, None)
+
+            to_parse = {}
+            for path, (mtime, size) in found.items():
+                current = self._documents.get(path)
+                if current and current.mtime == mtime and current.size == size:
+                    continue
+                if current is None and path in manifest_before and not manifest_before[path]["parsed"] \
+                        and manifest_before[path]["mtime"] == mtime and manifest_before[path]["size"] == size:
+                    # Unsupported or empty file that has not changed
+                    continue
+                try:
+                    sha256, text, images = self._lookup(path, mtime, size)
+                except OSError as e:
+                    # File vanished or is still being written; try again on the next scan
+                    logger.warning("Error reading %s: %s", os.path.basename(path), e)
+                    continue
+                if text is NEEDS_PARSE:
+                    to_parse[path] = (mtime, size, sha256)
+                else:
+                    changed |= self._apply(path, mtime, size, sha256, text, images)
+
+            for path, text, images in self._parse_many(list(to_parse)):
+                mtime, size, sha256 = to_parse[path]
+                if text:
+                    self._write_cached_text(sha256, text)
+                    if self.image_store is not None:
+                        self._write_cached_images(sha256, images)
+                changed |= self._apply(path, mtime, size, sha256, text, images)
+
+            if changed:
+                self.generation += 1
+            if changed or self._manifest != manifest_before:
+                self._save_manifest()
+            return changed
+
+    def load_documents(self, documents):
+        """
+        Seed the store with documents extracted elsewhere (a corpus snapshot
+        built at deploy time). The next refresh() keeps those whose file is
+        unchanged, so they are never parsed here.
+        """
+        with self._lock:
+            for document in documents:
+                self._manifest[document.path] = {
+                    "mtime": document.mtime,
+                    "size": document.size,
+                    "sha256": document.sha256,
+                    "parsed": True,
+                }
+                self._documents[document.path] = document
+            self.generation += 1
+
+    def get(self, path):
+        """The extracted document for `path` as of the last refresh, or None"""
+        with self._lock:
+            return self._documents.get(os.path.join(self.folder_path, os.path.basename(path)))
+
+    def find_by_hash(self, sha256):
+        """Path of a known file with this content hash (parsed or not), or None"""
+        with self._lock:
+            for path, entry in self._manifest.items():
+                if entry["sha256"] == sha256:
+                    return path
+        return None
+
+    def __len__(self):
+        """Number of files with extracted text, as of the last refresh"""
+        return len(self._documents)
+
+    def documents(self):
+        """Return the current documents, refreshing if the scan interval has passed"""
+        self.refresh()
+        with self._lock:
+            return sorted(self._documents.values(), key=lambda d: d.path)
+
+    def get_documents(self):
+        """Drop-in replacement for parse_documents(folder_path): (text_chunks, images)"""
+        return [d.text for d in self.documents()], []
@@ -1,92 +1,476 @@
+import hashlib
+import itertools
+import json
+import logging
+import mmap
 import os
-import docx
+import posixpath
+import zipfile
+from xml.etree import ElementTree
+
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt", ".md", ".csv", ".html", ".htm")
+
+# Plain-text formats that are read as-is
+TEXT_EXTENSIONS = (".txt", ".md", ".csv")
+
+# Separates the pages of extracted PDF text, so passages can be tagged with their page
+PAGE_BREAK = "\f"
+# Documents whose text is split into pages with PAGE_BREAK (even when it has one page)
+PAGED_EXTENSIONS = (".pdf",)
+
+logger = logging.getLogger(__name__)
+
+
+def is_paged(path):
+    """True for documents whose extracted text is split into pages (see PAGE_BREAK)"""
+    return path.lower().endswith(PAGED_EXTENSIONS)
+
+
+def _madvise(data, advice):
+    """mmap.madvise where the platform supports it (Python 3.8+, not Windows)"""
+    if hasattr(data, "madvise") and hasattr(mmap, advice):
+        data.madvise(getattr(mmap, advice))
+
+
+def _page_images(page):
+    """Bytes of the images a PDF page draws, skipping those PyPDF2 cannot decode"""
+    try:
+        images = page.images
+    except Exception as e:  # pages without /Resources, unsupported filters
+        logger.debug("Cannot list images: %s", e)
+        return []
+    found = []
+    for index in range(len(images)):
+        try:
+            found.append(images[index].data)
+        except Exception as e:
+            logger.debug("Skipping undecodable PDF image: %s", e)
+    return found
+
+
+def iter_pdf_pages(path, start=1, images=None):
+    """
+    Yield (page number, text) for each page of a PDF, one page at a time.
+
+    The file is memory-mapped instead of read into memory, and the streams
+    parsed for a page (content, images) are dropped once its text has been
+    extracted, so memory use does not grow with the size of the document.
+    Page numbers start at 1; pages before `start` are skipped.
+
+    With an `images` list, the images of every page (skipped ones too) are
+    appended to it as (page number, None, bytes) while the page is loaded.
+    """
+    from PyPDF2 import PdfReader
+    from PyPDF2.generic import StreamObject
+
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # Pages are read in small scattered pieces, so readahead would only inflate RSS
+            _madvise(data, "MADV_RANDOM")
+            reader = PdfReader(data)
+            cache = reader.resolved_objects
+            page_count = len(reader.pages)
+            _madvise(data, "MADV_DONTNEED")
+            for number in range(1 if images is not None else start, page_count + 1):
+                seen = len(cache)
+                page = reader.pages[number - 1]
+                text = (page.extract_text() or "") if number >= start else None
+                if images is not None:
+                    images.extend((number, None, image) for image in _page_images(page))
+                # Only this page's objects need checking: they are the newest cache entries.
+                # Object streams are kept since other pages' objects are read from them.
+                for key in [key for key, obj in itertools.islice(cache.items(), seen, None)
+                            if isinstance(obj, StreamObject) and obj.get("/Type") != "/ObjStm"]:
+                    del cache[key]
+                # Give back the mapped pages read so far; they stay in the OS page cache
+                _madvise(data, "MADV_DONTNEED")
+                if text is not None:
+                    yield number, text.strip()
+
+
+class PageCheckpoint:
+    """
+    Pages of a PDF extracted so far, appended to a JSON-lines file as they
+    are produced so an interrupted extraction can resume at the next page.
+    The first line records the file's size and mtime; a checkpoint for an
+    older version of the file is discarded.
+    """
+
+    def __init__(self, checkpoint_dir, path):
+        stat = os.stat(path)
+        self.stamp = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        name = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()
+        self.path = os.path.join(checkpoint_dir, f"{name}.jsonl")
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def load(self):
+        """Return the page texts saved so far and open the checkpoint for appending"""
+        pages = []
+        valid_bytes = 0
+        try:
+            with open(self.path, "rb") as f:
+                lines = iter(f)
+                header = next(lines, b"")
+                if header.endswith(b"\n") and json.loads(header) == self.stamp:
+                    valid_bytes = len(header)
+                    for line in lines:
+                        # A crash can leave the last line half-written
+                        if not line.endswith(b"\n"):
+                            break
+                        page = json.loads(line)
+                        if page["page"] != len(pages) + 1:
+                            break
+                        pages.append(page["text"])
+                        valid_bytes += len(line)
+        except (OSError, ValueError, KeyError):
+            pages = []
+            valid_bytes = 0
+
+        self._file = open(self.path, "r+b" if valid_bytes else "wb")
+        if valid_bytes:
+            self._file.truncate(valid_bytes)
+            self._file.seek(valid_bytes)
+        else:
+            self._write(self.stamp)
+        return pages
+
+    def _write(self, record):
+        self._file.write(json.dumps(record).encode("utf-8") + b"\n")
+        self._file.flush()
+
+    def add(self, number, text):
+        self._write({"page": number, "text": text})
+
+    def close(self, completed):
+        self._file.close()
+        if completed:
+            os.remove(self.path)
+
+
+def parse_pdf(path, checkpoint_dir=None, images=None):
+    """
+    Extract the text layer of a PDF with PyPDF2, pages separated by PAGE_BREAK
+    (scanned pages without a text layer are empty).
+
+    With a `checkpoint_dir`, each page is saved as soon as it is extracted and
+    a later call for the same unchanged file resumes after the last saved page.
+    With an `images` list, page images are collected too (see iter_pdf_pages).
+    """
+    if checkpoint_dir is None:
+        return PAGE_BREAK.join(text for _, text in iter_pdf_pages(path, images=images))
+
+    checkpoint = PageCheckpoint(checkpoint_dir, path)
+    pages = checkpoint.load()
+    completed = False
+    try:
+        if pages:
+            logger.info("Resuming %s at page %d", os.path.basename(path), len(pages) + 1)
+        for number, text in iter_pdf_pages(path, start=len(pages) + 1, images=images):
+            checkpoint.add(number, text)
+            pages.append(text)
+        completed = True
+    finally:
+        checkpoint.close(completed)
+    return PAGE_BREAK.join(pages)
+
+
+def parse_html(path):
+    """Extract the visible text of an HTML file"""
+    from bs4 import BeautifulSoup
+
+    with open(path, 'rb') as f:
+        soup = BeautifulSoup(f.read(), 'html.parser')
+    for element in soup(["script", "style"]):
+        element.decompose()
+    lines = [line.strip() for line in soup.get_text().splitlines()]
+    return "\n".join(line for line in lines if line)
+
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+RELS_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+OFFICE_RELS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/"
+R_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+# Pictures: DrawingML blips, and VML image data in older documents
+A_BLIP = "{http://schemas.openxmlformats.org/drawingml/2006/main}blip"
+V_IMAGEDATA = "{urn:schemas-microsoft-com:vml}imagedata"
+
+
+def _is_merge_continuation(cell):
+    """True for a table cell that continues a merged cell (it repeats no text of its own)"""
+    properties = cell.find(W_NS + "tcPr")
+    if properties is None:
+        return False
+    for tag in ("vMerge", "hMerge"):
+        merge = properties.find(W_NS + tag)
+        if merge is not None and merge.get(W_NS + "val", "continue") == "continue":
+            return True
+    return False
+
+
+def _docx_part_lines(stream, pictures=None):
+    """
+    Stream-parse one WordprocessingML part (body, header or footer) with
+    iterparse and return its text lines in document order: one line per
+    paragraph and one per table row, cells joined with " | ". Elements are
+    cleared once read, so the XML tree is never held in memory.
+
+    With a `pictures` list, each picture is appended to it as (index of the
+    line it belongs to, relationship id of its image).
+    """
+    lines = []
+    runs = []   # text of each open paragraph (text boxes nest paragraphs)
+    cells = []  # lines of each open table cell
+    rows = []   # cells of each open table row
+    open_tags = []  # tags of the open elements, to tell a run's tab from a tab stop
+    fallback_depth = 0
+
+    def emit(line):
+        (cells[-1] if cells else lines).append(line)
+
+    for event, elem in ElementTree.iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if tag == MC_FALLBACK:
+            # mc:Fallback repeats the content of the preceding mc:Choice
+            fallback_depth += 1 if event == "start" else -1
+            continue
+        if fallback_depth:
+            continue
+
+        if event == "start":
+            open_tags.append(tag)
+            if tag == W_NS + "p":
+                runs.append([])
+            elif tag == W_NS + "tc":
+                cells.append([])
+            elif tag == W_NS + "tr":
+                rows.append([])
+            continue
+        open_tags.pop()
+
+        if tag == W_NS + "t" and runs:
+            runs[-1].append(elem.text or "")
+        elif tag in (A_BLIP, V_IMAGEDATA) and pictures is not None:
+            rid = elem.get(R_NS + "embed") or elem.get(R_NS + "id")
+            if rid:
+                # An open row or paragraph becomes the next line
+                pictures.append((len(lines), rid))
+        elif tag == W_NS + "tab" and runs and open_tags and open_tags[-1] == W_NS + "r":
+            # w:tab also defines tab stops under w:pPr/w:tabs; only a run's tab is text
+            runs[-1].append("\t")
+        elif tag in (W_NS + "br", W_NS + "cr") and runs:
+            runs[-1].append("\n")
+        elif tag == W_NS + "p":
+            text = "".join(runs.pop()).strip()
+            if text:
+                emit(text)
+            elem.clear()
+        elif tag == W_NS + "tc":
+            text = " ".join(cells.pop())
+            if text and rows and not _is_merge_continuation(elem):
+                rows[-1].append(text)
+            elem.clear()
+        elif tag == W_NS + "tr":
+            row = rows.pop()
+            if row:
+                emit(" | ".join(row))
+            elem.clear()
+    return lines
+
+
+def _docx_relationships(archive):
+    """{relationship id: (type, part name)} of word/document.xml, external targets excluded"""
+    try:
+        rels = ElementTree.fromstring(archive.read("word/_rels/document.xml.rels"))
+    except KeyError:
+        return {}
+    found = {}
+    for rel in rels.iter(RELS_NS + "Relationship"):
+        kind = rel.get("Type", "")
+        if kind.startswith(OFFICE_RELS):
+            kind = kind[len(OFFICE_RELS):]
+        if rel.get("TargetMode") != "External":
+            found[rel.get("Id")] = (kind, posixpath.normpath(posixpath.join("word", rel.get("Target", ""))))
+    return found
+
+
+def _docx_header_footer_parts(relationships):
+    """Header parts then footer parts of a DOCX, in the order the document's relationships list them"""
+    parts = {"header": [], "footer": []}
+    for kind, name in relationships.values():
+        if kind in parts:
+            parts[kind].append(name)
+    return parts["header"] + parts["footer"]
+
+
+def parse_docx_xml(path, images=None):
+    """
+    Extract DOCX text straight from the zip: the body of word/document.xml
+    in document order, then the headers and footers. Identical header or
+    footer parts (first-page and default headers often are) appear once.
+
+    With an `images` list, the pictures of the body are appended to it as
+    (None, offset, bytes), offset being where the text of the paragraph or
+    table row holding the picture starts. Header and footer pictures (logos)
+    are left out.
+    """
+    with zipfile.ZipFile(path) as archive:
+        relationships = _docx_relationships(archive)
+        pictures = [] if images is not None else None
+        with archive.open("word/document.xml") as stream:
+            lines = _docx_part_lines(stream, pictures)
+        if pictures:
+            offsets = list(itertools.accumulate((len(line) + 1 for line in lines), initial=0))
+            for index, rid in pictures:
+                kind, name = relationships.get(rid, (None, None))
+                if kind != "image":
+                    continue
+                try:
+                    data = archive.read(name)
+                except KeyError:
+                    continue
+                images.append((None, min(offsets[index], max(offsets[-1] - 1, 0)), data))
+        seen = set()
+        for name in _docx_header_footer_parts(relationships):
+            try:
+                with archive.open(name) as stream:
+                    part_lines = tuple(_docx_part_lines(stream))
+            except KeyError:
+                continue
+            if part_lines and part_lines not in seen:
+                seen.add(part_lines)
+                lines.extend(part_lines)
+    return "\n".join(lines)
+
+
+def parse_docx_python(path):
+    """Extract paragraph, table, header and footer text from a DOCX file with python-docx"""
+    import docx
+
+    doc = docx.Document(path)
+    lines = []
+
+    # Extract text from paragraphs
+    for paragraph in doc.paragraphs:
+        if paragraph.text.strip():
+            lines.append(paragraph.text)
+
+    # Extract text from tables
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                if cell.text.strip():
+                    lines.append(cell.text)
+
+    # Extract text from headers and footers
+    for section in doc.sections:
+        for header in section.header.paragraphs:
+            if header.text.strip():
+                lines.append(header.text)
+        for footer in section.footer.paragraphs:
+            if footer.text.strip():
+                lines.append(footer.text)
+
+    return "\n".join(lines).strip()
+
+
+def parse_docx(path, images=None):
+    """
+    Extract the text of a DOCX file, falling back to python-docx if the fast
+    XML reader fails (without pictures, then)
+    """
+    try:
+        return parse_docx_xml(path, images)
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+        logger.warning("Fast DOCX reader failed on %s (%s); falling back to python-docx",
+                       os.path.basename(path), e)
+        return parse_docx_python(path)
+
+
+def parse_file(path, checkpoint_dir=None, images=None):
+    """
+    Extract the text of a single document.
+    Returns None for file types that are skipped.
+    `checkpoint_dir` makes PDF extraction resumable by page (see parse_pdf).
+    With an `images` list, the pictures of PDF and DOCX files are appended
+    to it as (page, offset, bytes): PDF images carry their page number,
+    DOCX pictures the character offset of the text they sit with.
+    """
+    file = os.path.basename(path)
+
+    if file.endswith(".pdf"):
+        try:
+            text = parse_pdf(path, checkpoint_dir, images)
+        except Exception as e:
+            logger.error("Error parsing PDF %s: %s", file, e)
+            return None
+        if not text.strip():
+            text = ""
+        if text:
+            logger.debug("Parsed PDF %s: %d characters", file, len(text))
+        else:
+            logger.warning("No text layer in %s - OCR not available", file)
+        return text
+
+    elif file.endswith(".docx"):
+        try:
+            full_text = parse_docx(path, images)
+            if full_text:
+                logger.debug("Parsed DOCX %s: %d characters", file, len(full_text))
+            else:
+                logger.warning("No text extracted from %s", file)
+            return full_text
+        except Exception as e:
+            logger.error("Error parsing DOCX %s: %s", file, e)
+            return None
+
+    elif file.endswith(TEXT_EXTENSIONS):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+            logger.debug("Parsed %s: %d characters", file, len(text))
+            return text
+
+    elif file.endswith((".html", ".htm")):
+        text = parse_html(path)
+        logger.debug("Parsed HTML %s: %d characters", file, len(text))
+        return text
+
+    elif file.endswith(".doc"):
+        logger.info("Skipping DOC file (not supported): %s", file)
+        return None
+
+    else:
+        logger.debug("Skipping unsupported file type: %s", file)
+        return None
 
 
 def parse_documents(folder_path):
     text_chunks = []
     image_list = []
-    
-    print(f"Looking for documents in: {folder_path}")
-    
+
     if not os.path.exists(folder_path):
-        print(f"Warning: Folder {folder_path} does not exist!")
+        logger.warning("Folder %s does not exist", folder_path)
         return text_chunks, image_list
-    
+
     files = os.listdir(folder_path)
-    print(f"Found {len(files)} files in folder")
-    
+    logger.info("Found %d files in %s", len(files), folder_path)
+
     for file in files:
         path = os.path.join(folder_path, file)
-        print(f"Processing file: {file}")
-        
         try:
-            if file.endswith(".pdf"):
-                print(f"  Skipping PDF: {file} - OCR not available")
-                continue
-
-            elif file.endswith(".docx"):
-                print(f"  Parsing DOCX: {file}")
-                try:
-                    doc = docx.Document(path)
-                    full_text = ""
-                    
-                    # Extract text from paragraphs
-                    for paragraph in doc.paragraphs:
-                        if paragraph.text.strip():
-                            full_text += paragraph.text + "\n"
-                    
-                    # Extract text from tables
-                    for table in doc.tables:
-                        for row in table.rows:
-                            for cell in row.cells:
-                                if cell.text.strip():
-                                    full_text += cell.text + "\n"
-                    
-                    # Extract text from headers and footers
-                    for section in doc.sections:
-                        for header in section.header.paragraphs:
-                            if header.text.strip():
-                                full_text += header.text + "\n"
-                        for footer in section.footer.paragraphs:
-                            if footer.text.strip():
-                                full_text += footer.text + "\n"
-                    
-                    if full_text.strip():
-                        text_chunks.append(full_text.strip())
-                        print(f"    Extracted: {len(full_text)} characters")
-                        print(f"    Sample: {full_text[:200]}...")
-                    else:
-                        print(f"    Warning: No text extracted from {file}")
-                        
-                except Exception as e:
-                    print(f"    Error parsing DOCX {file}: {str(e)}")
-
-            elif file.endswith(".txt"):
-                print(f"  Parsing TXT: {file}")
-                with open(path, 'r', encoding='utf-8') as f:
-                    text = f.read()
-                    text_chunks.append(text)
-                    print(f"    Extracted: {len(text)} characters")
-
-            elif file.endswith(".doc"):
-                print(f"  Skipping DOC file (not supported): {file}")
-                continue
-
-            else:
-                print(f"  Skipping unsupported file type: {file}")
-                continue
-                
+            text = parse_file(path)
+            if text:
+                text_chunks.append(text)
         except Exception as e:
-            print(f"  Error processing {file}: {str(e)}")
+            logger.error("Error processing %s: %s", file, e)
             continue
-    
-    print(f"Total text chunks: {len(text_chunks)}")
-    print(f"Total images: {len(image_list)}")
-    
-    # Print a sample of the extracted text for debugging
-    if text_chunks:
-        print("Sample of extracted text:")
-        for i, chunk in enumerate(text_chunks[:2]):  # Show first 2 chunks
-            print(f"Chunk {i+1}: {chunk[:200]}...")
-    
-    return text_chunks, image_list
\ No newline at end of file
+
+    logger.info("Extracted %d text chunks and %d images", len(text_chunks), len(image_list))
+
+    # Samples of the extracted text; only built when debug logging is on
+    if text_chunks and logger.isEnabledFor(logging.DEBUG):
+        for i, chunk in enumerate(text_chunks[:2]):
+            logger.debug("Chunk %d: %s...", i + 1, chunk[:200])
+
+    return text_chunks, image_list
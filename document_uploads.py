@@ -0,0 +1,208 @@
+# document_uploads.py
+
+import asyncio
+import hashlib
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+
+from document_parser import SUPPORTED_EXTENSIONS
+
+# Upload chunk size: large enough to keep per-chunk overhead low, small enough to bound memory
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+
+class UploadRejected(Exception):
+    """An upload that cannot be accepted; `status_code` is the HTTP status to answer with"""
+
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class UploadJob:
+    """
+    Progress of one uploaded document.
+    status goes queued -> parsing -> indexing -> done, or ends in failed or duplicate.
+    """
+    id: str
+    filename: str
+    sha256: str
+    size: int
+    status: str = "queued"
+    error: str = None
+    duplicate_of: str = None  # file name of the document with the same content
+    created: float = field(default_factory=time.time)
+    finished: float = None
+    timings: dict = field(default_factory=dict)  # step -> milliseconds
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def safe_filename(filename):
+    """Base name of an uploaded file, or None if it is not a supported document name"""
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    if not name or name.startswith((".", "~$")) or not name.lower().endswith(SUPPORTED_EXTENSIONS):
+        return None
+    return name
+
+
+class DocumentUploads:
+    """
+    Receives uploaded documents and ingests them in the background.
+
+    receive() streams an upload to a staging directory in UPLOAD_CHUNK_SIZE
+    chunks while hashing it, so the file is never held in memory. submit()
+    returns a job right away; a fixed number of worker threads then move the
+    file into the documents folder, parse it and rebuild the index. At most
+    `max_queued` jobs wait at a time, beyond that uploads are refused with
+    503. Content that is already in the corpus or in a pending job is not
+    processed again: the job is marked duplicate and points at the original.
+    A different file under the name of an existing document (or of a pending
+    upload) is refused with 409 rather than replacing it.
+    """
+
+    def __init__(self, corpus, knowledge_base, staging_dir=None, workers=1, max_queued=16,
+                 max_bytes=50 * 1024 * 1024, max_jobs=1000):
+        self.corpus = corpus
+        self.knowledge_base = knowledge_base
+        self.staging_dir = staging_dir or os.getenv("UPLOAD_STAGING_DIR", os.path.join(".cache", "uploads"))
+        self.workers = workers
+        self.max_bytes = max_bytes
+        self.max_jobs = max_jobs
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = OrderedDict()  # id -> UploadJob, oldest first
+        self._pending_by_hash = {}  # sha256 -> file name of a queued or running job
+        self._lock = threading.Lock()
+        self._threads = []
+
+    async def receive(self, filename, read):
+        """
+        Stream an upload to the staging directory. `read(size)` is an async
+        callable returning the next chunk (b"" at the end), like UploadFile.read.
+        Returns (staged path, sha256, size).
+        """
+        name = safe_filename(filename)
+        if name is None:
+            raise UploadRejected(415, f"Unsupported file; expected one of {', '.join(SUPPORTED_EXTENSIONS)}")
+
+        os.makedirs(self.staging_dir, exist_ok=True)
+        staged = os.path.join(self.staging_dir, f"{uuid.uuid4().hex}.part")
+        loop = asyncio.get_running_loop()
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(staged, "wb") as f:
+                while True:
+                    chunk = await read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadRejected(413, f"File is larger than {self.max_bytes // (1024 * 1024)} MB")
+                    digest.update(chunk)
+                    await loop.run_in_executor(None, f.write, chunk)
+        except BaseException:
+            os.remove(staged)
+            raise
+        if size == 0:
+            os.remove(staged)
+            raise UploadRejected(400, "File is empty")
+        return staged, digest.hexdigest(), size
+
+    def submit(self, filename, staged, sha256, size):
+        """Queue a staged upload for ingestion and return its UploadJob"""
+        job = UploadJob(uuid.uuid4().hex, safe_filename(filename), sha256, size)
+        with self._lock:
+            original = self._pending_by_hash.get(sha256) or self.corpus.find_by_hash(sha256)
+            if original is not None:
+                os.remove(staged)
+                job.status = "duplicate"
+                job.duplicate_of = os.path.basename(original)
+                job.finished = job.created
+                self._remember(job)
+                return job
+            if os.path.exists(os.path.join(self.corpus.folder_path, job.filename)) \
+                    or job.filename in self._pending_by_hash.values():
+                os.remove(staged)
+                raise UploadRejected(409, f"A different document named {job.filename} already exists; "
+                                          "rename the file or delete the existing one first")
+            try:
+                self._queue.put_nowait((job, staged))
+            except queue.Full:
+                os.remove(staged)
+                raise UploadRejected(503, "Too many documents are waiting to be processed; try again later")
+            self._pending_by_hash[sha256] = job.filename
+            self._remember(job)
+            self._start_workers()
+        return job
+
+    def _remember(self, job):
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _start_workers(self):
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"document-upload-{len(self._threads)}",
+                                      daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _work(self):
+        while True:
+            job, staged = self._queue.get()
+            try:
+                self._process(job, staged)
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished = time.time()
+                with self._lock:
+                    self._pending_by_hash.pop(job.sha256, None)
+                if os.path.exists(staged):
+                    os.remove(staged)
+                self._queue.task_done()
+
+    def _step(self, job, status, func, *args):
+        job.status = status
+        start = time.perf_counter()
+        result = func(*args)
+        job.timings[status] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    def _process(self, job, staged):
+        os.makedirs(self.corpus.folder_path, exist_ok=True)
+        path = os.path.join(self.corpus.folder_path, job.filename)
+        if os.path.exists(path):
+            # Copied into the folder by hand since submit() checked
+            raise FileExistsError(f"A document named {job.filename} already exists")
+        # shutil.move falls back to copying when the staging dir is on another file system
+        shutil.move(staged, path)
+        self._step(job, "parsing", self.corpus.refresh, True, [path])
+        if self.corpus.get(path) is None:
+            # Leave nothing behind: the name stays free and the content unknown
+            os.remove(path)
+            self.corpus.refresh(True, [path])
+            job.status = "failed"
+            job.error = "No text could be extracted from the document"
+            return
+        self._step(job, "indexing", self.knowledge_base.refresh)
+        job.status = "done"
+
+    def join(self):
+        """Block until every queued job has finished (for tests and benchmarks)"""
+        self._queue.join()
@@ -0,0 +1,183 @@
+# document_watcher.py
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentWatcher:
+    """
+    Watches the documents folder in a background thread and re-indexes it
+    when files change, so questions never wait on a folder scan.
+
+    Uses watchdog (inotify, FSEvents, ...) when it is installed and otherwise
+    polls file mtimes every `poll_interval` seconds. Changes are debounced:
+    ingestion starts once the folder has been quiet for `debounce` seconds,
+    or `max_delay` seconds after the first change so a steady trickle of
+    writes cannot postpone it forever. Only the touched files are re-parsed;
+    the knowledge base then swaps in a new index snapshot.
+    """
+
+    def __init__(self, corpus, knowledge_base, debounce=1.0, poll_interval=2.0, max_delay=10.0,
+                 use_watchdog=True):
+        self.corpus = corpus
+        self.knowledge_base = knowledge_base
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.max_delay = max_delay
+        self.use_watchdog = use_watchdog
+        self.mode = None  # "watchdog" or "polling" once started
+        self.last_ingest_seconds = None
+        self.last_ingest_files = 0
+        self.last_ingest_at = None
+        self.ingest_count = 0
+        self._pending = set()
+        self._first_change = None
+        self._last_change = None
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._observer = None
+        self._stats = None
+        self._next_poll = 0.0
+
+    # -- change notification ----------------------------------------------
+
+    def notify(self, path):
+        """Record that `path` in the documents folder was created, changed or deleted"""
+        with self._condition:
+            now = time.monotonic()
+            if not self._pending:
+                self._first_change = now
+            self._pending.add(path)
+            self._last_change = now
+            self._condition.notify()
+
+    def _start_watchdog(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return False
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                watcher.notify(event.src_path)
+                if getattr(event, "dest_path", None):
+                    watcher.notify(event.dest_path)
+
+        os.makedirs(self.corpus.folder_path, exist_ok=True)
+        self._observer = Observer()
+        self._observer.schedule(Handler(), self.corpus.folder_path, recursive=False)
+        self._observer.daemon = True
+        self._observer.start()
+        return True
+
+    def _poll(self):
+        """Compare the folder's mtimes and sizes with the previous poll"""
+        stats = self.corpus.scan()
+        if self._stats is not None:
+            for path in set(stats) | set(self._stats):
+                if stats.get(path) != self._stats.get(path):
+                    self.notify(path)
+        self._stats = stats
+
+    # -- ingestion ---------------------------------------------------------
+
+    def ingest(self, paths=None):
+        """Re-parse `paths` (or rescan the whole folder) and rebuild the index if anything changed"""
+        start = time.perf_counter()
+        changed = self.corpus.refresh(force=True, paths=paths)
+        snapshot = self.knowledge_base.refresh()
+        self.last_ingest_seconds = time.perf_counter() - start
+        self.last_ingest_files = len(paths) if paths is not None else len(self.corpus)
+        self.last_ingest_at = time.time()
+        self.ingest_count += 1
+        if changed:
+            logger.info("Re-indexed %d changed file(s) in %.2fs (index generation %d)",
+                        self.last_ingest_files, self.last_ingest_seconds, snapshot.generation)
+        return changed
+
+    def _take_batch(self):
+        """Wait until pending changes have settled and return them; None when stopping"""
+        with self._condition:
+            while not self._stopping:
+                now = time.monotonic()
+                if self._pending:
+                    ready_at = min(self._last_change + self.debounce, self._first_change + self.max_delay)
+                    if now >= ready_at:
+                        batch, self._pending = self._pending, set()
+                        return batch
+                    timeout = ready_at - now
+                else:
+                    timeout = None
+                if self.mode == "polling":
+                    until_poll = max(0.0, self._next_poll - now)
+                    timeout = until_poll if timeout is None else min(timeout, until_poll)
+                self._condition.wait(timeout)
+                if self.mode == "polling" and time.monotonic() >= self._next_poll:
+                    self._next_poll = time.monotonic() + self.poll_interval
+                    # Poll outside the lock: scanning takes a moment on large folders
+                    self._condition.release()
+                    try:
+                        self._poll()
+                    finally:
+                        self._condition.acquire()
+            return None
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            try:
+                self.ingest(sorted(batch))
+            except Exception as e:
+                logger.error("Re-indexing after file changes failed: %s", e)
+
+    def start(self):
+        """Index the folder now, then watch it in a daemon thread"""
+        self.ingest()
+        if self.use_watchdog and self._start_watchdog():
+            self.mode = "watchdog"
+        else:
+            self.mode = "polling"
+            self._stats = self.corpus.scan()
+            self._next_poll = time.monotonic() + self.poll_interval
+        self._thread = threading.Thread(target=self._run, name="document-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._observer is not None:
+            self._observer.stop()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        snapshot = self.knowledge_base.snapshot
+        with self._condition:
+            pending = len(self._pending)
+        return {
+            "mode": self.mode,
+            "index_generation": snapshot.generation,
+            "corpus_generation": self.corpus.generation,
+            "files": len(self.corpus),
+            "indexed_documents": snapshot.documents,
+            "passages": len(snapshot.index),
+            "last_index_build_seconds": round(snapshot.build_seconds, 3),
+            "last_ingest_seconds": None if self.last_ingest_seconds is None else round(self.last_ingest_seconds, 3),
+            "last_ingest_files": self.last_ingest_files,
+            "last_ingest_at": self.last_ingest_at,
+            "ingest_count": self.ingest_count,
+            "pending_changes": pending,
+        }
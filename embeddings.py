@@ -0,0 +1,175 @@
+# embeddings.py
+
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+from retrieval import tokenize, top_k
+
+
+class EmbeddingBackend:
+    """
+    Interface for passage embedding backends.
+    Subclasses set `name` and `dim` and return L2-normalized float32 rows.
+    """
+
+    name = "base"
+    dim = 0
+
+    def embed(self, texts):
+        raise NotImplementedError
+
+
+@lru_cache(maxsize=200000)
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class HashingEmbedder(EmbeddingBackend):
+    """
+    Deterministic hashing-vectorizer embeddings: unigrams and bigrams are
+    hashed into `dim` signed buckets with sublinear term frequency. Needs no
+    model download, so it works offline and gives identical vectors on every
+    machine.
+    """
+
+    def __init__(self, dim=512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text):
+        tokens = tokenize(text)
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = {}
+            for feature in self._features(text):
+                h = _feature_hash(feature)
+                bucket = h % self.dim
+                sign = 1.0 if (h >> 63) & 1 else -1.0
+                counts[bucket] = counts.get(bucket, 0.0) + sign
+            if counts:
+                buckets = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+                values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+                matrix[row, buckets] = np.sign(values) * np.log1p(np.abs(values))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+class EmbeddingIndex:
+    """
+    Passage embeddings stored as one float32 matrix in `vectors.npy` and
+    memory-mapped on load. `index.json` records which rows belong to which
+    file content hash, so sync() only embeds files whose hash changed.
+
+    `layout_key` names how files were split into passages; cached rows are
+    discarded when it or the backend changes.
+    """
+
+    def __init__(self, cache_dir=None, backend=None, layout_key=""):
+        self.cache_dir = cache_dir or os.getenv("EMBEDDING_CACHE_DIR", os.path.join(".cache", "embeddings"))
+        self.backend = backend or HashingEmbedder()
+        self.key = f"{self.backend.name}:{layout_key}"
+        self.matrix = np.zeros((0, self.backend.dim), dtype=np.float32)
+        self._rows = {}  # sha256 -> (start, count)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _vectors_path(self):
+        return os.path.join(self.cache_dir, "vectors.npy")
+
+    def _meta_path(self):
+        return os.path.join(self.cache_dir, "index.json")
+
+    def _load(self):
+        try:
+            with open(self._meta_path(), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("key") != self.key:
+                return
+            matrix = np.load(self._vectors_path(), mmap_mode="r")
+        except (OSError, ValueError):
+            return
+        if matrix.shape[1:] != (self.backend.dim,):
+            return
+        self.matrix = matrix
+        self._rows = {sha: tuple(span) for sha, span in meta["files"].items()}
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def adopt(self, matrix, rows):
+        """Use rows embedded elsewhere (a corpus snapshot) as the current matrix; they reach the cache on the next sync()"""
+        if matrix.shape[1:] != (self.backend.dim,):
+            raise ValueError(f"Expected {self.backend.dim}-dimensional rows, got {matrix.shape[1:]}")
+        with self._lock:
+            self.matrix = matrix
+            self._rows = dict(rows)
+
+    def sync(self, groups):
+        """
+        Make the matrix match `groups`, a list of (sha256, passages) in row order.
+        Rows of unchanged files are copied from the old matrix; only new or
+        changed files are embedded. Returns the number of passages embedded.
+        """
+        with self._lock:
+            layout = []
+            start = 0
+            for sha256, passages in groups:
+                layout.append((sha256, start, len(passages)))
+                start += len(passages)
+
+            rows = {sha: (s, n) for sha, s, n in layout}
+            if rows == self._rows and len(self.matrix) == start:
+                return 0
+
+            matrix = np.empty((start, self.backend.dim), dtype=np.float32)
+            embedded = 0
+            for (sha256, passages), (_, offset, count) in zip(groups, layout):
+                old = self._rows.get(sha256)
+                if old is not None and old[1] == count:
+                    matrix[offset:offset + count] = self.matrix[old[0]:old[0] + count]
+                elif count:
+                    matrix[offset:offset + count] = self.backend.embed([p.text for p in passages])
+                    embedded += count
+
+            self._save(matrix, rows)
+            return embedded
+
+    def _save(self, matrix, rows):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_vectors = self._vectors_path() + ".tmp.npy"
+        np.save(tmp_vectors, matrix)
+        os.replace(tmp_vectors, self._vectors_path())
+        tmp_meta = self._meta_path() + ".tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({"key": self.key, "files": rows}, f)
+        os.replace(tmp_meta, self._meta_path())
+        self.matrix = np.load(self._vectors_path(), mmap_mode="r")
+        self._rows = rows
+
+    def search(self, query, k=5, matrix=None):
+        """
+        Return [(row, cosine similarity)] for the k nearest passages.
+        `matrix` searches an earlier snapshot of the rows instead of the current one.
+        """
+        matrix = self.matrix if matrix is None else matrix
+        if len(matrix) == 0:
+            return []
+        vector = self.backend.embed([query])[0]
+        return top_k(matrix @ vector, k)
+
+    def search_many(self, queries, k=5, matrix=None):
+        """search() for several queries: one embedding call and one matrix product for all of them"""
+        matrix = self.matrix if matrix is None else matrix
+        if len(matrix) == 0 or not queries:
+            return [[] for _ in queries]
+        scores = self.backend.embed(list(queries)) @ matrix.T
+        return [top_k(row, k) for row in scores]
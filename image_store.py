@@ -0,0 +1,186 @@
+# image_store.py
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Longest side, in pixels, of an image sent to Gemini; larger images cost more
+# tokens without helping it read a screenshot
+MAX_SIDE = 1024
+# Encoded size cap per image; quality, then resolution, is lowered until it fits
+MAX_BYTES = 150 * 1024
+QUALITY = 80
+MIN_QUALITY = 40
+# Smaller images are icons, bullets and logos, not worth a prompt part
+MIN_SIDE = 48
+
+FORMATS = {"JPEG": (".jpg", "image/jpeg"), "WEBP": (".webp", "image/webp")}
+MIME_TYPES = dict(FORMATS.values())
+
+
+class ImageStore:
+    """
+    Content-addressed cache of the images embedded in documents, each one
+    downscaled and re-encoded once, at ingestion, to a size-capped JPEG (or
+    WebP) that can go into a Gemini prompt as is.
+
+    add() is called with the raw bytes extracted from a document and returns
+    the image's key, the digest of those bytes and the encoding settings, so
+    an image that is already stored is never decoded again. Keys name files
+    under `root`. Prompt parts of recently used images are kept in memory.
+
+    The store is passed to ingestion worker processes, so it pickles without
+    its lock and memory cache.
+    """
+
+    def __init__(self, root=None, max_side=MAX_SIDE, max_bytes=MAX_BYTES, quality=QUALITY,
+                 image_format=None, min_side=MIN_SIDE, cache_size=64):
+        self.root = root or os.getenv("IMAGE_CACHE_DIR", os.path.join(".cache", "images"))
+        self.max_side = max_side
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.format = (image_format or os.getenv("IMAGE_FORMAT", "JPEG")).upper()
+        if self.format not in FORMATS:
+            raise ValueError(f"Unsupported image format {self.format}; expected one of {', '.join(FORMATS)}")
+        self.min_side = min_side
+        self.cache_size = cache_size
+        self._init_cache()
+
+    def _init_cache(self):
+        self._parts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["_parts"], state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_cache()
+
+    def key_for(self, data):
+        """Key of an image: its bytes plus everything that changes the encoded result"""
+        digest = hashlib.sha256(f"{self.format}/{self.max_side}/{self.max_bytes}/{self.quality}\0".encode())
+        digest.update(data)
+        return digest.hexdigest() + FORMATS[self.format][0]
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def add(self, data):
+        """
+        Store an extracted image; returns its key, or None for images that are
+        too small to matter or cannot be decoded.
+        """
+        key = self.key_for(data)
+        path = self.path(key)
+        if os.path.exists(path):
+            return key
+        encoded = self.encode(data)
+        if encoded is None:
+            return None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(encoded)
+        os.replace(tmp_path, path)
+        return key
+
+    def collector(self):
+        """
+        A list to pass as `images` to parse_file: each (page, offset, bytes)
+        appended to it is stored at once and kept as (page, offset, key), so
+        the raw images of a large document are never all in memory.
+        """
+        return ImageAnchors(self)
+
+    def encode(self, data):
+        """The image downscaled to max_side and encoded under max_bytes, or None"""
+        try:
+            from PIL import Image
+        except ImportError:
+            logger.warning("Pillow is not installed; document pictures are skipped")
+            return None
+        try:
+            image = Image.open(io.BytesIO(data))
+            image.load()
+        except Exception as e:
+            logger.debug("Skipping undecodable image: %s", e)
+            return None
+        if min(image.size) < self.min_side:
+            return None
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((self.max_side, self.max_side))
+
+        quality = self.quality
+        while True:
+            buffer = io.BytesIO()
+            image.save(buffer, format=self.format, quality=quality)
+            if buffer.tell() <= self.max_bytes or min(image.size) <= self.min_side:
+                return buffer.getvalue()
+            if quality > MIN_QUALITY:
+                quality = max(MIN_QUALITY, quality - 15)
+            else:
+                image = image.resize((max(1, image.width * 3 // 4), max(1, image.height * 3 // 4)))
+
+    def part(self, key):
+        """Gemini content part for a stored image, or None when it is missing"""
+        with self._lock:
+            part = self._parts.get(key)
+            if part is not None:
+                self._parts.move_to_end(key)
+                return part
+        try:
+            with open(self.path(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            logger.warning("Image %s is missing from %s", key, self.root)
+            return None
+        part = {"mime_type": MIME_TYPES[os.path.splitext(key)[1]], "data": data}
+        with self._lock:
+            self._parts[key] = part
+            while len(self._parts) > self.cache_size:
+                self._parts.popitem(last=False)
+        return part
+
+    def parts(self, keys):
+        """Prompt parts for the given keys, skipping missing images"""
+        return [part for part in map(self.part, keys) if part is not None]
+
+
+class ImageAnchors(list):
+    """
+    (page, offset, key) of the images stored so far; see ImageStore.collector().
+    Pictures are best-effort: one that cannot be stored is logged and left
+    out, so it never costs the document its text.
+    """
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+
+    def append(self, item):
+        page, offset, data = item
+        try:
+            key = self.store.add(data)
+        except Exception as e:
+            logger.warning("Skipping a picture that could not be stored: %s", e)
+            return
+        if key is not None:
+            super().append((page, offset, key))
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
@@ -0,0 +1,117 @@
+# ingestion.py
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+from document_parser import parse_file
+
+
+@dataclass
+class IngestResult:
+    """Outcome of parsing one file; `text` is None when the file was skipped or failed"""
+    path: str
+    text: str = None
+    error: str = None
+    seconds: float = 0.0
+    size: int = 0
+    images: tuple = ()  # (page, offset, ImageStore key) of the pictures stored
+
+
+def _parse_in_worker(path, checkpoint_dir, image_store):
+    start = time.perf_counter()
+    images = image_store.collector() if image_store is not None else None
+    text = parse_file(path, checkpoint_dir=checkpoint_dir, images=images)
+    return text, tuple(images or ()), time.perf_counter() - start
+
+
+def _terminate(pool):
+    """Kill a pool's worker processes so a hung parse cannot block shutdown"""
+    # ProcessPoolExecutor has no public way to stop a running task
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def ingest(paths, max_workers=None, timeout=60.0, checkpoint_dir=None, image_store=None):
+    """
+    Parse files in a process pool, yielding an IngestResult as each finishes.
+
+    At most `max_workers` files are in flight, so a file's deadline starts
+    when it is handed to a worker. A file that takes longer than `timeout`
+    seconds is reported as failed and the pool is replaced, so a pathological
+    file cannot stall the rest; other in-flight files are resubmitted. A file
+    that crashes its worker process is retried once on its own before it is
+    reported as failed. With a `checkpoint_dir`, PDFs are checkpointed page
+    by page, so that retry (or the next ingest after a crash) resumes where
+    the last attempt stopped. With an `image_store`, the pictures of each
+    file are downscaled and stored by the worker that parses it.
+    """
+    max_workers = max_workers or int(os.getenv("INGEST_WORKERS", 0)) or os.cpu_count() or 1
+    pending = [(path, False) for path in reversed(list(paths))]  # (path, retried), next one last
+    in_flight = {}  # future -> (path, deadline, retried)
+    retry = []
+    pool = ProcessPoolExecutor(max_workers=max_workers)
+
+    def submit(path, retried=False):
+        future = pool.submit(_parse_in_worker, path, checkpoint_dir, image_store)
+        in_flight[future] = (path, time.monotonic() + timeout, retried)
+
+    def size_of(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    try:
+        while pending or in_flight or retry:
+            while retry and not in_flight:
+                # Crashed files run alone so a second crash identifies the culprit
+                submit(retry.pop(), retried=True)
+            while pending and len(in_flight) < max_workers and not retry:
+                submit(*pending.pop())
+            if not in_flight:
+                continue
+
+            next_deadline = min(deadline for _, deadline, _ in in_flight.values())
+            done, _ = wait(in_flight, timeout=max(0.0, next_deadline - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+
+            broken = False
+            for future in done:
+                path, _, retried = in_flight.pop(future)
+                try:
+                    text, images, seconds = future.result()
+                except BrokenProcessPool:
+                    broken = True
+                    if retried:
+                        yield IngestResult(path, error="worker process crashed", size=size_of(path))
+                    else:
+                        retry.append(path)
+                    continue
+                except Exception as e:
+                    yield IngestResult(path, error=str(e), size=size_of(path))
+                    continue
+                yield IngestResult(path, text=text, seconds=seconds, size=size_of(path), images=images)
+
+            now = time.monotonic()
+            expired = [f for f, (_, deadline, _) in in_flight.items() if deadline <= now and not f.done()]
+            if expired or broken:
+                for future in expired:
+                    path, _, _ = in_flight.pop(future)
+                    yield IngestResult(path, error=f"timed out after {timeout:g}s",
+                                       seconds=timeout, size=size_of(path))
+                survivors = [(path, retried) for path, _, retried in in_flight.values()]
+                in_flight.clear()
+                _terminate(pool)
+                pool = ProcessPoolExecutor(max_workers=max_workers)
+                for path, retried in survivors:
+                    if broken and not retried:
+                        retry.append(path)
+                    else:
+                        # Resubmitted as they were: a file already retried is not retried again
+                        pending.append((path, retried))
+    finally:
+        _terminate(pool)
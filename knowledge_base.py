@@ -0,0 +1,349 @@
+# knowledge_base.py
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from embeddings import EmbeddingIndex
+from metrics import span
+from retrieval import BM25Index, Passage, iter_passage_spans, tokenize, top_k
+from single_flight import SingleFlight
+
+# Reciprocal rank fusion constant; 60 is the value from the original RRF paper
+RRF_K = 60
+
+# Questions scored together by search_many(); bounds its (questions x passages) score matrices
+SEARCH_BLOCK = 128
+
+# Origin of documents that come from the CorpusStore rather than set_external_documents()
+CORPUS = "corpus"
+
+
+@dataclass(frozen=True)
+class IndexSnapshot:
+    """One consistent version of the index: BM25 postings and embedding rows over the same passages"""
+    generation: int
+    index: BM25Index
+    vectors: np.ndarray  # row i embeds index.passages[i]
+    documents: int
+    build_seconds: float
+    images: dict = field(default_factory=dict)  # (source, passage index) -> ImageStore keys
+
+
+class SearchResults(list):
+    """
+    (passage, score) pairs returned by a search, with the IndexSnapshot they
+    came from, so what is looked up about them later (their pictures) comes
+    from that same version of the index even if it was replaced since.
+    """
+
+    def __init__(self, pairs, snapshot):
+        super().__init__(pairs)
+        self.snapshot = snapshot
+
+
+class KnowledgeBase:
+    """
+    Passage retrieval over the documents in a CorpusStore.
+
+    Documents are split into overlapping passages and indexed twice: lexically
+    with BM25 and semantically in an EmbeddingIndex. Both are rebuilt only when
+    the corpus generation changes, and passages, tokens and embeddings of
+    unchanged documents are reused by content hash. search() fuses the two
+    rankings.
+
+    Each rebuild produces a new IndexSnapshot that replaces the old one in a
+    single assignment, so a search in flight keeps using the snapshot it
+    started with. With `auto_refresh` off, searches never rebuild and someone
+    else (a DocumentWatcher) calls refresh() when documents change. With it
+    on, concurrent searches share a single refresh (and the parsing it
+    triggers) instead of queueing up to repeat it.
+
+    Pictures of a document are tied to the passages around them (see
+    anchor_images()), and passage_images() lists those of retrieved
+    passages.
+
+    Documents from other sources (such as crawled Microsoft Learn pages) can
+    be added with set_external_documents() and are indexed alongside.
+
+    A CorpusSnapshot built at deploy time can be adopted with
+    load_corpus_snapshot(), which installs its memory-mapped index without
+    parsing or embedding anything.
+    """
+
+    def __init__(self, corpus, passage_size=120, passage_overlap=30,
+                 embedder=None, embedding_cache_dir=None, auto_refresh=True):
+        self.corpus = corpus
+        self.passage_size = passage_size
+        self.passage_overlap = passage_overlap
+        self.auto_refresh = auto_refresh
+        self.embeddings = EmbeddingIndex(embedding_cache_dir, embedder,
+                                         layout_key=f"{passage_size}/{passage_overlap}")
+        self.snapshot = IndexSnapshot(0, BM25Index([]), self.embeddings.matrix[:0], 0, 0.0)
+        self._generation = None
+        self._external = {}
+        self._external_generation = 0
+        # sha256 -> (path, passages, tokens per passage or None, image anchors, {passage index: image keys})
+        self._passages_by_hash = {}
+        self.indexed = []  # (origin, CorpusDocument, passage count) in passage order
+        self._lock = threading.Lock()
+        self.refresh_flight = SingleFlight("index_refresh")
+
+    @property
+    def index(self):
+        return self.snapshot.index
+
+    def set_external_documents(self, name, documents):
+        """Replace the documents contributed by source `name`; they are indexed on the next refresh"""
+        documents = list(documents)
+        with self._lock:
+            current = self._external.get(name)
+            if current is not None and [(d.path, d.sha256) for d in current] == \
+                    [(d.path, d.sha256) for d in documents]:
+                # Same content (a recrawl of unchanged pages): keep the index as is
+                return
+            self._external[name] = documents
+            self._external_generation += 1
+
+    def load_corpus_snapshot(self, snapshot):
+        """
+        Adopt the passages, postings and embeddings of a CorpusSnapshot; its
+        external documents replace those of the same source. When its
+        documents are exactly the ones refresh() would index now, its index
+        becomes the current IndexSnapshot as is. Otherwise the next refresh()
+        rebuilds, but only splits and embeds documents whose content is not
+        in the snapshot. Returns True in the first case.
+        """
+        if (snapshot.passage_size, snapshot.passage_overlap) != (self.passage_size, self.passage_overlap):
+            raise ValueError(f"Snapshot passages are {snapshot.passage_size}/{snapshot.passage_overlap} words, "
+                             f"expected {self.passage_size}/{self.passage_overlap}")
+        if snapshot.embedder != self.embeddings.backend.name:
+            raise ValueError(f"Snapshot was embedded with {snapshot.embedder}, "
+                             f"expected {self.embeddings.backend.name}")
+        documents = self.corpus.documents()
+        with self._lock:
+            for name, external in snapshot.external_documents().items():
+                self._external[name] = external
+                self._external_generation += 1
+
+            passages_by_hash = {}
+            rows = {}
+            images = {}
+            for _, document, start, count in snapshot.documents:
+                document_images = self._document_images(document)
+                passages_by_hash[document.sha256] = (document.path, snapshot.passages[start:start + count], None,
+                                                     document.images, document_images)
+                rows[document.sha256] = (start, count)
+                images.update(((document.path, index), keys) for index, keys in document_images.items())
+            self._passages_by_hash = passages_by_hash
+            self.embeddings.adopt(snapshot.vectors, rows)
+
+            origins = [(CORPUS, document) for document in documents]
+            for name in sorted(self._external):
+                origins.extend((name, document) for document in self._external[name])
+            if [(origin, d.path, d.sha256) for origin, d in origins] != \
+                    [(origin, d.path, d.sha256) for origin, d, _, _ in snapshot.documents]:
+                return False
+
+            self.indexed = [(origin, document, count) for origin, document, _, count in snapshot.documents]
+            self.snapshot = IndexSnapshot(
+                generation=self.snapshot.generation + 1,
+                index=snapshot.index,
+                vectors=snapshot.vectors,
+                documents=len(origins),
+                build_seconds=snapshot.load_seconds,
+                images=images,
+            )
+            self._generation = (self.corpus.generation, self._external_generation)
+            return True
+
+    def refresh(self):
+        """Rebuild the index if the corpus changed; returns the current IndexSnapshot"""
+        documents = self.corpus.documents()
+        with self._lock:
+            generation = (self.corpus.generation, self._external_generation)
+            if self._generation == generation:
+                return self.snapshot
+            start = time.perf_counter()
+            origins = [(CORPUS, document) for document in documents]
+            for name in sorted(self._external):
+                origins.extend((name, document) for document in self._external[name])
+
+            passages_by_hash = {}
+            passages = []
+            tokens = []
+            groups = []
+            indexed = []
+            images = {}
+            for origin, document in origins:
+                cached = self._passages_by_hash.get(document.sha256)
+                if cached is None or cached[0] != document.path:
+                    spans = list(iter_passage_spans(document.text, self.passage_size, self.passage_overlap,
+                                                    document.paged))
+                    document_passages = [Passage(document.path, index, document.text[start:end], page)
+                                         for index, (page, start, end) in enumerate(spans)]
+                    cached = (document.path, document_passages, [tokenize(p.text) for p in document_passages],
+                              document.images, anchor_images(document.images, spans))
+                else:
+                    if cached[2] is None:
+                        # Passages adopted from a corpus snapshot, which stores postings rather than tokens
+                        cached = (cached[0], cached[1], [tokenize(p.text) for p in cached[1]], *cached[3:])
+                    if cached[3] != document.images:
+                        cached = (*cached[:3], document.images, self._document_images(document))
+                passages_by_hash[document.sha256] = cached
+                passages.extend(cached[1])
+                tokens.extend(cached[2])
+                groups.append((document.sha256, cached[1]))
+                indexed.append((origin, document, len(cached[1])))
+                images.update(((document.path, index), keys) for index, keys in cached[4].items())
+
+            self._passages_by_hash = passages_by_hash
+            self.indexed = indexed
+            self.embeddings.sync(groups)
+            self.snapshot = IndexSnapshot(
+                generation=self.snapshot.generation + 1,
+                index=BM25Index(passages, tokens=tokens),
+                vectors=self.embeddings.matrix,
+                documents=len(origins),
+                build_seconds=time.perf_counter() - start,
+                images=images,
+            )
+            self._generation = generation
+            return self.snapshot
+
+    def _document_images(self, document):
+        if not document.images:
+            return {}
+        spans = list(iter_passage_spans(document.text, self.passage_size, self.passage_overlap, document.paged))
+        return anchor_images(document.images, spans)
+
+    def passage_images(self, results, limit=3):
+        """
+        Keys of the pictures tied to retrieved (passage, score) pairs, best
+        passages first, at most `limit`, read from the snapshot the results
+        came from (see SearchResults)
+        """
+        images = getattr(results, "snapshot", self.snapshot).images
+        keys = {}
+        for passage, _ in results:
+            for key in images.get((passage.source, passage.index), ()):
+                keys[key] = None
+        return list(keys)[:limit]
+
+    def _current_snapshot(self):
+        snapshot = self.snapshot
+        if self.auto_refresh or snapshot.generation == 0:
+            snapshot = self.refresh_flight.do("refresh", self.refresh)
+        return snapshot
+
+    @staticmethod
+    def _fuse(snapshot, lexical, semantic, k):
+        fused = {}
+        for ranking in (lexical, semantic):
+            for rank, (pid, _) in enumerate(ranking):
+                fused[pid] = fused.get(pid, 0.0) + 1.0 / (RRF_K + rank + 1)
+        best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+        return SearchResults([(snapshot.index.passages[pid], score) for pid, score in best], snapshot)
+
+    def search(self, question, k=5):
+        """
+        Return the top-k (passage, score) pairs for a question, ranked by
+        reciprocal rank fusion of the BM25 and embedding rankings.
+        """
+        snapshot = self._current_snapshot()
+        with span("retrieve"):
+            candidates = 2 * k
+            lexical = snapshot.index.search_ids(question, candidates)
+            semantic = self.embeddings.search(question, candidates, matrix=snapshot.vectors)
+            return self._fuse(snapshot, lexical, semantic, k)
+
+    def search_many(self, questions, k=5, block=SEARCH_BLOCK):
+        """
+        search() for a list of questions against one snapshot, with the BM25
+        and embedding scores of `block` questions at a time computed as
+        matrices instead of question by question
+        """
+        snapshot = self._current_snapshot()
+        results = []
+        with span("retrieve"):
+            candidates = 2 * k
+            for start in range(0, len(questions), block):
+                chunk = questions[start:start + block]
+                lexical = [top_k(row, candidates) for row in snapshot.index.scores_many(chunk)]
+                semantic = self.embeddings.search_many(chunk, candidates, matrix=snapshot.vectors)
+                results.extend(self._fuse(snapshot, *rankings, k) for rankings in zip(lexical, semantic))
+        return results
+
+    def search_batch(self, questions, k=5):
+        """A SearchBatch holding the results of search_many() for `questions`"""
+        questions = list(dict.fromkeys(questions))
+        return SearchBatch(self, dict(zip(questions, self.search_many(questions, k))), k)
+
+
+class SearchBatch:
+    """
+    Search results computed ahead for a batch of questions, served back one
+    question at a time through the part of the KnowledgeBase interface that
+    DocumentStage uses. Questions outside the batch, or a larger k, go to
+    the knowledge base.
+    """
+
+    def __init__(self, knowledge_base, results, k):
+        self.knowledge_base = knowledge_base
+        self.results = results  # question -> search() results
+        self.k = k
+
+    def search(self, question, k=5):
+        results = self.results.get(question)
+        if results is None or k > self.k:
+            return self.knowledge_base.search(question, k)
+        return SearchResults(results[:k], results.snapshot)
+
+    def passage_images(self, results, limit=3):
+        return self.knowledge_base.passage_images(results, limit)
+
+
+def anchor_images(anchors, spans):
+    """
+    {passage index: image keys} for a document's (page, offset, key) picture
+    anchors, given its passages' (page, start, end) spans. A picture at a
+    character offset goes with the passages containing that offset (or the
+    last one before it); a picture of a page goes with that page's passages
+    (or the last passage before the page, when it has no text).
+    """
+    images = {}
+    for page, offset, key in anchors:
+        if offset is None:
+            hits = [i for i, (p, _, _) in enumerate(spans) if p == page]
+            before = [i for i, (p, _, _) in enumerate(spans) if p is not None and p < page]
+        else:
+            hits = [i for i, (_, start, end) in enumerate(spans) if start <= offset < end]
+            before = [i for i, (_, start, _) in enumerate(spans) if start <= offset]
+        for index in hits or before[-1:] or [0][:len(spans)]:
+            images.setdefault(index, ())
+            if key not in images[index]:
+                images[index] += (key,)
+    return images
+
+
+def source_label(source):
+    """Display name of a passage source: the file name for documents, the URL for web pages"""
+    if source.startswith(("http://", "https://")):
+        return source
+    return os.path.basename(source)
+
+
+def passage_label(passage):
+    """Citation for a passage: its source label plus the page for paged documents"""
+    label = source_label(passage.source)
+    if passage.page is not None:
+        label += f", page {passage.page}"
+    return label
+
+
+def format_passages(results):
+    """Render retrieved passages as prompt text chunks tagged with their source"""
+    return [f"[{passage_label(passage)}]\n{passage.text}" for passage, _ in results]
@@ -0,0 +1,123 @@
+# learn_crawler.py
+
+import asyncio
+import hashlib
+import logging
+import time
+from urllib.parse import urlparse
+
+from bc_query import BC_DOCS, learn_fetcher
+from corpus_store import CorpusDocument
+from trusted_sources import LEARN_RESOURCES
+
+logger = logging.getLogger(__name__)
+
+
+def learn_catalog():
+    """Every Microsoft Learn page the app links to, as {url: title}"""
+    catalog = {}
+    for section, data in BC_DOCS.items():
+        catalog[data["url"]] = data["title"]
+    for topic, url in LEARN_RESOURCES.items():
+        catalog.setdefault(url, f"Business Central {topic.title()}")
+    return catalog
+
+
+class LearnCrawler:
+    """
+    Fetches the whole Learn catalog concurrently with asyncio.
+
+    At most `concurrency` pages are fetched at once overall and `per_host`
+    per host, and requests to the same host start at least `host_delay`
+    seconds apart. Pages still fresh in the fetcher's cache cost no request;
+    stale ones are revalidated with a conditional GET. A page whose
+    revalidation fails keeps its cached (or previously crawled) text, so an
+    outage never takes pages out of the index; only pages that were never
+    fetched are left out.
+    """
+
+    def __init__(self, fetcher=None, urls=None, concurrency=8, per_host=2, host_delay=0.25):
+        self.fetcher = fetcher or learn_fetcher
+        self.urls = list(urls) if urls is not None else list(learn_catalog())
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.host_delay = host_delay
+        self.pages = {}
+        self.last_crawl_seconds = None
+        self._hosts = {}
+
+    def _host_state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = {
+                "semaphore": asyncio.Semaphore(self.per_host),
+                "lock": asyncio.Lock(),
+                "last_start": 0.0,
+            }
+        return state
+
+    async def _polite_start(self, state):
+        async with state["lock"]:
+            wait = state["last_start"] + self.host_delay - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            state["last_start"] = time.monotonic()
+
+    async def _fetch(self, url, semaphore):
+        loop = asyncio.get_running_loop()
+        async with semaphore:
+            if self.fetcher.is_fresh(url):
+                return url, await loop.run_in_executor(None, self.fetcher.fetch, url)
+            state = self._host_state(urlparse(url).netloc)
+            async with state["semaphore"]:
+                await self._polite_start(state)
+                try:
+                    return url, await loop.run_in_executor(None, self.fetcher.refresh, url)
+                except Exception as e:
+                    text = await loop.run_in_executor(None, self.fetcher.cached, url) or self.pages.get(url)
+                    if text is None:
+                        raise
+                    logger.warning("Revalidating %s failed, keeping the cached copy: %s", url, e)
+                    return url, text
+
+    async def crawl(self):
+        """Fetch every catalog page; returns {url: extracted text} for pages that succeeded"""
+        start = time.perf_counter()
+        self._hosts = {}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._fetch(url, semaphore) for url in self.urls),
+                                       return_exceptions=True)
+        pages = {}
+        for url, result in zip(self.urls, results):
+            if isinstance(result, BaseException):
+                logger.warning("Error crawling %s: %s", url, result)
+            else:
+                pages[url] = result[1]
+        self.pages = pages
+        self.last_crawl_seconds = time.perf_counter() - start
+        return pages
+
+    def documents(self):
+        """The crawled pages as corpus documents for the knowledge base"""
+        documents = []
+        for url, text in sorted(self.pages.items()):
+            data = text.encode("utf-8")
+            documents.append(CorpusDocument(
+                path=url, mtime=0.0, size=len(data),
+                sha256=hashlib.sha256(data).hexdigest(), text=text,
+            ))
+        return documents
+
+    async def run_forever(self, knowledge_base, interval):
+        """Crawl now and then every `interval` seconds, feeding the knowledge base"""
+        while True:
+            try:
+                await self.crawl()
+                knowledge_base.set_external_documents("learn", self.documents())
+                # Re-index now rather than on the next question's request path
+                await asyncio.get_running_loop().run_in_executor(None, knowledge_base.refresh)
+                logger.info("Crawled %d/%d Learn pages in %.1fs",
+                            len(self.pages), len(self.urls), self.last_crawl_seconds)
+            except Exception as e:
+                logger.error("Learn crawl failed: %s", e)
+            await asyncio.sleep(interval)
@@ -0,0 +1,219 @@
+# learn_fetcher.py
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# Try multiple selectors to find the main content
+CONTENT_SELECTORS = [
+    'main',
+    'article',
+    'div[class*="content"]',
+    'div[class*="main"]',
+    'div[class*="article"]',
+    'div[role="main"]',
+    '.content',
+    '.main-content',
+    '.article-content',
+    '#content',
+    '#main'
+]
+
+
+def extract_learn_text(html, learn_link):
+    """
+    Extract the title and the first substantial paragraphs of a Microsoft
+    Learn page as plain text, ending with a "Source:" line.
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Extract the main content (title and description)
+    title = soup.find('title')
+    title_text = title.get_text().strip() if title else "Microsoft Learn Resource"
+
+    main_content = None
+    for selector in CONTENT_SELECTORS:
+        main_content = soup.select_one(selector)
+        if main_content:
+            break
+
+    if main_content:
+        # Extract paragraphs, headings, and lists
+        content_elements = main_content.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li'])
+        content_text = []
+
+        for element in content_elements[:15]:  # Limit to first 15 elements
+            text = element.get_text().strip()
+            if text and len(text) > 50:  # Only include substantial text
+                # Clean up the text
+                text = ' '.join(text.split())  # Remove extra whitespace
+                # Skip repetitive content
+                if text not in content_text and not text.startswith('©') and not text.startswith('Privacy'):
+                    content_text.append(text)
+
+        if content_text:
+            # Combine title and content
+            result = f"Title: {title_text}\n\n"
+            result += "\n\n".join(content_text[:5])  # Limit to first 5 paragraphs
+            result += f"\n\nSource: {learn_link}"
+            return result
+
+    # If main content not found, try to extract from body
+    body = soup.find('body')
+    if body:
+        # Remove script and style elements
+        for script in body(["script", "style", "nav", "header", "footer"]):
+            script.decompose()
+
+        # Get text content
+        text_content = body.get_text()
+        # Clean up the text
+        lines = [line.strip() for line in text_content.split('\n') if line.strip()]
+        content_lines = []
+
+        for line in lines:
+            if len(line) > 80 and not line.startswith('©') and not line.startswith('Privacy') and not line.startswith('Skip to'):
+                # Remove repetitive content
+                if line not in content_lines:
+                    content_lines.append(line)
+
+        if content_lines:
+            result = f"Title: {title_text}\n\n"
+            result += "\n\n".join(content_lines[:4])
+            result += f"\n\nSource: {learn_link}"
+            return result
+
+    # Fallback: return title and link if content extraction fails
+    return f"Title: {title_text}\n\nFor detailed information, visit: {learn_link}"
+
+
+def make_session(pool_size=10):
+    """A keep-alive requests.Session with a connection pool per host"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+class LearnFetcher:
+    """
+    Fetches Microsoft Learn pages through a pooled session and caches the
+    extracted text on disk.
+
+    Fresh entries (younger than `ttl`) are served without any request. Stale
+    entries are served immediately while a background conditional GET
+    (If-None-Match / If-Modified-Since) refreshes them; a 304 only renews the
+    timestamp, so the page is not re-downloaded or re-parsed.
+    """
+
+    def __init__(self, cache_dir=None, ttl=None, session=None, timeout=15, refresh_workers=2):
+        self.cache_dir = cache_dir or os.getenv("LEARN_CACHE_DIR", os.path.join(".cache", "learn"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("LEARN_CACHE_TTL", 24 * 3600))
+        self.session = session or make_session()
+        self.timeout = timeout
+        self._entries = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._refresh_pool = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="learn-refresh")
+
+    def _entry_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _load_entry(self, url):
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry is not None:
+            return entry
+        try:
+            with open(self._entry_path(url), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._entries[url] = entry
+        return entry
+
+    def _save_entry(self, url, entry):
+        with self._lock:
+            self._entries[url] = entry
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._entry_path(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def _download(self, url, entry=None):
+        """Conditional GET; returns the new cache entry"""
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = self.session.get(url, timeout=self.timeout, headers=headers)
+        if response.status_code == 304 and entry:
+            entry = dict(entry, fetched=time.time())
+        else:
+            response.raise_for_status()
+            entry = {
+                "url": url,
+                "text": extract_learn_text(response.content, url),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched": time.time(),
+            }
+        self._save_entry(url, entry)
+        return entry
+
+    def _background_refresh(self, url, entry):
+        try:
+            self._download(url, entry)
+        except Exception as e:
+            logger.warning("Background refresh of %s failed: %s", url, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(url)
+
+    def is_fresh(self, url):
+        entry = self._load_entry(url)
+        return entry is not None and time.time() - entry["fetched"] < self.ttl
+
+    def fetch(self, url):
+        """Return the extracted text of a page, from cache when possible"""
+        entry = self._load_entry(url)
+        if entry is None:
+            return self._download(url)["text"]
+
+        if time.time() - entry["fetched"] >= self.ttl:
+            with self._lock:
+                start = url not in self._refreshing
+                self._refreshing.add(url)
+            if start:
+                self._refresh_pool.submit(self._background_refresh, url, entry)
+        return entry["text"]
+
+    def cached(self, url):
+        """The cached text of a page whatever its age, or None when it was never fetched"""
+        entry = self._load_entry(url)
+        return entry["text"] if entry is not None else None
+
+    def refresh(self, url):
+        """Revalidate a page now, regardless of its age; returns the extracted text"""
+        return self._download(url, self._load_entry(url))["text"]
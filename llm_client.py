@@ -0,0 +1,368 @@
+# llm_client.py
+
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+
+# google.generativeai and its gRPC stack take most of a second to import, so they
+# are imported when the first call needs a client rather than with this module
+
+GEMINI_MODEL = "models/gemini-1.5-pro-latest"
+
+# HTTP statuses of a call worth repeating: rate limited, or a transient server-side failure
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class LLMError(Exception):
+    """An LLM call failed. Callers fall back to another answer; the message is never an answer itself."""
+
+
+class LLMUnavailable(LLMError):
+    """The circuit breaker is open, so the call was not attempted"""
+
+
+def status_of(error):
+    """HTTP status of a Google API error, or None for errors that carry none"""
+    code = getattr(error, "code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(error):
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    return status_of(error) in RETRYABLE_STATUS
+
+
+def is_client_error(error):
+    """A 4xx other than 429: the request was at fault, not the service"""
+    status = status_of(error)
+    return status is not None and 400 <= status < 500 and status != 429
+
+
+class TokenBucket:
+    """
+    Allows `rate` calls per second on average with bursts of up to `capacity`.
+    A caller that finds the bucket empty reserves the next token and sleeps
+    until it is due, so waiters are served in arrival order.
+    """
+
+    def __init__(self, rate, capacity=1.0):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how many seconds to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Stops calling a service that keeps failing. After `failure_threshold`
+    consecutive failures the circuit opens and calls are refused for
+    `reset_timeout` seconds. Then one trial call is let through (half-open):
+    its success closes the circuit, its failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go ahead now"""
+        with self._lock:
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_running = False
+            if self.state == self.HALF_OPEN:
+                if self._trial_running:
+                    return False
+                self._trial_running = True
+            return self.state != self.OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED
+                                                and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+                self.times_opened += 1
+            self._trial_running = False
+
+    def release(self):
+        """A call ended without a verdict (it was cancelled); let another trial through"""
+        with self._lock:
+            self._trial_running = False
+
+
+class _SingleAttempt:
+    """
+    A GenerativeService async client with the library's built-in retry turned
+    off, so LLMClient's backoff is the only retry layer and attempts do not
+    multiply.
+    """
+
+    def __init__(self, client, timeout):
+        self._client = client
+        self._timeout = timeout
+
+    def generate_content(self, request):
+        return self._client.generate_content(request, retry=None, timeout=self._timeout)
+
+    def stream_generate_content(self, request):
+        return self._client.stream_generate_content(request, retry=None, timeout=self._timeout)
+
+
+class _Model:
+    """
+    The generate_content_async() of genai.GenerativeModel on a client of our
+    own: requests and responses are the library's public types, so the SDK's
+    default, process-wide async client is never involved.
+    """
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    async def generate_content_async(self, contents, stream=False):
+        import google.ai.generativelanguage as glm
+        from google.generativeai.types import AsyncGenerateContentResponse, content_types
+
+        request = glm.GenerateContentRequest(model=self.name, contents=content_types.to_contents(contents))
+        if stream:
+            return await AsyncGenerateContentResponse.from_aiterator(await self.client.stream_generate_content(request))
+        return AsyncGenerateContentResponse.from_response(await self.client.generate_content(request))
+
+
+class _LoopState:
+    """gRPC client, models and concurrency limit of one event loop; grpc.aio channels cannot be shared"""
+
+    def __init__(self, max_concurrency):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.client = None
+        self.models = {}  # model name -> _Model
+
+
+class LLMClient:
+    """
+    Long-lived Gemini client shared by every request.
+
+    The gRPC channel and a model per model name are created once
+    (per event loop) and reused. At most `max_concurrency` calls are in flight
+    and, with `requests_per_minute`, a token bucket smooths bursts of
+    questions into a steady request rate. Calls failing with 429 or a 5xx are
+    retried up to `max_retries` times after a full-jitter exponential backoff
+    delay, and a circuit breaker refuses calls outright while Gemini keeps
+    failing. Every failure raises LLMError.
+
+    `endpoint` points the client at a plaintext gRPC server instead of the
+    Gemini API, e.g. benchmarks.fake_gemini.FakeGemini.
+    """
+
+    def __init__(self, api_key=None, model_name=GEMINI_MODEL, max_concurrency=4, requests_per_minute=None,
+                 burst=10, max_retries=3, base_delay=0.5, max_delay=8.0, timeout=60.0, breaker=None,
+                 endpoint=None):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst) if requests_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.endpoint = endpoint
+        self.calls = 0  # attempts sent, retries included
+        self.retries = 0
+        self.failures = 0  # calls that raised LLMError after their last attempt
+        self.rejected = 0  # calls refused by the open circuit
+        self.in_flight = 0
+        self._states = weakref.WeakKeyDictionary()  # event loop -> _LoopState
+        self._lock = threading.Lock()
+
+    # -- per-loop resources ---------------------------------------------------
+
+    def _state(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._states.get(loop)
+            if state is None:
+                state = self._states[loop] = _LoopState(self.max_concurrency)
+            return state
+
+    def _make_client(self):
+        import google.ai.generativelanguage as glm
+
+        if self.endpoint:
+            import grpc
+            from google.ai.generativelanguage_v1beta.services.generative_service.transports.grpc_asyncio import (
+                GenerativeServiceGrpcAsyncIOTransport)
+            transport = GenerativeServiceGrpcAsyncIOTransport(channel=grpc.aio.insecure_channel(self.endpoint))
+            return glm.GenerativeServiceAsyncClient(transport=transport)
+        api_key = self.api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise LLMError("GEMINI_API_KEY is not set")
+        return glm.GenerativeServiceAsyncClient(client_options={"api_key": api_key})
+
+    def model(self, model_name=None):
+        """The cached model for a model name on the running event loop"""
+        name = model_name or self.model_name
+        state = self._state()
+        model = state.models.get(name)
+        if model is None:
+            if state.client is None:
+                state.client = _SingleAttempt(self._make_client(), self.timeout)
+            model = state.models[name] = _Model(state.client, name if "/" in name else f"models/{name}")
+        return model
+
+    # -- calls ----------------------------------------------------------------
+
+    def backoff(self, attempt):
+        """Full jitter: a random delay up to base_delay * 2**attempt, capped at max_delay"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def _call(self, request, hold_slot=False):
+        """
+        Run `request(model)` under the rate and concurrency limits, retrying
+        transient failures. Returns (result, release). With hold_slot the
+        concurrency slot stays taken after success until release() is called,
+        which is how a stream keeps its slot while it is being read.
+        """
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise LLMUnavailable("Gemini is unavailable after repeated failures; try again shortly")
+        settled = False
+        try:
+            state = self._state()
+            model = self.model()
+            for attempt in range(self.max_retries + 1):
+                if self.bucket is not None:
+                    await self.bucket.acquire()
+                await state.semaphore.acquire()
+                self.in_flight += 1
+                self.calls += 1
+                released = False
+
+                def release():
+                    nonlocal released
+                    if not released:
+                        released = True
+                        self.in_flight -= 1
+                        state.semaphore.release()
+
+                try:
+                    result = await request(model)
+                except Exception as e:
+                    release()
+                    error = e
+                except BaseException:
+                    release()
+                    raise
+                else:
+                    if not hold_slot:
+                        release()
+                    self.breaker.record_success()
+                    settled = True
+                    return result, release
+
+                if (not is_retryable(error) or attempt == self.max_retries
+                        or self.breaker.state == CircuitBreaker.OPEN):
+                    break
+                self.retries += 1
+                await asyncio.sleep(self.backoff(attempt))
+
+            self.failures += 1
+            if is_client_error(error):
+                # Gemini answered; the request itself was rejected
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+            settled = True
+            raise LLMError(f"Gemini request failed: {error}") from error
+        finally:
+            if not settled:
+                self.breaker.release()
+
+    async def generate(self, parts):
+        """The complete answer for the given content parts"""
+        response, _ = await self._call(lambda model: model.generate_content_async(parts))
+        try:
+            return response.text
+        except ValueError as e:
+            # Blocked by safety filters, or no candidate at all
+            raise LLMError(f"Gemini returned no text: {e}") from e
+
+    async def stream(self, parts):
+        """
+        Yield the answer as text fragments while it is being generated. Only
+        opening the stream is retried: once text has been yielded a failure
+        raises LLMError, since the fragments cannot be taken back.
+        """
+        response, release = await self._call(
+            lambda model: model.generate_content_async(parts, stream=True), hold_slot=True)
+        produced = False
+        try:
+            async for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    continue
+                if text:
+                    produced = True
+                    yield text
+        except Exception as e:
+            self.failures += 1
+            self.breaker.record_failure()
+            raise LLMError(f"Gemini stream failed: {e}") from e
+        finally:
+            release()
+        if not produced:
+            raise LLMError("Gemini returned no text")
+
+    def stats(self):
+        return {
+            "model": self.model_name,
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.times_opened,
+            "consecutive_failures": self.breaker.failures,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "requests_per_minute": round(self.bucket.rate * 60, 1) if self.bucket else None,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
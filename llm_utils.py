@@ -1,44 +1,90 @@
-import google.generativeai as genai
-from PIL import Image
-import io
+import asyncio
+import hashlib
 import os
 from dotenv import load_dotenv
+from llm_client import GEMINI_MODEL, CircuitBreaker, LLMClient
+from single_flight import SingleFlight
 
-# Load environment variables from .env.local
+# Load environment variables from .env.local; cheap, and the settings read on
+# import below (and in main) may come from it
 load_dotenv('.env.local')
 
-# Use Gemini API key from environment variables
-api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
-    raise ValueError("GEMINI_API_KEY environment variable is not set. Please add it to your .env.local file.")
+# One client for the whole process, so the rate limit, the retry budget and
+# the circuit breaker see every Gemini call. GEMINI_ENDPOINT points it at a
+# local fake server for load tests. The API key is set by configure().
+llm = LLMClient(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 4)),
+    requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", 60)) or None,
+    burst=int(os.getenv("LLM_BURST", 10)),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", 3)),
+    timeout=float(os.getenv("LLM_TIMEOUT", 60)),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", 5)),
+        reset_timeout=float(os.getenv("LLM_BREAKER_RESET", 30)),
+    ),
+    endpoint=os.getenv("GEMINI_ENDPOINT") or None,
+)
 
-genai.configure(api_key=api_key)
+# Identical prompts in flight at the same time share one Gemini call
+gemini_flight = SingleFlight("gemini")
 
-def query_gemini(query, text_chunks, images):
-    # ✅ FIXED: Use the correct model names
-    model_name = "models/gemini-1.5-pro-latest" if images else "models/gemini-1.5-pro-latest"
-    model = genai.GenerativeModel(model_name)
+def configure():
+    """
+    Give the Gemini key to the client and to google.generativeai (used for
+    count_tokens). Called once at startup rather than on import, so
+    importing this module needs neither the key nor the Gemini SDK. Raises
+    ValueError when the key is missing.
+    """
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY environment variable is not set. Please add it to your .env.local file.")
+    llm.api_key = api_key
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
 
+def build_input_parts(query, text_chunks, images):
+    """
+    Assemble the Gemini content parts for a question. `images` are inline
+    data parts ({"mime_type": ..., "data": bytes}, see ImageStore.part),
+    encoded once at ingestion, so they are passed through as they are.
+    """
     input_parts = []
 
     # Add text chunks if available
     if text_chunks:
         input_parts.append({"text": "\n".join(text_chunks)})
 
-    # Add images as byte buffers
-    for image in images:
-        buf = io.BytesIO()
-        image.save(buf, format='PNG')
-        buf.seek(0)
-        input_parts.append({"image": buf.read()})
+    input_parts.extend(images)
 
     # Add the query
     input_parts.append({"text": query})
+    return input_parts
 
-    try:
-        response = model.generate_content(input_parts)
-        return response.text
-    except Exception as e:
-        return f"Gemini Error: {str(e)}"
+def prompt_key(query, text_chunks, images=()):
+    """Identity of a prompt, for collapsing identical concurrent calls"""
+    digest = hashlib.sha256(GEMINI_MODEL.encode("utf-8"))
+    for text in (*text_chunks, query):
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+    for image in images:
+        digest.update(b"\1")
+        digest.update(image["mime_type"].encode("utf-8"))
+        digest.update(hashlib.sha256(image["data"]).digest())
+    return digest.hexdigest()
+
+def query_gemini(query, text_chunks, images):
+    """Blocking variant of query_gemini_async, for scripts; raises LLMError on failure"""
+    if llm.api_key is None:
+        configure()
+    return asyncio.run(query_gemini_async(query, text_chunks, images))
 
+async def query_gemini_async(query, text_chunks, images):
+    """Gemini's answer to a question with its context; raises LLMError on failure"""
+    input_parts = build_input_parts(query, text_chunks, images)
+    return await gemini_flight.do_async(prompt_key(query, text_chunks, images), llm.generate, input_parts)
 
+async def stream_gemini_async(query, text_chunks, images):
+    """Yield the Gemini answer as text fragments while it is being generated; raises LLMError on failure"""
+    async for text in llm.stream(build_input_parts(query, text_chunks, images)):
+        yield text
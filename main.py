@@ -1,16 +1,389 @@
 # main.py
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+import asyncio
+import contextvars
+import hmac
+from contextlib import asynccontextmanager
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import uvicorn
-from llm_utils import query_gemini
-from document_parser import parse_documents
+from llm_utils import GEMINI_MODEL, gemini_flight, llm, query_gemini_async, stream_gemini_async
+from llm_utils import configure as configure_llm
+from llm_client import LLMError
+from answer_cache import AnswerCache, context_fingerprint, context_passages, normalize_question
+from context_packer import ContextPacker, GeminiTokenCounter, PromptMetrics, estimate_tokens
+from corpus_store import CorpusStore
+from corpus_snapshot import SnapshotError, open_snapshot
+from document_uploads import DocumentUploads, UploadRejected
+from document_watcher import DocumentWatcher
+from image_store import ImageStore
+from answer_pipeline import (AnswerPipeline, BusinessCentralStage, DocumentStage,
+                             GeminiStage, TrustedSourcesStage)
+from bc_query import BC_DOCS, bc_router, fetch_microsoft_learn_content, learn_fetch_flight
+from knowledge_base import KnowledgeBase
+from metrics import CONTENT_TYPE, REGISTRY, ServerTimingMiddleware, span
+from static_assets import AssetStore
+from learn_crawler import LearnCrawler
+from trusted_sources import LEARN_RESOURCES, resource_router
 import json
 
-app = FastAPI(title="Dataposit AI Agent API")
+# LOG_LEVEL=DEBUG shows per-file parse details and routing decisions
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(),
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("main")
+
+# Pictures in PDF and DOCX files, downscaled once at ingestion and kept on disk
+# by content; those of retrieved passages go to Gemini with the question
+image_store = ImageStore(
+    max_side=int(os.getenv("IMAGE_MAX_SIDE", 1024)),
+    max_bytes=int(float(os.getenv("IMAGE_MAX_KB", 150)) * 1024),
+)
+MAX_PROMPT_IMAGES = int(os.getenv("MAX_PROMPT_IMAGES", 3))
+
+# Parsed once at startup; later requests only re-parse added or changed files.
+# The deploy build writes a corpus snapshot (python corpus_snapshot.py build, see
+# render.yaml); its documents and index are memory-mapped instead of rebuilt.
+corpus = CorpusStore("Documents", image_store=image_store)
+try:
+    corpus_snapshot = open_snapshot()
+except SnapshotError as e:
+    logger.warning("Ignoring corpus snapshot: %s", e)
+    corpus_snapshot = None
+if corpus_snapshot is not None:
+    corpus.load_documents(corpus_snapshot.corpus_documents())
+corpus.refresh(force=True)
+
+# With the watcher on, changed files are re-indexed in the background and
+# questions never rescan the folder; set DOCUMENT_WATCH=0 to rescan per question
+DOCUMENT_WATCH = os.getenv("DOCUMENT_WATCH", "1") != "0"
+knowledge_base = KnowledgeBase(corpus, auto_refresh=not DOCUMENT_WATCH)
+if corpus_snapshot is not None:
+    try:
+        if knowledge_base.load_corpus_snapshot(corpus_snapshot):
+            logger.info("Mapped corpus snapshot %s: %d passages in %.1f ms", corpus_snapshot.path,
+                        len(corpus_snapshot.passages), corpus_snapshot.load_seconds * 1000)
+        else:
+            logger.info("Corpus snapshot %s is out of date; changed documents will be re-indexed",
+                        corpus_snapshot.path)
+    except ValueError as e:
+        logger.warning("Ignoring corpus snapshot: %s", e)
+document_watcher = DocumentWatcher(
+    corpus, knowledge_base,
+    debounce=float(os.getenv("DOCUMENT_WATCH_DEBOUNCE", 1.0)),
+    poll_interval=float(os.getenv("DOCUMENT_WATCH_POLL_INTERVAL", 2.0)),
+)
+
+# Number of retrieved passages sent to Gemini with each question
+TOP_K_PASSAGES = int(os.getenv("TOP_K_PASSAGES", 5))
+
+# Uploaded documents are staged on disk and ingested by a bounded background queue
+document_uploads = DocumentUploads(
+    corpus, knowledge_base,
+    workers=int(os.getenv("UPLOAD_WORKERS", 1)),
+    max_queued=int(os.getenv("UPLOAD_QUEUE_SIZE", 16)),
+    max_bytes=int(float(os.getenv("MAX_UPLOAD_MB", 50)) * 1024 * 1024),
+)
+# POST /documents requires this value in the X-Upload-Token header; uploads are
+# refused altogether while it is not set
+UPLOAD_TOKEN = os.getenv("DOCUMENT_UPLOAD_TOKEN")
+
+# Microsoft Learn catalog, crawled in the background and indexed with the documents
+learn_crawler = LearnCrawler()
+LEARN_PREFETCH = os.getenv("LEARN_PREFETCH", "1") != "0"
+LEARN_CRAWL_INTERVAL = float(os.getenv("LEARN_CRAWL_INTERVAL", 6 * 3600))
+
+# Answers keyed on question + retrieved context; a document change changes the
+# context fingerprint, so stale answers are never served
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", 1024)),
+    ttl=float(os.getenv("ANSWER_CACHE_TTL", 3600)),
+    db_path=os.getenv("ANSWER_CACHE_DB") or None,
+    similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY")) if os.getenv("ANSWER_CACHE_SIMILARITY") else None,
+    context_overlap=float(os.getenv("ANSWER_CACHE_CONTEXT_OVERLAP", 0.5)),
+)
+
+# Context sent to Gemini is packed into a token budget: near-duplicates are
+# dropped and long passages compressed. TOKEN_COUNTER=gemini counts with the
+# count_tokens API instead of the local estimate.
+context_packer = ContextPacker(
+    budget=int(os.getenv("PROMPT_TOKEN_BUDGET", 3000)),
+    max_chunk_tokens=int(os.getenv("MAX_PASSAGE_TOKENS", 800)),
+    count_tokens=GeminiTokenCounter(GEMINI_MODEL) if os.getenv("TOKEN_COUNTER") == "gemini" else estimate_tokens,
+)
+prompt_metrics = PromptMetrics()
+
+# Bounded pool for blocking work (document parsing, index rebuilds) so it never
+# runs on the event loop
+executor = ThreadPoolExecutor(max_workers=int(os.getenv("PIPELINE_WORKERS", 4)),
+                              thread_name_prefix="ask-pipeline")
+
+# Seconds a single question may take before the request fails with 504
+ASK_TIMEOUT = float(os.getenv("ASK_TIMEOUT", 60))
+
+# Questions of one POST /ask/batch answered at a time, and the most it accepts.
+# Gemini calls are also bounded by LLM_MAX_CONCURRENCY and the rate limit.
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+MAX_BATCH_QUESTIONS = int(os.getenv("MAX_BATCH_QUESTIONS", 1000))
+
+# How often to check whether the client has gone away
+DISCONNECT_POLL_INTERVAL = 0.5
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking callable in the pipeline thread pool"""
+    loop = asyncio.get_running_loop()
+    # Carry the request's context along, so spans in the worker reach its Server-Timing header
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor, partial(context.run, func, *args, **kwargs))
+
+
+# The documented fallback chain: Documents and Business Central run concurrently
+# (Documents wins when both are confident), then Trusted Sources, then Gemini
+answer_pipeline = AnswerPipeline(
+    [
+        [
+            DocumentStage(knowledge_base, TOP_K_PASSAGES,
+                          budget=float(os.getenv("DOCUMENT_STAGE_BUDGET", 10)),
+                          max_images=MAX_PROMPT_IMAGES),
+            BusinessCentralStage(bc_router, BC_DOCS, fetch_microsoft_learn_content,
+                                 budget=float(os.getenv("BC_STAGE_BUDGET", 8))),
+        ],
+        [TrustedSourcesStage(resource_router, LEARN_RESOURCES)],
+        [GeminiStage()],
+    ],
+    run_blocking,
+)
+
+NO_ANSWER = "Sorry, I couldn't find an answer to that question."
+RETRIEVAL_ONLY_ANSWER = "The AI assistant is unavailable right now. These passages best match your question:"
+LLM_UNAVAILABLE = "The AI assistant is unavailable right now. Please try again in a moment."
+
+
+async def run_until_disconnected(request, coro, timeout):
+    """
+    Await coro, cancelling it when the client disconnects or the timeout passes.
+    Work already running in the thread pool finishes in the background, but its
+    result is discarded and the LLM call is never started.
+    """
+    task = asyncio.ensure_future(coro)
+
+    async def wait_for_disconnect():
+        while not await request.is_disconnected():
+            await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+    watcher = asyncio.ensure_future(wait_for_disconnect())
+    try:
+        done, _ = await asyncio.wait({task, watcher}, timeout=timeout,
+                                     return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+
+    if task in done:
+        return task.result()
+
+    task.cancel()
+    if watcher in done:
+        # 499 is the de facto status for "client closed request"; nobody reads it
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    raise HTTPException(status_code=504, detail=f"Question timed out after {timeout:g}s")
+
+
+async def pack_context(question, text_chunks, timings):
+    """Fit the winning stage's context into the prompt token budget"""
+    with span("prompt_build") as timer:
+        packed = await run_blocking(context_packer.pack, question, text_chunks)
+    timings["Context packing"] = timer.milliseconds
+    return packed
+
+
+def fallback_answer(question, packed, error):
+    """
+    Answer without Gemini: the last answer given to the same question if
+    there is one, else the retrieved passages themselves. Returns (answer,
+    degraded) where degraded says which fallback was used.
+    """
+    stale = answer_cache.get_stale(question)
+    if stale is not None:
+        degraded, answer = "cached", stale
+    elif packed.chunks:
+        degraded, answer = "retrieval", RETRIEVAL_ONLY_ANSWER + "\n\n" + "\n\n".join(packed.chunks)
+    else:
+        degraded, answer = "unavailable", LLM_UNAVAILABLE
+    logger.warning("LLM call failed, answering from %s: %s", degraded, error)
+    return answer, degraded
+
+
+async def generate_answer(question, packed, timings, images=()):
+    """
+    Ask Gemini with the packed context and the pictures with ImageStore keys
+    `images`, going through the answer cache. Returns (answer, degraded);
+    degraded is None unless Gemini failed and a fallback answer was used.
+    """
+    fingerprint = context_fingerprint(packed.chunks, images)
+    passages = context_passages(packed.chunks, images)
+    cached = answer_cache.get(question, fingerprint, passages)
+    if cached is not None:
+        return cached, None
+
+    try:
+        image_parts = await run_blocking(image_store.parts, images) if images else []
+        with span("llm") as timer:
+            answer = await query_gemini_async(question, packed.chunks, image_parts)
+    except LLMError as e:
+        timings["LLM"] = timer.milliseconds
+        return fallback_answer(question, packed, e)
+    timings["LLM"] = timer.milliseconds
+    prompt_metrics.record(packed, timer.seconds)
+    answer_cache.put(question, fingerprint, answer, timer.seconds, passages)
+    return answer, None
+
+
+async def answer_question(question, pipeline=None):
+    """Run the answer pipeline (or `pipeline`) for a question without blocking the event loop"""
+    outcome = await (pipeline or answer_pipeline).run(question)
+    if outcome is None:
+        return {"answer": NO_ANSWER, "source": "None", "sources": [], "timings": {}}
+
+    result = outcome.result
+    answer = result.answer
+    response = {"source": outcome.source, "sources": result.sources, "timings": outcome.timings}
+    if answer is None:
+        packed = await pack_context(question, result.context, outcome.timings)
+        answer, degraded = await generate_answer(question, packed, outcome.timings, result.images)
+        response["prompt"] = packed.summary()
+        if degraded:
+            response["degraded"] = degraded
+    return dict(response, answer=answer)
+
+
+async def answer_batch(questions):
+    """
+    Yield one NDJSON line per question as its answer is ready, tagged with
+    the question's position in `questions`. Questions that are the same once
+    normalized are answered once. Retrieval for the whole batch runs first,
+    in one KnowledgeBase.search_many() pass; then at most BATCH_CONCURRENCY
+    questions go through the pipeline at a time. A question that fails or
+    times out gets a line with an `error` instead of an answer.
+    """
+    positions = {}  # normalized question -> indices in `questions`
+    for index, question in enumerate(questions):
+        positions.setdefault(normalize_question(question), []).append(index)
+    unique = {key: questions[indices[0]] for key, indices in positions.items()}
+    batch = await run_blocking(knowledge_base.search_batch, list(unique.values()), TOP_K_PASSAGES)
+    pipeline = answer_pipeline.with_knowledge_base(batch)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def answer(key):
+        async with semaphore:
+            try:
+                return key, await asyncio.wait_for(answer_question(unique[key], pipeline), ASK_TIMEOUT)
+            except asyncio.TimeoutError:
+                return key, {"error": f"Question timed out after {ASK_TIMEOUT:g}s"}
+            except Exception as e:
+                return key, {"error": str(e)}
+
+    tasks = [asyncio.ensure_future(answer(key)) for key in unique]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            key, response = await finished
+            for index in positions[key]:
+                yield json.dumps(dict(response, index=index, question=questions[index])) + "\n"
+    finally:
+        # The client went away: stop answering
+        for task in tasks:
+            task.cancel()
+
+
+def sse_event(event, data):
+    """Format one Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_answer(question):
+    """
+    Yield the answer as SSE messages: a `token` event per text fragment, then
+    a `done` event with the full answer, the winning source and stage timings,
+    or an `error` event.
+    """
+    try:
+        outcome = await asyncio.wait_for(answer_pipeline.run(question), ASK_TIMEOUT)
+        if outcome is None:
+            yield sse_event("token", {"text": NO_ANSWER})
+            yield sse_event("done", {"answer": NO_ANSWER, "source": "None", "sources": [], "timings": {}})
+            return
+
+        result = outcome.result
+        done = {"source": outcome.source, "sources": result.sources, "timings": outcome.timings}
+        answer = result.answer
+        if answer is None:
+            packed = await pack_context(question, result.context, outcome.timings)
+            done["prompt"] = packed.summary()
+            fingerprint = context_fingerprint(packed.chunks, result.images)
+            passages = context_passages(packed.chunks, result.images)
+            answer = answer_cache.get(question, fingerprint, passages)
+            if answer is not None:
+                done["cached"] = True
+        if answer is not None:
+            yield sse_event("token", {"text": answer})
+            yield sse_event("done", dict(done, answer=answer))
+            return
+
+        answer = ""
+        image_parts = await run_blocking(image_store.parts, result.images) if result.images else []
+        try:
+            with span("llm") as timer:
+                async for text in stream_gemini_async(question, packed.chunks, image_parts):
+                    answer += text
+                    yield sse_event("token", {"text": text})
+        except LLMError as e:
+            if answer:
+                # Part of the answer is already on screen; report the failure instead
+                raise
+            answer, degraded = fallback_answer(question, packed, e)
+            yield sse_event("token", {"text": answer})
+            yield sse_event("done", dict(done, answer=answer, degraded=degraded))
+            return
+        outcome.timings["LLM"] = timer.milliseconds
+        prompt_metrics.record(packed, timer.seconds)
+        answer_cache.put(question, fingerprint, answer, timer.seconds, passages)
+        yield sse_event("done", dict(done, answer=answer))
+    except asyncio.TimeoutError:
+        yield sse_event("error", {"detail": f"Question timed out after {ASK_TIMEOUT:g}s"})
+    except Exception as e:
+        yield sse_event("error", {"detail": str(e)})
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Set up the Gemini client and start the background Learn crawler and
+    document watcher; stop them on shutdown. Nothing here runs on import.
+    """
+    try:
+        configure_llm()
+    except ValueError as e:
+        # Serve anyway: questions are answered from the retrieved passages (see fallback_answer)
+        logger.error("%s Gemini calls will fail until it is set.", e)
+    if LEARN_PREFETCH:
+        # Warm the Learn page cache and index without delaying startup
+        app.state.learn_crawl_task = asyncio.ensure_future(
+            learn_crawler.run_forever(knowledge_base, LEARN_CRAWL_INTERVAL))
+    if DOCUMENT_WATCH:
+        await run_blocking(document_watcher.start)
+    try:
+        yield
+    finally:
+        if document_watcher.mode is not None:
+            await run_blocking(document_watcher.stop)
+        if LEARN_PREFETCH:
+            app.state.learn_crawl_task.cancel()
+
+app = FastAPI(title="Dataposit AI Agent API", lifespan=lifespan)
 
 # Add CORS middleware for production
 app.add_middleware(
@@ -21,29 +394,63 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="."), name="static")
+# SERVER_TIMING=1 adds a Server-Timing header with the request's spans
+# (parse, retrieve, fetch, prompt_build, llm), shown by browser dev tools
+if os.getenv("SERVER_TIMING", "0") != "0":
+    app.add_middleware(ServerTimingMiddleware)
+
+# State that already lives elsewhere, read when /metrics is scraped
+COALESCING_FLIGHTS = (knowledge_base.refresh_flight, learn_fetch_flight, gemini_flight)
+REGISTRY.counter("dataposit_answer_cache_lookups_total", "Answer cache lookups by result",
+                 lambda: {("hit",): answer_cache.hits, ("miss",): answer_cache.misses,
+                          ("stale",): answer_cache.stale_hits}, ["result"])
+REGISTRY.counter("dataposit_coalesced_calls_total",
+                 "Calls that shared the result of an identical call already in flight",
+                 lambda: {(f.name,): f.collapsed for f in COALESCING_FLIGHTS}, ["flight"])
+REGISTRY.counter("dataposit_coalescing_calls_total", "Calls that did the work for their flight",
+                 lambda: {(f.name,): f.calls for f in COALESCING_FLIGHTS}, ["flight"])
+REGISTRY.counter("dataposit_llm_calls_total", "Gemini call attempts, retries included", lambda: llm.calls)
+REGISTRY.counter("dataposit_llm_retries_total", "Gemini calls retried after a 429 or 5xx", lambda: llm.retries)
+REGISTRY.counter("dataposit_llm_failures_total", "Gemini calls that failed after their last attempt",
+                 lambda: llm.failures)
+REGISTRY.counter("dataposit_llm_rejected_total", "Gemini calls refused by the open circuit breaker",
+                 lambda: llm.rejected)
+REGISTRY.gauge("dataposit_llm_circuit_open", "1 while the Gemini circuit breaker is open or half-open",
+               lambda: int(llm.breaker.state != llm.breaker.CLOSED))
+REGISTRY.gauge("dataposit_index_generation", "Generation of the current index snapshot",
+               lambda: knowledge_base.snapshot.generation)
+REGISTRY.gauge("dataposit_indexed_passages", "Passages in the current index snapshot",
+               lambda: len(knowledge_base.snapshot.index))
+
+# Frontend files, held in memory with their gzip/brotli variants; only these are
+# served. STATIC_RELOAD=1 re-reads edited files without a restart.
+assets = AssetStore(reload=os.getenv("STATIC_RELOAD", "0") != "0")
 
 # Serve static files
 @app.get("/")
-async def read_index():
-    return FileResponse("index.html")
+async def read_index(request: Request):
+    return assets.response("index.html", request)
 
 @app.get("/styles.css")
-async def read_styles():
-    return FileResponse("styles.css")
+async def read_styles(request: Request):
+    return assets.response("styles.css", request)
 
 @app.get("/script.js")
-async def read_script():
-    return FileResponse("script.js")
+async def read_script(request: Request):
+    return assets.response("script.js", request)
 
 @app.get("/auth.js")
-async def read_auth():
-    return FileResponse("auth.js")
+async def read_auth(request: Request):
+    return assets.response("auth.js", request)
 
 @app.get("/api.js")
-async def read_api():
-    return FileResponse("api.js")
+async def read_api(request: Request):
+    return assets.response("api.js", request)
+
+@app.get("/assets/{filename}")
+async def read_hashed_asset(filename: str, request: Request):
+    """Content-hashed asset URLs, as linked from index.html; cached by browsers for a year"""
+    return assets.hashed_response(filename, request)
 
 @app.get("/api/firebase-config")
 async def get_firebase_config():
@@ -67,20 +474,96 @@ async def get_firebase_config():
     
     return config
 
+@app.get("/metrics")
+async def get_metrics():
+    """Span latency histograms and service counters in the Prometheus text format"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.get("/admin/cache")
+async def get_cache_stats():
+    """Answer cache hit/miss counters"""
+    return answer_cache.stats()
+
+@app.get("/admin/prompts")
+async def get_prompt_stats():
+    """Prompt token counts and LLM latency of recent requests, for tuning PROMPT_TOKEN_BUDGET"""
+    return dict(prompt_metrics.stats(), budget=context_packer.budget)
+
+@app.get("/admin/llm")
+async def get_llm_stats():
+    """Gemini call, retry and failure counters and the circuit breaker state"""
+    return llm.stats()
+
+@app.get("/admin/coalescing")
+async def get_coalescing_stats():
+    """How many index refreshes, Learn fetches and Gemini calls were shared with an identical call in flight"""
+    return {flight.name: flight.stats() for flight in COALESCING_FLIGHTS}
+
+@app.get("/admin/index")
+async def get_index_stats():
+    """Index generation, file count and how long the last ingest took"""
+    return document_watcher.stats()
+
+@app.get("/admin/assets")
+async def get_asset_stats():
+    """Served frontend files with their hashed URLs and compressed sizes"""
+    return assets.stats()
+
+@app.post("/documents", status_code=202)
+async def upload_document(file: UploadFile = File(...), x_upload_token: str = Header(None)):
+    """Add a document: stream it to disk and queue it for parsing and indexing"""
+    if not UPLOAD_TOKEN:
+        raise HTTPException(status_code=403, detail="Uploads are disabled: DOCUMENT_UPLOAD_TOKEN is not set")
+    if not hmac.compare_digest((x_upload_token or "").encode(), UPLOAD_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid upload token")
+    try:
+        staged, sha256, size = await document_uploads.receive(file.filename, file.read)
+        job = document_uploads.submit(file.filename, staged, sha256, size)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    finally:
+        await file.close()
+    return job.to_dict()
+
+@app.get("/documents/jobs/{job_id}")
+async def get_document_job(job_id: str):
+    """Progress of an uploaded document"""
+    job = document_uploads.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.to_dict()
+
 @app.post("/ask/")
-async def ask_question(question: str = Form(...)):
+async def ask_question(request: Request, question: str = Form(...)):
     """Process a question and return an answer"""
     try:
-        # Process documents in the Documents folder
-        text_chunks, images = parse_documents("Documents")
-        
-        # Query Gemini with the question and processed documents
-        answer = query_gemini(question, text_chunks, images)
-        
-        return {"answer": answer}
+        return await run_until_disconnected(request, answer_question(question), ASK_TIMEOUT)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/ask/stream")
+async def ask_question_stream(question: str = Form(...)):
+    """Process a question and stream the answer as Server-Sent Events"""
+    # StreamingResponse cancels the generator when the client disconnects
+    return StreamingResponse(
+        stream_answer(question),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+class BatchQuestions(BaseModel):
+    questions: list[str]
+
+@app.post("/ask/batch")
+async def ask_batch(batch: BatchQuestions):
+    """Answer a list of questions, streaming each answer as a line of NDJSON as soon as it is ready"""
+    if len(batch.questions) > MAX_BATCH_QUESTIONS:
+        raise HTTPException(status_code=413,
+                            detail=f"At most {MAX_BATCH_QUESTIONS} questions per batch, got {len(batch.questions)}")
+    return StreamingResponse(answer_batch(batch.questions), media_type="application/x-ndjson")
+
 if __name__ == "__main__":
     # Use PORT environment variable for deployment
     port = int(os.getenv("PORT", 8000))
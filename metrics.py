@@ -0,0 +1,213 @@
+# metrics.py
+
+import bisect
+import contextvars
+import math
+import threading
+import time
+
+# Prometheus text exposition format served by GET /metrics
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans range from a cached lookup (~1 ms) to a slow LLM call (~30 s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """A Prometheus histogram with one series per combination of label values"""
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self, *labelvalues):
+        """(count, sum) of one series, for tests and admin endpoints"""
+        with self._lock:
+            series = self._series.get(labelvalues)
+            return (series[2], series[1]) if series else (0, 0.0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self._series.items())
+        for labelvalues, (counts, total, count) in series:
+            pairs = list(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, math.inf), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(pairs + [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(pairs)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(pairs)} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    A counter or gauge read from existing state when /metrics is scraped.
+    `collect()` returns {label values tuple: value}, or a bare number for a
+    metric without labels.
+    """
+
+    def __init__(self, name, kind, help, collect, labelnames=()):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.collect = collect
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labelvalues, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(list(zip(self.labelnames, labelvalues)))} {_number(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def counter(self, name, help, collect, labelnames=()):
+        return self._add(CallbackMetric(name, "counter", help, collect, labelnames))
+
+    def gauge(self, name, help, collect, labelnames=()):
+        return self._add(CallbackMetric(name, "gauge", help, collect, labelnames))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+SPAN_SECONDS = REGISTRY.histogram(
+    "dataposit_span_seconds",
+    "Time spent in each step of answering a question (parse, retrieve, fetch, prompt_build, llm)",
+    ["span"],
+)
+
+# Spans finished during the current request as (name, seconds); None outside a request
+request_spans = contextvars.ContextVar("request_spans", default=None)
+
+
+def record(name, seconds):
+    """Count a finished span in its histogram and in the current request's Server-Timing"""
+    SPAN_SECONDS.observe(seconds, name)
+    spans = request_spans.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+class span:
+    """
+    Times a block as a named span:
+
+        with span("retrieve") as timer:
+            ...
+        timings["Retrieval"] = timer.milliseconds
+    """
+
+    __slots__ = ("name", "start", "seconds")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+        record(self.name, self.seconds)
+        return False
+
+    @property
+    def milliseconds(self):
+        return round(self.seconds * 1000, 1)
+
+
+def server_timing(spans):
+    """Server-Timing header value; repeated spans (one per parsed file, say) are summed"""
+    totals = {}
+    for name, seconds in spans:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that collects the spans of each request and sends them
+    in a Server-Timing header, where browser dev tools show the breakdown.
+    Streaming responses only include spans finished before the first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        spans = []
+        token = request_spans.set(spans)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and spans:
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(spans).encode("latin-1")))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_spans.reset(token)
@@ -0,0 +1,197 @@
+# retrieval.py
+
+import math
+import re
+from dataclasses import dataclass
+
+import numpy as np
+
+from document_parser import PAGE_BREAK, is_paged
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+WORD_RE = re.compile(r"\S+")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from how i in is it of on or
+that the this to was what when where which who why will with you your
+""".split())
+
+
+def tokenize(text):
+    """Lowercase word tokens with common stopwords removed"""
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+@dataclass(frozen=True)
+class Passage:
+    """A window of text taken from one source document; `page` is set for paged documents (PDF)"""
+    source: str
+    index: int
+    text: str
+    page: int = None
+
+
+def iter_passage_spans(text, size=120, overlap=30, paged=False):
+    """
+    Yield (page, start, end) for overlapping windows of `size` words, as
+    character offsets into `text`. `paged` text (see is_paged) is split at
+    PAGE_BREAKs: no window spans two pages and each one carries its 1-based
+    page number. Page is None for other text, whatever characters it holds.
+    """
+    if overlap >= size:
+        raise ValueError("overlap must be smaller than size")
+    step = size - overlap
+    page_start = 0
+    for page, page_text in enumerate(text.split(PAGE_BREAK) if paged else [text], start=1):
+        words = [m.span() for m in WORD_RE.finditer(page_text)]
+        for start in range(0, len(words), step):
+            end = min(start + size, len(words))
+            yield page if paged else None, page_start + words[start][0], page_start + words[end - 1][1]
+            if end == len(words):
+                break
+        page_start += len(page_text) + len(PAGE_BREAK)
+
+
+def iter_passages(text, source, size=120, overlap=30, paged=None):
+    """
+    Yield overlapping windows of `size` words as Passages.
+
+    Each passage is a slice of the original text so formatting is preserved.
+    Paged text is split page by page: no passage spans two pages and each
+    one carries its 1-based page number. `paged` defaults to what the
+    source's file type says (see is_paged).
+    """
+    if paged is None:
+        paged = is_paged(source)
+    for index, (page, start, end) in enumerate(iter_passage_spans(text, size, overlap, paged)):
+        yield Passage(source, index, text[start:end], page)
+
+
+def split_passages(text, source, size=120, overlap=30, paged=None):
+    """Split text into overlapping windows of `size` words (see iter_passages)"""
+    return list(iter_passages(text, source, size, overlap, paged))
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed list of passages.
+
+    Postings are stored CSR-style in three flat arrays: the postings of term t
+    are doc_ids[offsets[t]:offsets[t + 1]] with the matching precomputed BM25
+    contributions in weights[...]. A query is one slice-and-add per term.
+    """
+
+    def __init__(self, passages, k1=1.5, b=0.75, tokens=None):
+        """`tokens` optionally gives each passage's tokenize() output, so callers can reuse them"""
+        self.passages = list(passages)
+        self.k1 = k1
+        self.b = b
+
+        term_ids = {}
+        postings = []  # per term: {passage id: term frequency}
+        lengths = np.zeros(len(self.passages), dtype=np.float32)
+        if tokens is None:
+            tokens = (tokenize(passage.text) for passage in self.passages)
+
+        for pid, tokens in enumerate(tokens):
+            lengths[pid] = len(tokens)
+            for token in tokens:
+                tid = term_ids.get(token)
+                if tid is None:
+                    tid = term_ids[token] = len(postings)
+                    postings.append({})
+                counts = postings[tid]
+                counts[pid] = counts.get(pid, 0) + 1
+
+        self.term_ids = term_ids
+        n = len(self.passages)
+        avgdl = float(lengths.mean()) if n else 0.0
+
+        sizes = np.fromiter((len(p) for p in postings), dtype=np.int64, count=len(postings))
+        self.offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=self.offsets[1:])
+        self.doc_ids = np.empty(int(self.offsets[-1]), dtype=np.int32)
+        self.weights = np.empty(int(self.offsets[-1]), dtype=np.float32)
+
+        for tid, counts in enumerate(postings):
+            lo, hi = self.offsets[tid], self.offsets[tid + 1]
+            ids = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+            tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            df = len(counts)
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            norm = k1 * (1.0 - b + b * lengths[ids] / avgdl) if avgdl else k1
+            self.doc_ids[lo:hi] = ids
+            self.weights[lo:hi] = idf * tf * (k1 + 1.0) / (tf + norm)
+
+    @classmethod
+    def from_arrays(cls, passages, term_ids, offsets, doc_ids, weights, k1=1.5, b=0.75):
+        """An index over prebuilt postings (see corpus_snapshot), without re-tokenizing anything"""
+        index = cls.__new__(cls)
+        index.passages = passages
+        index.k1 = k1
+        index.b = b
+        index.term_ids = term_ids
+        index.offsets = offsets
+        index.doc_ids = doc_ids
+        index.weights = weights
+        return index
+
+    def __len__(self):
+        return len(self.passages)
+
+    def scores(self, query):
+        """Return the BM25 score of every passage for the query"""
+        scores = np.zeros(len(self.passages), dtype=np.float32)
+        seen = set()
+        for token in tokenize(query):
+            tid = self.term_ids.get(token)
+            if tid is None or tid in seen:
+                continue
+            seen.add(tid)
+            lo, hi = self.offsets[tid], self.offsets[tid + 1]
+            # doc ids are unique within one postings list, so fancy += is safe
+            scores[self.doc_ids[lo:hi]] += self.weights[lo:hi]
+        return scores
+
+    def scores_many(self, queries):
+        """
+        BM25 scores of every passage for each query, as a (queries, passages)
+        matrix built with one scatter-add over the postings of all queries
+        """
+        rows = []
+        segments = []
+        for row, query in enumerate(queries):
+            for tid in dict.fromkeys(self.term_ids.get(token) for token in tokenize(query)):
+                if tid is not None:
+                    rows.append(row)
+                    segments.append((self.offsets[tid], self.offsets[tid + 1]))
+        n = len(self.passages)
+        if not segments:
+            return np.zeros((len(queries), n), dtype=np.float32)
+        lengths = np.array([hi - lo for lo, hi in segments], dtype=np.int64)
+        doc_ids = np.concatenate([self.doc_ids[lo:hi] for lo, hi in segments])
+        weights = np.concatenate([self.weights[lo:hi] for lo, hi in segments])
+        cells = np.repeat(np.array(rows, dtype=np.int64) * n, lengths) + doc_ids
+        scores = np.bincount(cells, weights=weights, minlength=len(queries) * n)
+        return scores.astype(np.float32).reshape(len(queries), n)
+
+    def search_ids(self, query, k=5):
+        """Return up to k (passage id, score) pairs with a positive score, best first"""
+        return top_k(self.scores(query), k)
+
+    def search(self, query, k=5):
+        """Return up to k (passage, score) pairs with a positive score, best first"""
+        return [(self.passages[i], s) for i, s in self.search_ids(query, k)]
+
+
+def top_k(scores, k):
+    """Return [(index, score)] for the k highest positive scores, best first"""
+    if k <= 0 or len(scores) == 0:
+        return []
+    if k < len(scores):
+        candidates = np.argpartition(scores, -k)[-k:]
+    else:
+        candidates = np.arange(len(scores))
+    candidates = candidates[scores[candidates] > 0]
+    order = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return [(int(i), float(scores[i])) for i in order]
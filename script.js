@@ -220,38 +220,87 @@ function setupScript() {
         // Show thinking indicator
         showThinking();
 
+        let answerText = null;
         try {
-            const response = await fetch("http://127.0.0.1:8000/ask/", {
+            const formData = new FormData();
+            formData.append("question", message);
+            const response = await fetch("http://127.0.0.1:8000/ask/stream", {
                 method: "POST",
-                headers: { "Content-Type": "application/json" },
-                body: JSON.stringify({ question: message })
+                body: formData
             });
-            const data = await response.json();
+            if (!response.ok || !response.body) {
+                throw new Error(`Request failed with status ${response.status}`);
+            }
 
-            // Remove thinking indicator
+            // Remove thinking indicator and render the answer as it streams in
             const thinking = document.getElementById("thinking-indicator");
             if (thinking) thinking.remove();
-            
-            // Display AI response with source information
-            let aiResponse = data.answer || data.content || "No answer returned.";
-            
+            window.addMessageToUI("", "ai");
+            const answerElements = messagesContainer.querySelectorAll(".message-container.ai .message-text");
+            answerText = answerElements[answerElements.length - 1];
+
+            let aiResponse = "";
+            let source = "";
+            let sources = [];
+            await readEventStream(response, (event, data) => {
+                if (event === "token") {
+                    aiResponse += data.text;
+                    answerText.innerHTML = `<p>${formatMessage(aiResponse)}</p>`;
+                    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+                } else if (event === "done") {
+                    aiResponse = data.answer || aiResponse || "No answer returned.";
+                    source = data.source || "";
+                    sources = data.sources || [];
+                } else if (event === "error") {
+                    throw new Error(data.detail);
+                }
+            });
+
             // Add source information to the response
-            if (data.source) {
-                aiResponse = `**Source:** ${data.source}\n\n**Answer:**\n${aiResponse}`;
+            if (source) {
+                const details = sources.length > 0 ? ` (${sources.join(", ")})` : "";
+                aiResponse = `**Source:** ${source}${details}\n\n**Answer:**\n${aiResponse}`;
             }
-            
-            window.addMessageToUI(aiResponse, "ai");
+            answerText.innerHTML = `<p>${formatMessage(aiResponse)}</p>`;
             window.saveMessage(aiResponse, "ai");
         } catch (err) {
             console.error("API error:", err);
             const thinking = document.getElementById("thinking-indicator");
             if (thinking) thinking.remove();
             const fallback = "Sorry, something went wrong.";
-            window.addMessageToUI(fallback, "ai");
+            if (answerText) {
+                answerText.innerHTML = `<p>${formatMessage(fallback)}</p>`;
+            } else {
+                window.addMessageToUI(fallback, "ai");
+            }
             window.saveMessage(fallback, "ai");
         }
     }
 
+    // Read a text/event-stream response and call onEvent(event, data) per message
+    async function readEventStream(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+                const message = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let event = "message";
+                let data = "";
+                message.split("\n").forEach((line) => {
+                    if (line.startsWith("event:")) event = line.slice(6).trim();
+                    else if (line.startsWith("data:")) data += line.slice(5).trim();
+                });
+                if (data) onEvent(event, JSON.parse(data));
+            }
+        }
+    }
+
     // UI Helpers
     window.addMessageToUI = (content, sender, files = []) => {
         const messageContainer = document.createElement("div");
@@ -0,0 +1,106 @@
+# single_flight.py
+
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class _Flight:
+    """A call in progress: the asyncio task doing the work and how many callers await it"""
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls. While a call for a key is running,
+    later callers with the same key wait for its result (or its exception)
+    instead of repeating the work. Nothing is cached: once the call
+    finishes, the next caller starts a new one.
+
+    do() is for blocking callables running on threads, do_async() for
+    coroutine functions on an event loop. In do_async() a caller that is
+    cancelled (say, its client disconnected) leaves the shared call running
+    for the others; the call is only cancelled when nobody awaits it anymore.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0  # calls that did the work
+        self.collapsed = 0  # calls that shared the result of one already in flight
+        self._futures = {}  # key -> Future of the running blocking call
+        self._flights = {}  # (event loop, key) -> _Flight
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        """Return func(*args, **kwargs), sharing the result with identical calls in flight"""
+        with self._lock:
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = self._futures[key] = Future()
+                self.calls += 1
+            else:
+                self.collapsed += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key)
+            future.set_exception(e)
+            raise
+        self._finish(key)
+        future.set_result(result)
+        return result
+
+    def _finish(self, key):
+        with self._lock:
+            del self._futures[key]
+
+    async def do_async(self, key, func, *args, **kwargs):
+        """Return await func(*args, **kwargs), sharing the result with identical calls in flight"""
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        with self._lock:
+            flight = self._flights.get(flight_key)
+            if flight is None:
+                flight = self._flights[flight_key] = _Flight(loop.create_task(func(*args, **kwargs)))
+                flight.task.add_done_callback(lambda task: self._land(flight_key, flight, task))
+                self.calls += 1
+            else:
+                self.collapsed += 1
+            flight.waiters += 1
+        try:
+            # shield: cancelling one caller must not cancel the call the others await
+            return await asyncio.shield(flight.task)
+        finally:
+            with self._lock:
+                flight.waiters -= 1
+                if flight.waiters == 0 and not flight.task.done():
+                    # Forget the flight at once: a caller arriving before the task has
+                    # wound down starts a new call rather than joining a cancelled one
+                    if self._flights.get(flight_key) is flight:
+                        del self._flights[flight_key]
+                    flight.task.cancel()
+
+    def _land(self, flight_key, flight, task):
+        if not task.cancelled():
+            # Mark a failure as retrieved: every caller may be gone already
+            task.exception()
+        with self._lock:
+            if self._flights.get(flight_key) is flight:
+                del self._flights[flight_key]
+
+    def stats(self):
+        with self._lock:
+            total = self.calls + self.collapsed
+            return {
+                "calls": self.calls,
+                "collapsed": self.collapsed,
+                "collapse_rate": self.collapsed / total if total else 0.0,
+                "in_flight": len(self._futures) + len(self._flights),
+            }
@@ -0,0 +1,231 @@
+# static_assets.py
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from starlette.responses import Response
+
+# Files the frontend needs; nothing else in the repository is ever served
+FRONTEND_ASSETS = ("index.html", "styles.css", "script.js", "auth.js", "api.js")
+
+# Content-hashed URLs never change content, so browsers may keep them for a year
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Plain URLs are revalidated on every use, which costs a 304 when nothing changed
+REVALIDATE = "no-cache"
+
+# Smaller bodies gain nothing from compression once headers are counted
+MIN_COMPRESS_SIZE = 512
+BROTLI_QUALITY = 11
+
+# Starlette adds "; charset=utf-8" to text types
+CONTENT_TYPES = {".html": "text/html", ".css": "text/css", ".js": "text/javascript"}
+
+
+def _brotli():
+    """The brotli module when it is installed; without it only gzip variants are made"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def hashed_name(name, digest):
+    """styles.css -> styles.<first 10 hex digits of the digest>.css"""
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{digest[:10]}{ext}"
+
+
+def accepted_encodings(header):
+    """Content codings the client accepts (q > 0), from an Accept-Encoding header"""
+    accepted = set()
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class Asset:
+    """One asset in memory: its body, precompressed variants and strong ETag per variant"""
+
+    __slots__ = ("name", "content_type", "digest", "bodies", "etags")
+
+    def __init__(self, name, content_type, body, brotli=None):
+        self.name = name
+        self.content_type = content_type
+        self.digest = hashlib.sha256(body).hexdigest()
+        self.bodies = {"identity": body}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            # mtime=0 keeps the gzip bytes, and so the ETag, identical across restarts
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.bodies["gzip"] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+                if len(compressed) < len(body):
+                    self.bodies["br"] = compressed
+        # Each encoding is a different representation, so it gets its own strong validator
+        self.etags = {encoding: f'"{self.digest[:16]}{"" if encoding == "identity" else "-" + encoding}"'
+                      for encoding in self.bodies}
+
+    @property
+    def hashed_name(self):
+        return hashed_name(self.name, self.digest)
+
+    def encoding_for(self, accept_encoding):
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in self.bodies and encoding in accepted:
+                return encoding
+        return "identity"
+
+
+class AssetStore:
+    """
+    Serves a fixed set of frontend files from memory.
+
+    Files are read once, with gzip (and brotli, when installed) variants
+    compressed up front, so a page load does no disk reads or compression.
+    Every asset is reachable at its plain name, revalidated on each use, and
+    at a content-hashed name under /assets/ that is cached as immutable.
+    References between assets in index.html are rewritten to the hashed
+    names, so only the page itself is ever revalidated. Conditional requests
+    whose If-None-Match lists the current ETag get a 304 without a body.
+
+    With `reload`, files are re-read when their mtime or size changes, for
+    editing the frontend while the server runs.
+    """
+
+    def __init__(self, root=".", names=FRONTEND_ASSETS, page="index.html", reload=False):
+        self.root = root
+        self.names = tuple(names)
+        self.page = page
+        self.reload = reload
+        self.hits = 0
+        self.not_modified = 0
+        self._served = ({}, {})  # (plain name -> Asset, hashed name -> Asset), swapped as one
+        self._signature = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _stat_signature(self):
+        signature = []
+        for name in self.names:
+            try:
+                stat = os.stat(os.path.join(self.root, name))
+            except OSError:
+                signature.append((name, None))
+            else:
+                signature.append((name, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def _load(self):
+        signature = self._stat_signature()
+        brotli = _brotli()
+        bodies = {}
+        for name in self.names:
+            try:
+                with open(os.path.join(self.root, name), "rb") as f:
+                    bodies[name] = f.read()
+            except OSError:
+                continue
+        assets = {name: Asset(name, self._content_type(name), body, brotli)
+                  for name, body in bodies.items() if name != self.page}
+        if self.page in bodies:
+            assets[self.page] = Asset(self.page, self._content_type(self.page),
+                                      self._link_hashed(bodies[self.page], assets), brotli)
+        self._served = (assets, {asset.hashed_name: asset for asset in assets.values()})
+        self._signature = signature
+
+    def _content_type(self, name):
+        ext = os.path.splitext(name)[1]
+        return CONTENT_TYPES.get(ext) or mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+    def _link_hashed(self, page, assets):
+        """Point quoted references to other assets ("styles.css", 'auth.js') at their hashed URLs"""
+        if not assets:
+            return page
+        pattern = re.compile(rb"""(["'])(%s)\1""" % b"|".join(re.escape(name.encode()) for name in assets))
+        return pattern.sub(lambda m: m.group(1) + self.url(assets[m.group(2).decode()]).encode() + m.group(1),
+                           page)
+
+    def _current(self):
+        if self.reload:
+            with self._lock:
+                if self._stat_signature() != self._signature:
+                    self._load()
+        return self._served
+
+    @staticmethod
+    def url(asset):
+        return f"/assets/{asset.hashed_name}"
+
+    def url_for(self, name):
+        """The content-hashed URL of an asset"""
+        return self.url(self._current()[0][name])
+
+    def response(self, name, request):
+        """The asset at its plain name, revalidated on each use"""
+        asset = self._current()[0].get(name)
+        if asset is None:
+            return Response(status_code=404)
+        return self._respond(asset, request, REVALIDATE)
+
+    def hashed_response(self, filename, request):
+        """The asset at its content-hashed name, cached as immutable; 404 for any other name"""
+        asset = self._current()[1].get(filename)
+        if asset is None:
+            return Response(status_code=404)
+        return self._respond(asset, request, IMMUTABLE)
+
+    def _respond(self, asset, request, cache_control):
+        self.hits += 1
+        encoding = asset.encoding_for(request.headers.get("accept-encoding"))
+        headers = {
+            "ETag": asset.etags[encoding],
+            "Cache-Control": cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if self._matches(request.headers.get("if-none-match"), asset):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(asset.bodies[encoding], media_type=asset.content_type, headers=headers)
+
+    @staticmethod
+    def _matches(if_none_match, asset):
+        """If-None-Match uses weak comparison, and any variant of the current content counts"""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return not tags.isdisjoint(asset.etags.values())
+
+    def stats(self):
+        assets, _ = self._current()
+        return {
+            "assets": {
+                name: {
+                    "url": self.url(asset),
+                    "bytes": {encoding: len(body) for encoding, body in asset.bodies.items()},
+                }
+                for name, asset in assets.items()
+            },
+            "brotli": _brotli() is not None,
+            "hits": self.hits,
+            "not_modified": self.not_modified,
+        }
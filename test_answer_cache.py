@@ -0,0 +1,78 @@
+from answer_cache import AnswerCache, context_fingerprint, context_passages, normalize_question
+
+
+def test_exact_hit_after_normalization():
+    cache = AnswerCache()
+    fingerprint = context_fingerprint(["passage"])
+    cache.put("What is Business Central?", fingerprint, "An ERP.", latency=2.0)
+    assert cache.get("  what is business   central ", fingerprint) == "An ERP."
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 0
+    assert stats["latency_saved_seconds"] == 2.0
+
+
+def test_context_change_misses():
+    cache = AnswerCache()
+    cache.put("What is Business Central?", context_fingerprint(["old"]), "An ERP.")
+    assert cache.get("What is Business Central?", context_fingerprint(["new"])) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_stale_lookup_ignores_context():
+    cache = AnswerCache()
+    cache.put("What is Business Central?", context_fingerprint(["old"]), "An ERP.")
+    assert cache.get_stale("what is business central") == "An ERP."
+    assert cache.get_stale("What is a ledger?") is None
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    cache = AnswerCache(max_entries=2, ttl=10)
+    cache.put("a", "fp", "A")
+    cache.put("b", "fp", "B")
+    assert cache.get("a", "fp") == "A"
+    cache.put("c", "fp", "C")
+    assert cache.get("b", "fp") is None
+
+    now = [1000.0]
+    monkeypatch.setattr("answer_cache.time.time", lambda: now[0])
+    cache.put("d", "fp", "D")
+    now[0] += 11
+    assert cache.get("d", "fp") is None
+
+
+def test_near_duplicate_lookup():
+    cache = AnswerCache(similarity_threshold=0.6)
+    cache.put("Who is the functional responsible for delivery note header", "fp", "Linda")
+    assert cache.get("functional responsible for the delivery note header?", "fp") == "Linda"
+    assert cache.get("functional responsible for the delivery note header?", "other") is None
+    assert cache.stats()["near_duplicate_hits"] == 1
+
+
+def test_reworded_question_with_overlapping_passages_reuses_the_answer(tmp_path):
+    db_path = str(tmp_path / "answers.db")
+    cache = AnswerCache(similarity_threshold=0.6, db_path=db_path)
+    asked = ["Delivery note header fields", "Reason codes per country", "Posting setup"]
+    cache.put("Who is the functional responsible for delivery note header", context_fingerprint(asked), "Linda",
+              passages=context_passages(asked))
+
+    # The rewording ranks one different passage in: another fingerprint, mostly the same context
+    reworded = ["Delivery note header fields", "Reason codes per country", "Warehouse bins"]
+    question = "functional responsible for the delivery note header?"
+    assert cache.get(question, context_fingerprint(reworded), context_passages(reworded)) == "Linda"
+    assert AnswerCache(similarity_threshold=0.6, db_path=db_path).get(
+        question, context_fingerprint(reworded), context_passages(reworded)) == "Linda"
+
+    # A context with too little in common is a miss, however close the wording
+    unrelated = ["Delivery note header fields", "Currency exchange rates", "Warehouse bins", "Vendor ledger"]
+    assert cache.get(question, context_fingerprint(unrelated), context_passages(unrelated)) is None
+
+
+def test_sqlite_backing_survives_restart(tmp_path):
+    db_path = str(tmp_path / "answers.db")
+    AnswerCache(db_path=db_path).put("What is BC?", "fp", "An ERP.")
+    assert AnswerCache(db_path=db_path).get("what is bc", "fp") == "An ERP."
+
+
+def test_normalize_question():
+    assert normalize_question("  What's  BC?? ") == "what s bc"
@@ -0,0 +1,66 @@
+import asyncio
+
+from answer_pipeline import AnswerPipeline, Stage, StageResult
+
+
+async def run_inline(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+class FakeStage(Stage):
+    def __init__(self, name, confident, delay=0.0, budget=None, error=None):
+        super().__init__(budget)
+        self.name = name
+        self.confident = confident
+        self.delay = delay
+        self.error = error
+        self.started = False
+        self.finished = False
+
+    async def run(self, question, run_blocking):
+        self.started = True
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        self.finished = True
+        return StageResult(confident=self.confident, context=[self.name])
+
+
+def run(tiers):
+    return asyncio.run(AnswerPipeline(tiers, run_inline).run("question"))
+
+
+def test_first_confident_stage_in_priority_order_wins_and_cancels_the_rest():
+    documents = FakeStage("Document", True, delay=0.01)
+    business_central = FakeStage("Business Central", True, delay=1.0)
+    gemini = FakeStage("Gemini", True)
+    outcome = run([[documents, business_central], [gemini]])
+
+    assert outcome.source == "Document"
+    assert business_central.started and not business_central.finished
+    assert not gemini.started
+    assert set(outcome.timings) == {"Document"}
+
+
+def test_falls_through_tiers_on_low_confidence_errors_and_budget():
+    documents = FakeStage("Document", False)
+    business_central = FakeStage("Business Central", True, delay=1.0, budget=0.01)
+    trusted = FakeStage("Trusted Sources", True, error=RuntimeError("boom"))
+    gemini = FakeStage("Gemini", True)
+    outcome = run([[documents, business_central], [trusted], [gemini]])
+
+    assert outcome.source == "Gemini"
+    assert set(outcome.timings) == {"Document", "Business Central", "Trusted Sources", "Gemini"}
+    assert outcome.timings["Business Central"] < 500
+
+
+def test_stages_in_a_tier_run_concurrently():
+    slow = [FakeStage(f"s{i}", i == 2, delay=0.1) for i in range(3)]
+    outcome = run([slow])
+    assert outcome.source == "s2"
+    assert sum(outcome.timings.values()) > 250
+    assert max(outcome.timings.values()) < 250
+
+
+def test_no_confident_stage_returns_none():
+    assert run([[FakeStage("Document", False)]]) is None
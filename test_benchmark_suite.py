@@ -0,0 +1,30 @@
+import json
+
+from benchmarks import import_time, suite
+
+
+def test_summarize_reports_percentiles_and_item_rate():
+    stats = suite.summarize([0.004, 0.001, 0.002, 0.003, 0.010], items=4)
+    assert stats["rounds"] == 5
+    assert stats["min"] == 0.001 and stats["max"] == 0.010
+    assert stats["median"] == 0.003 and stats["p99"] == 0.010
+    assert stats["items_per_second"] == 4 / 0.003
+
+
+def test_run_writes_json_and_compare_flags_regressions(tmp_path):
+    output = tmp_path / "base.json"
+    report = suite.run(["topic_routing"], min_time=0.01, min_rounds=2, output=str(output))
+    saved = json.loads(output.read_text())
+    assert list(saved["benchmarks"]) == ["topic_routing"] == list(report["benchmarks"])
+    assert saved["benchmarks"]["topic_routing"]["group"] == "retrieve"
+
+    slower = json.loads(output.read_text())
+    slower["benchmarks"]["topic_routing"]["median"] *= 1.5
+    assert suite.compare(saved, slower, threshold=0.1) == ["topic_routing"]
+    assert suite.compare(saved, saved, threshold=0.1) == []
+
+
+def test_main_imports_without_the_gemini_key_or_heavy_sdks():
+    milliseconds, modules, loaded = import_time.profile("main")
+    assert milliseconds == modules["main"][1] / 1000 > 0
+    assert [name for name in import_time.LAZY_MODULES if name in loaded] == []
@@ -0,0 +1,60 @@
+from context_packer import (ContextPacker, MinHasher, PromptMetrics, _shingles, compress_passage,
+                            estimate_tokens)
+
+DELIVERY = ("The functional responsible for the delivery note header is Linda Luttah. "
+            "The developer responsible is Tonny Rotich.")
+REASON = "Reason code and reason field are mandatory on the sales credit memo page."
+FILLER = "Posting groups decide which general ledger accounts are used. "
+
+
+def test_minhash_estimates_jaccard_similarity():
+    minhash = MinHasher()
+    original = minhash.signature(DELIVERY)
+    edited = DELIVERY.replace("Tonny", "Tony")
+    exact = len(_shingles(DELIVERY) & _shingles(edited)) / len(_shingles(DELIVERY) | _shingles(edited))
+    assert abs(MinHasher.similarity(original, minhash.signature(edited)) - exact) < 0.15
+    assert MinHasher.similarity(original, minhash.signature(REASON)) < 0.2
+
+
+def test_compression_keeps_question_sentences_and_label():
+    text = "[memo.docx]\n" + FILLER * 10 + REASON
+    compressed = compress_passage("is the reason code mandatory", text, 40)
+    assert compressed.startswith("[memo.docx]\n")
+    assert REASON in compressed
+    assert estimate_tokens(compressed) <= 40
+
+
+def test_packs_best_chunks_into_budget_without_duplicates():
+    packer = ContextPacker(budget=120, max_chunk_tokens=60, min_chunk_tokens=20)
+    chunks = [
+        "[delivery.docx]\n" + DELIVERY,
+        "[delivery copy.docx]\n" + DELIVERY,
+        "[memo.docx]\n" + FILLER * 10 + REASON,
+        "[posting.docx]\n" + FILLER * 30,
+    ]
+    packed = packer.pack("reason code mandatory", chunks)
+    assert packed.duplicates == 1
+    assert packed.compressed >= 1
+    assert packed.tokens <= 120
+    assert packed.chunks[0] == chunks[0]
+    assert any(REASON in chunk for chunk in packed.chunks)
+    assert packed.tokens == estimate_tokens("reason code mandatory") + sum(map(estimate_tokens, packed.chunks))
+
+
+def test_scores_decide_packing_order():
+    packer = ContextPacker(budget=40, min_chunk_tokens=100)
+    packed = packer.pack("q", ["[a]\n" + DELIVERY, "[b]\n" + REASON], scores=[0.1, 0.9])
+    assert packed.chunks == ["[b]\n" + REASON]
+    assert packed.skipped == 1
+
+
+def test_prompt_metrics_summarise_tokens_and_latency():
+    metrics = PromptMetrics()
+    packer = ContextPacker()
+    for n, latency in ((1, 0.5), (3, 0.7), (6, 1.0)):
+        metrics.record(packer.pack("q", ["[a]\n" + FILLER * n]), latency)
+    stats = metrics.stats()
+    assert stats["requests"] == 3 and stats["window"] == 3
+    assert stats["prompt_tokens_max"] > stats["prompt_tokens_p50"]
+    assert stats["latency_p50_ms"] == 700.0
+    assert stats["latency_ms_per_1k_tokens"] > 0
@@ -0,0 +1,108 @@
+import os
+
+import numpy as np
+import pytest
+
+import corpus_store
+from corpus_snapshot import CorpusSnapshot, PassageView, SnapshotError, write_snapshot
+from corpus_store import CorpusDocument, CorpusStore
+from document_parser import PAGE_BREAK
+from knowledge_base import KnowledgeBase
+
+LEARN_URL = "https://learn.microsoft.com/en-us/dynamics365/business-central/warehouse-setup-warehouse"
+FILES = {
+    "delivery.txt": "The functional responsible for the delivery note header is Linda. " * 40,
+    "reason.txt": "Reason code and reason field are mandatory for GPL Uganda – «ünïcode» kept intact.",
+}
+
+
+def make_knowledge_base(tmp_path, files=FILES):
+    docs = tmp_path / "Documents"
+    docs.mkdir(parents=True)
+    for name, text in files.items():
+        (docs / name).write_text(text, encoding="utf-8")
+    corpus = CorpusStore(str(docs), cache_dir=str(tmp_path / "corpus"), refresh_interval=0, parse_workers=1)
+    return KnowledgeBase(corpus, embedding_cache_dir=str(tmp_path / "embeddings"), auto_refresh=False)
+
+
+def build(tmp_path):
+    kb = make_knowledge_base(tmp_path / "build")
+    learn_text = f"Set up warehouse bins.{PAGE_BREAK}Put-away and picking in zones."
+    kb.set_external_documents("learn", [CorpusDocument(LEARN_URL, 0.0, len(learn_text), "sha-learn", learn_text,
+                                                              paged=True)])
+    path = str(tmp_path / "corpus.snapshot")
+    write_snapshot(kb, path)
+    return kb, path
+
+
+def test_snapshot_round_trips_passages_postings_and_vectors(tmp_path):
+    kb, path = build(tmp_path)
+    snapshot = CorpusSnapshot(path)
+    built = kb.snapshot.index
+
+    assert len(snapshot.passages) == len(built) > 3
+    assert list(snapshot.passages) == built.passages
+    assert [p.page for p in snapshot.passages if p.source == LEARN_URL] == [1, 2]
+    assert not hasattr(snapshot.passages[0], "__dict__")
+    assert snapshot.passages[-1] == built.passages[-1]
+    assert list(snapshot.passages[1:3]) == built.passages[1:3]
+    np.testing.assert_array_equal(snapshot.vectors, kb.snapshot.vectors)
+    for query in ["delivery note header", "reason code Uganda", "warehouse picking"]:
+        assert snapshot.index.search_ids(query, 3) == built.search_ids(query, 3)
+    assert snapshot.external_documents()["learn"][0].path == LEARN_URL
+    assert {os.path.basename(d.path) for d in snapshot.corpus_documents()} == set(FILES)
+
+
+def test_server_adopts_a_current_snapshot_without_parsing(tmp_path, monkeypatch):
+    kb, path = build(tmp_path)
+    snapshot = CorpusSnapshot(path)
+
+    def no_parsing(*args, **kwargs):
+        raise AssertionError("the snapshot should make parsing unnecessary")
+
+    monkeypatch.setattr(corpus_store, "parse_file", no_parsing)
+    corpus = CorpusStore(str(tmp_path / "build" / "Documents"), cache_dir=str(tmp_path / "server"),
+                         refresh_interval=0, parse_workers=1)
+    corpus.load_documents(snapshot.corpus_documents())
+    corpus.refresh(force=True)
+    server = KnowledgeBase(corpus, embedding_cache_dir=str(tmp_path / "server-embeddings"), auto_refresh=False)
+
+    assert server.load_corpus_snapshot(snapshot)
+    assert server.snapshot.index is snapshot.index
+    assert server.refresh() is server.snapshot
+    assert [(p.source, p.text) for p, _ in server.search("delivery note header", k=2)] == \
+        [(p.source, p.text) for p, _ in kb.search("delivery note header", k=2)]
+
+
+def test_stale_snapshot_only_reindexes_changed_documents(tmp_path):
+    _, path = build(tmp_path)
+    docs = tmp_path / "build" / "Documents"
+    (docs / "reason.txt").write_text("Reason codes now live on the posting setup page.", encoding="utf-8")
+    corpus = CorpusStore(str(docs), cache_dir=str(tmp_path / "server"), refresh_interval=0, parse_workers=1)
+    snapshot = CorpusSnapshot(path)
+    corpus.load_documents(snapshot.corpus_documents())
+    corpus.refresh(force=True)
+    server = KnowledgeBase(corpus, embedding_cache_dir=str(tmp_path / "server-embeddings"), auto_refresh=False)
+
+    assert not server.load_corpus_snapshot(snapshot)
+    server.refresh()
+    [(passage, _)] = server.search("posting setup page", k=1)
+    assert passage.source.endswith("reason.txt") and "posting setup" in passage.text
+    # Unchanged documents keep their passages from the snapshot
+    passages = server.snapshot.index.passages
+    assert all(isinstance(p, PassageView) for p in passages if p.source.endswith("delivery.txt"))
+    assert sum(p.source == LEARN_URL for p in passages) == 2
+
+
+def test_rejects_files_that_are_not_current_snapshots(tmp_path):
+    _, path = build(tmp_path)
+    with open(path, "r+b") as f:
+        f.seek(8)
+        f.write((99).to_bytes(4, "little"))
+    with pytest.raises(SnapshotError, match="format version 99"):
+        CorpusSnapshot(path)
+
+    other = tmp_path / "notes.txt"
+    other.write_text("not a snapshot")
+    with pytest.raises(SnapshotError):
+        CorpusSnapshot(str(other))
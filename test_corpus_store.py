@@ -0,0 +1,78 @@
+import os
+import time
+
+import corpus_store
+from corpus_store import CorpusStore
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_parses_once_and_serves_from_cache(tmp_path, monkeypatch):
+    docs = tmp_path / "Documents"
+    docs.mkdir()
+    write(docs / "a.txt", "alpha")
+    write(docs / "b.txt", "beta")
+
+    calls = []
+    real_parse = corpus_store.parse_file
+    monkeypatch.setattr(corpus_store, "parse_file",
+                        lambda path, **kwargs: calls.append(path) or real_parse(path, **kwargs))
+
+    store = CorpusStore(str(docs), cache_dir=str(tmp_path / "cache"), refresh_interval=0, parse_workers=1)
+    assert store.get_documents()[0] == ["alpha", "beta"]
+    assert len(calls) == 2
+
+    store.get_documents()
+    assert len(calls) == 2
+
+    # A new store over the same cache directory does not re-parse either
+    store = CorpusStore(str(docs), cache_dir=str(tmp_path / "cache"), refresh_interval=0, parse_workers=1)
+    assert store.get_documents()[0] == ["alpha", "beta"]
+    assert len(calls) == 2
+
+
+def test_picks_up_added_changed_and_deleted_files(tmp_path):
+    docs = tmp_path / "Documents"
+    docs.mkdir()
+    write(docs / "a.txt", "alpha")
+    write(docs / "b.txt", "beta")
+
+    store = CorpusStore(str(docs), cache_dir=str(tmp_path / "cache"), refresh_interval=0)
+    store.refresh()
+    generation = store.generation
+
+    write(docs / "c.txt", "gamma")
+    write(docs / "a.txt", "alpha two")
+    os.utime(docs / "a.txt", (time.time() + 10, time.time() + 10))
+    os.remove(docs / "b.txt")
+
+    assert store.get_documents()[0] == ["alpha two", "gamma"]
+    assert store.generation == generation + 1
+
+
+def test_touch_without_content_change_keeps_generation(tmp_path):
+    docs = tmp_path / "Documents"
+    docs.mkdir()
+    write(docs / "a.txt", "alpha")
+
+    store = CorpusStore(str(docs), cache_dir=str(tmp_path / "cache"), refresh_interval=0)
+    store.refresh()
+    generation = store.generation
+
+    os.utime(docs / "a.txt", (time.time() + 10, time.time() + 10))
+    assert store.refresh() is False
+    assert store.generation == generation
+
+
+def test_parses_new_files_in_parallel(tmp_path):
+    docs = tmp_path / "Documents"
+    docs.mkdir()
+    for i in range(5):
+        write(docs / f"{i}.txt", f"text {i}")
+    write(docs / "skip.doc", "legacy")
+
+    store = CorpusStore(str(docs), cache_dir=str(tmp_path / "cache"), refresh_interval=0, parse_workers=2)
+    assert store.get_documents()[0] == [f"text {i}" for i in range(5)]
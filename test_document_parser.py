@@ -0,0 +1,124 @@
+import os
+from xml.etree import ElementTree
+
+import pytest
+
+import document_parser
+from benchmarks.synthetic import write_pdf
+from document_parser import PAGE_BREAK, iter_pdf_pages, parse_file, parse_pdf
+
+
+def test_extracts_pdf_pages_separated_by_page_breaks(tmp_path):
+    path = tmp_path / "manual.pdf"
+    write_pdf(str(path), [["Posting setup"], [], ["Reason codes are mandatory"]])
+    assert list(iter_pdf_pages(str(path))) == [(1, "Posting setup"), (2, ""), (3, "Reason codes are mandatory")]
+    assert list(iter_pdf_pages(str(path), start=3)) == [(3, "Reason codes are mandatory")]
+    assert parse_file(str(path)) == PAGE_BREAK.join(["Posting setup", "", "Reason codes are mandatory"])
+
+
+def test_pdf_without_text_layer_yields_no_text(tmp_path):
+    path = tmp_path / "scan.pdf"
+    write_pdf(str(path), [[], []])
+    assert parse_file(str(path)) == ""
+
+
+def test_pdf_extraction_resumes_after_the_last_checkpointed_page(tmp_path, monkeypatch):
+    path = tmp_path / "manual.pdf"
+    write_pdf(str(path), [[f"page {n}"] for n in range(1, 6)])
+    checkpoints = tmp_path / "pages"
+
+    real_iter = document_parser.iter_pdf_pages
+
+    def crash_after_two(path, start=1, **kwargs):
+        for number, text in real_iter(path, start, **kwargs):
+            if number == 3:
+                raise RuntimeError("worker killed")
+            yield number, text
+
+    monkeypatch.setattr(document_parser, "iter_pdf_pages", crash_after_two)
+    with pytest.raises(RuntimeError):
+        parse_pdf(str(path), str(checkpoints))
+
+    starts = []
+
+    def recording(path, start=1, **kwargs):
+        starts.append(start)
+        return real_iter(path, start, **kwargs)
+
+    monkeypatch.setattr(document_parser, "iter_pdf_pages", recording)
+    assert parse_pdf(str(path), str(checkpoints)) == PAGE_BREAK.join(f"page {n}" for n in range(1, 6))
+    assert starts == [3]
+    # A completed extraction leaves no checkpoint behind
+    assert os.listdir(checkpoints) == []
+
+
+def test_checkpoint_of_a_changed_file_is_discarded(tmp_path):
+    path = tmp_path / "manual.pdf"
+    checkpoints = tmp_path / "pages"
+    write_pdf(str(path), [["old"]])
+    checkpoint = document_parser.PageCheckpoint(str(checkpoints), str(path))
+    checkpoint.load()
+    checkpoint.add(1, "old")
+    checkpoint.close(completed=False)
+
+    write_pdf(str(path), [["new text"], ["more"]])
+    os.utime(path, ns=(1, 1))
+    assert parse_pdf(str(path), str(checkpoints)) == "new text" + PAGE_BREAK + "more"
+
+
+def make_docx(path):
+    import docx
+
+    doc = docx.Document()
+    doc.add_paragraph("Before the table")
+    table = doc.add_table(rows=3, cols=3)
+    table.cell(0, 0).text = "Field"
+    table.cell(0, 1).merge(table.cell(0, 2)).text = "Value spanning two columns"
+    table.cell(1, 0).merge(table.cell(2, 0)).text = "Merged down"
+    table.cell(1, 1).text = "b1"
+    table.cell(2, 2).text = "c2"
+    doc.add_paragraph("After the table")
+    doc.sections[0].header.paragraphs[0].text = "Company header"
+    doc.sections[0].footer.paragraphs[0].text = "Page footer"
+    doc.save(path)
+
+
+def test_docx_xml_keeps_document_order_and_drops_merged_duplicates(tmp_path):
+    path = str(tmp_path / "ticket.docx")
+    make_docx(path)
+    assert document_parser.parse_docx_xml(path).splitlines() == [
+        "Before the table",
+        "Field | Value spanning two columns",
+        "Merged down | b1",
+        "c2",
+        "After the table",
+        "Company header",
+        "Page footer",
+    ]
+    # python-docx repeats merged cells once per grid column they cover
+    assert document_parser.parse_docx_python(path).count("Merged down") == 2
+
+
+def test_docx_tabs_are_text_only_inside_runs(tmp_path):
+    import docx
+    from docx.shared import Inches
+
+    path = str(tmp_path / "codes.docx")
+    doc = docx.Document()
+    paragraph = doc.add_paragraph()
+    paragraph.paragraph_format.tab_stops.add_tab_stop(Inches(1))
+    paragraph.paragraph_format.tab_stops.add_tab_stop(Inches(2))
+    paragraph.add_run("Code\tDescription")
+    doc.save(path)
+    assert document_parser.parse_docx_xml(path) == "Code\tDescription"
+
+
+def test_docx_falls_back_to_python_docx(tmp_path, monkeypatch):
+    path = str(tmp_path / "ticket.docx")
+    make_docx(path)
+
+    def broken(path, images=None):
+        raise ElementTree.ParseError("not well-formed")
+
+    monkeypatch.setattr(document_parser, "parse_docx_xml", broken)
+    assert document_parser.parse_docx(path) == document_parser.parse_docx_python(path)
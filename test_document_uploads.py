@@ -0,0 +1,124 @@
+import asyncio
+import io
+import os
+import threading
+
+import pytest
+
+from corpus_store import CorpusStore
+from document_uploads import UPLOAD_CHUNK_SIZE, DocumentUploads, UploadRejected
+from knowledge_base import KnowledgeBase
+
+
+def make_uploads(tmp_path, **kwargs):
+    docs = tmp_path / "Documents"
+    docs.mkdir()
+    (docs / "delivery.txt").write_text("Delivery note header belongs to Linda.", encoding="utf-8")
+    corpus = CorpusStore(str(docs), cache_dir=str(tmp_path / "corpus"), refresh_interval=0, parse_workers=1)
+    corpus.refresh(force=True)
+    kb = KnowledgeBase(corpus, embedding_cache_dir=str(tmp_path / "embeddings"), auto_refresh=False)
+    return corpus, kb, DocumentUploads(corpus, kb, staging_dir=str(tmp_path / "staging"), **kwargs)
+
+
+def upload(uploads, filename, data):
+    stream = io.BytesIO(data)
+    reads = []
+
+    async def read(size):
+        reads.append(size)
+        return stream.read(size)
+
+    staged, sha256, size = asyncio.run(uploads.receive(filename, read))
+    return uploads.submit(filename, staged, sha256, size), reads
+
+
+def test_upload_is_streamed_in_chunks_then_parsed_and_indexed(tmp_path):
+    corpus, kb, uploads = make_uploads(tmp_path)
+    data = b"Warehouse bins and put-away. " * (UPLOAD_CHUNK_SIZE // 10)
+    job, reads = upload(uploads, "warehouse.txt", data)
+    assert job.status in ("queued", "parsing", "indexing", "done")
+    assert len(reads) > 2 and set(reads) == {UPLOAD_CHUNK_SIZE}
+
+    uploads.join()
+    job = uploads.get(job.id)
+    assert job.status == "done", job.error
+    assert job.size == len(data) and set(job.timings) == {"parsing", "indexing"}
+    assert kb.search("warehouse put-away", k=1)[0][0].source.endswith("warehouse.txt")
+    assert os.listdir(tmp_path / "staging") == []
+
+
+def test_identical_content_is_not_processed_twice(tmp_path):
+    corpus, kb, uploads = make_uploads(tmp_path)
+    job, _ = upload(uploads, "copy of delivery.txt", b"Delivery note header belongs to Linda.")
+    assert job.status == "duplicate" and job.duplicate_of == "delivery.txt"
+
+    first, _ = upload(uploads, "a.txt", b"same text")
+    second, _ = upload(uploads, "b.txt", b"same text")
+    uploads.join()
+    assert uploads.get(first.id).status == "done"
+    assert second.status == "duplicate" and second.duplicate_of == "a.txt"
+    assert not os.path.exists(tmp_path / "Documents" / "b.txt")
+
+
+def test_different_content_under_an_existing_name_is_refused(tmp_path):
+    corpus, kb, uploads = make_uploads(tmp_path)
+    with pytest.raises(UploadRejected) as error:
+        upload(uploads, "delivery.txt", b"Someone else's delivery notes.")
+    assert error.value.status_code == 409
+    assert (tmp_path / "Documents" / "delivery.txt").read_text(encoding="utf-8") == \
+        "Delivery note header belongs to Linda."
+
+    upload(uploads, "manual.txt", b"first manual")
+    with pytest.raises(UploadRejected) as error:
+        upload(uploads, "manual.txt", b"second manual")
+    assert error.value.status_code == 409
+    uploads.join()
+    assert (tmp_path / "Documents" / "manual.txt").read_bytes() == b"first manual"
+    assert os.listdir(tmp_path / "staging") == []
+
+
+def test_upload_without_text_leaves_nothing_behind(tmp_path):
+    corpus, kb, uploads = make_uploads(tmp_path)
+    job, _ = upload(uploads, "scan.html", b"<html><body></body></html>")
+    uploads.join()
+    assert uploads.get(job.id).status == "failed"
+    assert not os.path.exists(tmp_path / "Documents" / "scan.html")
+    assert corpus.find_by_hash(job.sha256) is None
+
+    # The same bytes are not a "duplicate" and the name is free again
+    retry, _ = upload(uploads, "scan.html", b"<html><body></body></html>")
+    assert retry.status != "duplicate"
+    uploads.join()
+    job, _ = upload(uploads, "scan.html", b"<p>Scanned delivery notes, now with text.</p>")
+    uploads.join()
+    assert uploads.get(job.id).status == "done"
+
+
+def test_rejects_unsupported_oversized_and_overflowing_uploads(tmp_path):
+    corpus, kb, uploads = make_uploads(tmp_path, max_queued=1, max_bytes=100)
+    with pytest.raises(UploadRejected) as error:
+        upload(uploads, "setup.exe", b"MZ")
+    assert error.value.status_code == 415
+    with pytest.raises(UploadRejected) as error:
+        upload(uploads, "big.txt", b"x" * 101)
+    assert error.value.status_code == 413
+
+    release = threading.Event()
+    parsing = threading.Event()
+    real_refresh = corpus.refresh
+
+    def slow_refresh(*args):
+        parsing.set()
+        release.wait(5)
+        return real_refresh(*args)
+
+    corpus.refresh = slow_refresh
+    upload(uploads, "one.txt", b"one")
+    assert parsing.wait(5)
+    upload(uploads, "two.txt", b"two")
+    with pytest.raises(UploadRejected) as error:
+        upload(uploads, "three.txt", b"three")
+    assert error.value.status_code == 503
+    release.set()
+    uploads.join()
+    assert len(os.listdir(tmp_path / "staging")) == 0
@@ -0,0 +1,64 @@
+import time
+
+from corpus_store import CorpusStore
+from document_watcher import DocumentWatcher
+from knowledge_base import KnowledgeBase
+
+
+def make_watcher(tmp_path, **kwargs):
+    docs = tmp_path / "Documents"
+    docs.mkdir()
+    (docs / "delivery.txt").write_text("Delivery note header belongs to Linda.", encoding="utf-8")
+    corpus = CorpusStore(str(docs), cache_dir=str(tmp_path / "corpus"), refresh_interval=0, parse_workers=1)
+    kb = KnowledgeBase(corpus, embedding_cache_dir=str(tmp_path / "embeddings"), auto_refresh=False)
+    return docs, kb, DocumentWatcher(corpus, kb, use_watchdog=False, **kwargs)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_polling_watcher_reindexes_a_burst_of_changes_once(tmp_path):
+    docs, kb, watcher = make_watcher(tmp_path, debounce=0.3, poll_interval=0.05)
+    watcher.start()
+    try:
+        assert watcher.mode == "polling"
+        assert watcher.stats()["files"] == 1
+        before = watcher.ingest_count
+
+        for i in range(5):
+            (docs / f"warehouse{i}.txt").write_text(f"Warehouse bin {i} put-away.", encoding="utf-8")
+            time.sleep(0.05)
+        wait_for(lambda: watcher.ingest_count > before)
+        time.sleep(0.5)
+
+        stats = watcher.stats()
+        assert watcher.ingest_count == before + 1
+        assert stats["files"] == 6
+        assert stats["last_ingest_files"] == 5 and stats["pending_changes"] == 0
+        assert kb.search("warehouse put-away", k=1)[0][0].source.endswith(".txt")
+
+        (docs / "delivery.txt").unlink()
+        wait_for(lambda: watcher.ingest_count == before + 2)
+        assert watcher.stats()["files"] == 5
+        assert all("delivery" not in p.source for p in kb.snapshot.index.passages)
+    finally:
+        watcher.stop()
+
+
+def test_searches_keep_their_snapshot_until_refresh_swaps_it(tmp_path):
+    docs, kb, watcher = make_watcher(tmp_path)
+    watcher.ingest()
+    old = kb.snapshot
+
+    (docs / "warehouse.txt").write_text("Warehouse bins and put-away.", encoding="utf-8")
+    # Without a refresh, searches see the old snapshot only
+    assert all(p.source.endswith("delivery.txt") for p, _ in kb.search("warehouse", k=5))
+
+    watcher.ingest([str(docs / "warehouse.txt")])
+    assert kb.snapshot.generation == old.generation + 1
+    assert len(old.index) == len(old.vectors) == 1
+    assert len(kb.snapshot.index) == len(kb.snapshot.vectors) == 2
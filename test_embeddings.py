@@ -0,0 +1,44 @@
+import numpy as np
+
+from embeddings import EmbeddingIndex, HashingEmbedder
+from retrieval import Passage
+
+
+def passages(source, *texts):
+    return [Passage(source, i, text) for i, text in enumerate(texts)]
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(dim=64)
+    first = embedder.embed(["delivery note header", ""])
+    second = HashingEmbedder(dim=64).embed(["delivery note header", ""])
+    assert first.dtype == np.float32
+    assert np.array_equal(first, second)
+    assert np.isclose(np.linalg.norm(first[0]), 1.0)
+    assert not first[1].any()
+
+
+def test_index_is_memory_mapped_and_reembeds_only_changed_files(tmp_path):
+    a = passages("a.txt", "inventory items and stock", "item card registration")
+    b = passages("b.txt", "delivery note header functional responsible")
+
+    index = EmbeddingIndex(str(tmp_path), HashingEmbedder(dim=64))
+    assert index.sync([("sha-a", a), ("sha-b", b)]) == 3
+    assert isinstance(index.matrix, np.memmap)
+
+    # Reloading from disk needs no embedding at all
+    index = EmbeddingIndex(str(tmp_path), HashingEmbedder(dim=64))
+    assert len(index) == 3
+    assert index.sync([("sha-a", a), ("sha-b", b)]) == 0
+
+    b2 = passages("b.txt", "reason code mandatory")
+    assert index.sync([("sha-a", a), ("sha-b2", b2)]) == 1
+    assert index.search("reason code", k=1)[0][0] == 2
+
+
+def test_changing_the_backend_discards_cached_rows(tmp_path):
+    a = passages("a.txt", "inventory")
+    EmbeddingIndex(str(tmp_path), HashingEmbedder(dim=64)).sync([("sha-a", a)])
+    index = EmbeddingIndex(str(tmp_path), HashingEmbedder(dim=32))
+    assert len(index) == 0
+    assert index.sync([("sha-a", a)]) == 1
@@ -0,0 +1,126 @@
+import io
+import pickle
+import sys
+
+import pytest
+from PIL import Image
+
+from benchmarks.synthetic import write_pdf
+from corpus_snapshot import CorpusSnapshot, write_snapshot
+from corpus_store import CorpusStore
+from document_parser import parse_file
+from image_store import ImageStore
+from knowledge_base import KnowledgeBase
+from llm_utils import build_input_parts
+
+BEFORE = "The vendor ledger lists every posted invoice and payment for the vendor. " * 30
+CAPTION = "Screenshot of the delivery note header with the reason code field."
+AFTER = "Currency exchange rates are maintained per journal and dimension. " * 30
+
+
+def png(width, height):
+    buffer = io.BytesIO()
+    Image.effect_noise((width, height), 80).convert("RGB").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def write_docx_with_picture(path, picture):
+    import docx
+
+    doc = docx.Document()
+    doc.add_paragraph(BEFORE)
+    doc.add_picture(io.BytesIO(picture))
+    doc.add_paragraph(CAPTION)
+    doc.add_paragraph(AFTER)
+    doc.save(path)
+
+
+def test_pictures_are_extracted_where_they_sit_in_the_text(tmp_path):
+    picture = png(300, 200)
+    write_docx_with_picture(str(tmp_path / "manual.docx"), picture)
+    images = []
+    text = parse_file(str(tmp_path / "manual.docx"), images=images)
+    assert images == [(None, text.index(CAPTION), picture)]
+
+    write_pdf(str(tmp_path / "scan.pdf"), [["page one"], ["page two"]], image_bytes=64 * 64)
+    images = []
+    parse_file(str(tmp_path / "scan.pdf"), images=images)
+    assert [(page, offset) for page, offset, _ in images] == [(1, None), (2, None)]
+    assert Image.open(io.BytesIO(images[0][2])).size == (64, 64)
+
+
+def test_images_are_downscaled_once_under_the_size_cap(tmp_path, monkeypatch):
+    store = ImageStore(str(tmp_path / "images"), max_side=512, max_bytes=40 * 1024)
+    picture = png(2000, 1500)
+    key = store.add(picture)
+    with open(store.path(key), "rb") as f:
+        encoded = f.read()
+    image = Image.open(io.BytesIO(encoded))
+    assert image.format == "JPEG" and max(image.size) <= 512
+    assert len(encoded) <= 40 * 1024
+    assert store.part(key) == {"mime_type": "image/jpeg", "data": encoded}
+
+    # Content-addressed: the same picture in another document is not decoded again
+    monkeypatch.setattr(store, "encode", lambda data: pytest.fail("re-encoded a stored image"))
+    assert store.add(picture) == key
+    monkeypatch.undo()
+    assert pickle.loads(pickle.dumps(store)).add(picture) == key
+
+    assert store.add(png(16, 16)) is None  # icons and bullets are skipped
+    assert store.add(b"not an image") is None
+
+
+def test_pictures_go_to_the_prompt_only_with_their_passage(tmp_path):
+    docs = tmp_path / "Documents"
+    docs.mkdir()
+    write_docx_with_picture(str(docs / "manual.docx"), png(600, 400))
+    store = ImageStore(str(tmp_path / "images"))
+    corpus = CorpusStore(str(docs), cache_dir=str(tmp_path / "corpus"), refresh_interval=0, parse_workers=1,
+                         image_store=store)
+    kb = KnowledgeBase(corpus, embedding_cache_dir=str(tmp_path / "embeddings"), auto_refresh=False)
+
+    [key] = kb.passage_images(kb.search("delivery note header reason code screenshot", k=1))
+    assert store.part(key)["data"][:2] == b"\xff\xd8"
+    assert kb.passage_images(kb.search("currency exchange rates journal dimension", k=1)) == []
+    assert build_input_parts("Where is it?", ["context"], [store.part(key)]) == \
+        [{"text": "context"}, store.part(key), {"text": "Where is it?"}]
+
+    # The picture list is cached with the text, and travels in the corpus snapshot
+    cached = CorpusStore(str(docs), cache_dir=str(tmp_path / "corpus"), refresh_interval=0, image_store=store)
+    assert cached.documents()[0].images == corpus.documents()[0].images
+    write_snapshot(kb, str(tmp_path / "corpus.snapshot"))
+    snapshot = CorpusSnapshot(str(tmp_path / "corpus.snapshot"))
+    server = KnowledgeBase(cached, embedding_cache_dir=str(tmp_path / "server"), auto_refresh=False)
+    assert server.load_corpus_snapshot(snapshot)
+    assert server.passage_images(server.search("delivery note header reason code screenshot", k=1)) == [key]
+
+    # Pictures come from the index version the results were found in, even once it is replaced
+    results = kb.search("delivery note header reason code screenshot", k=1)
+    (docs / "manual.docx").unlink()
+    kb.refresh()
+    assert kb.passage_images(kb.search("delivery note header reason code screenshot", k=1)) == []
+    assert kb.passage_images(results) == [key]
+
+
+def test_pictures_that_cannot_be_stored_never_cost_the_text(tmp_path, monkeypatch):
+    docs = tmp_path / "Documents"
+    docs.mkdir()
+    write_docx_with_picture(str(docs / "manual.docx"), png(600, 400))
+    store = ImageStore(str(tmp_path / "images"))
+
+    # Pillow missing from the deploy: import fails inside encode()
+    monkeypatch.setitem(sys.modules, "PIL", None)
+    corpus = CorpusStore(str(docs), cache_dir=str(tmp_path / "corpus"), refresh_interval=0, parse_workers=1,
+                         image_store=store)
+    [document] = corpus.documents()
+    assert CAPTION in document.text and document.images == ()
+    monkeypatch.undo()
+
+    # Any other failure storing one picture skips just that picture
+    def broken(data):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store, "encode", broken)
+    images = store.collector()
+    text = parse_file(str(docs / "manual.docx"), images=images)
+    assert CAPTION in text and images == []
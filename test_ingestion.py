@@ -0,0 +1,71 @@
+import time
+
+import ingestion
+from document_parser import parse_file
+from ingestion import ingest
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_yields_every_file_once(tmp_path):
+    paths = []
+    for i in range(6):
+        path = tmp_path / f"{i}.txt"
+        write(path, f"text {i}")
+        paths.append(str(path))
+
+    results = {r.path: r for r in ingest(paths, max_workers=3)}
+    assert sorted(results) == sorted(paths)
+    assert all(results[p].text == f"text {i}" and results[p].error is None for i, p in enumerate(paths))
+    assert all(r.size == 6 for r in results.values())
+
+
+def test_one_bad_file_does_not_stop_the_rest(tmp_path):
+    good = tmp_path / "good.txt"
+    write(good, "fine")
+    bad = tmp_path / "bad.html"
+    write(bad, "<p>x</p>")
+
+    def parse(path, **kwargs):
+        if path.endswith(".html"):
+            raise ValueError("broken markup")
+        return parse_file(path, **kwargs)
+
+    # Workers are forked after the patch, so they see it too
+    ingestion.parse_file, real = parse, ingestion.parse_file
+    try:
+        results = {r.path: r for r in ingest([str(bad), str(good)], max_workers=2)}
+    finally:
+        ingestion.parse_file = real
+
+    assert results[str(good)].text == "fine"
+    assert results[str(bad)].text is None
+    assert "broken markup" in results[str(bad)].error
+
+
+def test_slow_file_times_out_without_blocking_others(tmp_path):
+    paths = []
+    for name in ("slow.txt", "a.txt", "b.txt"):
+        write(tmp_path / name, name)
+        paths.append(str(tmp_path / name))
+
+    def parse(path, **kwargs):
+        if path.endswith("slow.txt"):
+            time.sleep(30)
+        return parse_file(path, **kwargs)
+
+    ingestion.parse_file, real = parse, ingestion.parse_file
+    start = time.monotonic()
+    try:
+        results = {r.path: r for r in ingest(paths, max_workers=2, timeout=1.0)}
+    finally:
+        ingestion.parse_file = real
+
+    assert time.monotonic() - start < 10
+    assert "timed out" in results[paths[0]].error
+    assert results[paths[1]].text == "a.txt"
+    assert results[paths[2]].text == "b.txt"
+
@@ -1,4 +1,5 @@
-from bc_query import get_microsoft_learn_link, fetch_microsoft_learn_content
+from bc_query import fetch_microsoft_learn_content
+from trusted_sources import get_microsoft_learn_link
 
 # Test inventory link
 print("Testing inventory link...")
@@ -0,0 +1,42 @@
+from corpus_store import CorpusDocument, CorpusStore
+from knowledge_base import KnowledgeBase, format_passages
+
+
+def make_knowledge_base(tmp_path, files):
+    docs = tmp_path / "Documents"
+    docs.mkdir()
+    for name, text in files.items():
+        (docs / name).write_text(text, encoding="utf-8")
+    corpus = CorpusStore(str(docs), cache_dir=str(tmp_path / "corpus"), refresh_interval=0)
+    return KnowledgeBase(corpus, embedding_cache_dir=str(tmp_path / "embeddings"))
+
+
+def test_search_finds_local_and_external_documents(tmp_path):
+    kb = make_knowledge_base(tmp_path, {
+        "delivery.txt": "The functional responsible for the delivery note header is Linda.",
+        "reason.txt": "Reason code and reason field are mandatory for GPL Uganda.",
+    })
+    [(passage, _)] = kb.search("delivery note header", k=1)
+    assert passage.source.endswith("delivery.txt")
+
+    url = "https://learn.microsoft.com/en-us/dynamics365/business-central/warehouse-manage-warehouse"
+    kb.set_external_documents("learn", [CorpusDocument(url, 0.0, 10, "sha-warehouse",
+                                                       "Warehouse bins, picking and put-away.")])
+    results = kb.search("warehouse put-away", k=1)
+    assert results[0][0].source == url
+    assert format_passages(results)[0].startswith(f"[{url}]\n")
+
+
+def test_search_many_matches_search_question_by_question(tmp_path):
+    kb = make_knowledge_base(tmp_path, {
+        "delivery.txt": "The functional responsible for the delivery note header is Linda.",
+        "reason.txt": "Reason code and reason field are mandatory for GPL Uganda.",
+        "ledger.txt": "Vendor ledger entries list every posted invoice and payment.",
+    })
+    questions = ["delivery note header", "reason code Uganda", "posted vendor invoice", "nothing matches zzz"]
+    assert kb.search_many(questions, k=2, block=3) == [kb.search(question, k=2) for question in questions]
+
+    batch = kb.search_batch(questions + questions[:1], k=2)
+    assert list(batch.results) == questions
+    assert batch.search("reason code Uganda", k=1) == kb.search("reason code Uganda", k=1)
+    assert batch.search("Linda", k=1)[0][0].source.endswith("delivery.txt")
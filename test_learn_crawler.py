@@ -0,0 +1,84 @@
+import asyncio
+import os
+import threading
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+from learn_crawler import LearnCrawler, learn_catalog
+
+
+class FakeFetcher:
+    def __init__(self, fresh=(), failing=(), cache=None):
+        self.fresh = set(fresh)
+        self.failing = set(failing)
+        self.cache = dict(cache or {})
+        self.downloads = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def is_fresh(self, url):
+        return url in self.fresh
+
+    def fetch(self, url):
+        return f"cached text of {url}"
+
+    def cached(self, url):
+        return self.cache.get(url)
+
+    def refresh(self, url):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.downloads.append((url, time.monotonic()))
+        time.sleep(0.02)
+        with self._lock:
+            self.in_flight -= 1
+        if url in self.failing:
+            raise RuntimeError("boom")
+        return f"text of {url}"
+
+
+def test_catalog_covers_both_link_tables():
+    catalog = learn_catalog()
+    assert "https://learn.microsoft.com/en-us/dynamics365/business-central/inventory-how-manage" in catalog
+    assert "https://learn.microsoft.com/en-us/dynamics365/business-central/dev-itpro/deployment/licensing" in catalog
+    assert len(catalog) >= 25
+
+
+def test_crawl_respects_per_host_limits_and_skips_fresh_pages():
+    urls = [f"https://a.test/{i}" for i in range(6)] + ["https://b.test/1", "https://a.test/fresh"]
+    fetcher = FakeFetcher(fresh={"https://a.test/fresh"}, failing={"https://b.test/1"})
+    crawler = LearnCrawler(fetcher, urls, concurrency=8, per_host=2, host_delay=0.01)
+
+    pages = asyncio.run(crawler.crawl())
+
+    assert pages["https://a.test/fresh"] == "cached text of https://a.test/fresh"
+    assert "https://b.test/1" not in pages
+    assert len(pages) == 7
+    assert "https://a.test/fresh" not in [url for url, _ in fetcher.downloads]
+    assert fetcher.max_in_flight <= 3  # two on a.test plus one on b.test
+
+    starts = sorted(t for url, t in fetcher.downloads if url.startswith("https://a.test/"))
+    assert all(later - earlier >= 0.009 for earlier, later in zip(starts, starts[1:]))
+
+
+def test_crawled_pages_become_documents():
+    crawler = LearnCrawler(FakeFetcher(), ["https://a.test/page"])
+    asyncio.run(crawler.crawl())
+    [document] = crawler.documents()
+    assert document.path == "https://a.test/page"
+    assert document.text == "text of https://a.test/page"
+
+
+def test_failed_revalidation_keeps_pages_that_were_fetched_before():
+    urls = ["https://a.test/crawled", "https://a.test/cached", "https://a.test/never"]
+    fetcher = FakeFetcher(failing={"https://a.test/never"}, cache={"https://a.test/cached": "cached copy"})
+    crawler = LearnCrawler(fetcher, urls, host_delay=0)
+    asyncio.run(crawler.crawl())
+
+    # Learn goes down: every revalidation fails
+    fetcher.failing = set(urls)
+    pages = asyncio.run(crawler.crawl())
+    assert pages == {"https://a.test/crawled": "text of https://a.test/crawled", "https://a.test/cached": "cached copy"}
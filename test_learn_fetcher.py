@@ -0,0 +1,79 @@
+import os
+import time
+
+from learn_fetcher import LearnFetcher, extract_learn_text
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "test_fixtures", "learn")
+INVENTORY_URL = "https://learn.microsoft.com/en-us/dynamics365/business-central/inventory-how-manage"
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeSession:
+    """Replays recorded pages and honours If-None-Match like learn.microsoft.com"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+
+    def get(self, url, timeout=None, headers=None):
+        headers = headers or {}
+        self.requests.append((url, headers))
+        content, etag = self.pages[url]
+        if headers.get("If-None-Match") == etag:
+            return FakeResponse(304)
+        return FakeResponse(200, content, {"ETag": etag})
+
+
+def test_extracts_main_content_without_duplicates_or_footer():
+    text = extract_learn_text(fixture("inventory-how-manage.html"), INVENTORY_URL)
+    assert text.startswith("Title: Manage Inventory - Business Central | Microsoft Learn")
+    assert "Goods that you buy and sell are managed as inventory items." in text
+    assert text.count("Register new items") == 1
+    assert "©" not in text
+    assert text.endswith(f"Source: {INVENTORY_URL}")
+
+
+def test_falls_back_to_body_text():
+    text = extract_learn_text(fixture("no-main-element.html"), "https://example.test/bc")
+    assert "Dynamics 365 Business Central is a business management solution" in text
+    assert "console.log" not in text
+    assert "Short line" not in text
+
+
+def test_fetch_is_cached_on_disk(tmp_path):
+    session = FakeSession({INVENTORY_URL: (fixture("inventory-how-manage.html"), '"v1"')})
+    fetcher = LearnFetcher(cache_dir=str(tmp_path), ttl=3600, session=session)
+    first = fetcher.fetch(INVENTORY_URL)
+    assert fetcher.fetch(INVENTORY_URL) == first
+
+    # A new process reuses the on-disk cache without any request
+    fetcher = LearnFetcher(cache_dir=str(tmp_path), ttl=3600, session=session)
+    assert fetcher.fetch(INVENTORY_URL) == first
+    assert len(session.requests) == 1
+
+
+def test_stale_entry_is_served_then_revalidated_in_background(tmp_path):
+    session = FakeSession({INVENTORY_URL: (fixture("inventory-how-manage.html"), '"v1"')})
+    fetcher = LearnFetcher(cache_dir=str(tmp_path), ttl=0, session=session)
+    first = fetcher.fetch(INVENTORY_URL)
+
+    assert fetcher.fetch(INVENTORY_URL) == first
+    fetcher._refresh_pool.shutdown(wait=True)
+    assert session.requests[-1][1] == {"If-None-Match": '"v1"'}
+    assert fetcher._load_entry(INVENTORY_URL)["fetched"] <= time.time()
+    assert fetcher._load_entry(INVENTORY_URL)["text"] == first
@@ -0,0 +1,133 @@
+import asyncio
+
+import grpc
+import pytest
+
+from benchmarks.fake_gemini import FakeGemini
+from llm_client import CircuitBreaker, LLMClient, LLMError, LLMUnavailable, TokenBucket
+
+PARTS = [{"text": "What is a delivery note?"}]
+
+
+@pytest.fixture(scope="module")
+def server():
+    with FakeGemini(answer="A delivery note lists shipped items") as fake:
+        yield fake
+
+
+@pytest.fixture
+def fake(server):
+    server.calls = 0
+    server.max_in_flight = 0
+    server.delay = 0.0
+    server._failures.clear()
+    return server
+
+
+def client_for(fake, **kwargs):
+    kwargs.setdefault("base_delay", 0.01)
+    return LLMClient(endpoint=fake.endpoint, **kwargs)
+
+
+def test_generate_reuses_one_model_per_name(fake):
+    client = client_for(fake)
+
+    async def run():
+        answers = [await client.generate(PARTS) for _ in range(3)]
+        return answers, client.model() is client.model(), client.model("models/other") is client.model()
+
+    answers, same, other = asyncio.run(run())
+    assert answers == ["A delivery note lists shipped items"] * 3
+    assert same and not other
+    assert fake.calls == 3
+    assert fake.requests[-1].contents[0].parts[0].text == "What is a delivery note?"
+    assert fake.requests[-1].model == "models/gemini-1.5-pro-latest"
+
+
+def test_rate_limit_and_server_errors_are_retried(fake):
+    fake.fail_next(grpc.StatusCode.RESOURCE_EXHAUSTED, grpc.StatusCode.UNAVAILABLE)
+    client = client_for(fake)
+    assert asyncio.run(client.generate(PARTS)) == "A delivery note lists shipped items"
+    assert fake.calls == 3
+    assert client.stats()["retries"] == 2 and client.stats()["circuit"] == "closed"
+
+
+def test_gives_up_after_max_retries_and_never_retries_bad_requests(fake):
+    fake.fail_next(*[grpc.StatusCode.UNAVAILABLE] * 3)
+    client = client_for(fake, max_retries=2)
+    with pytest.raises(LLMError):
+        asyncio.run(client.generate(PARTS))
+    assert fake.calls == 3
+
+    fake.fail_next(grpc.StatusCode.INVALID_ARGUMENT)
+    with pytest.raises(LLMError):
+        asyncio.run(client.generate(PARTS))
+    assert fake.calls == 4
+
+
+def test_concurrent_calls_are_capped(fake):
+    fake.delay = 0.05
+    client = client_for(fake, max_concurrency=2)
+
+    async def run():
+        return await asyncio.gather(*(client.generate(PARTS) for _ in range(8)))
+
+    assert len(asyncio.run(run())) == 8
+    assert fake.max_in_flight == 2
+
+
+def test_open_circuit_fails_fast_until_a_trial_call_succeeds(fake):
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=lambda: now[0])
+    client = client_for(fake, max_retries=0, breaker=breaker)
+    fake.fail_next(grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.UNAVAILABLE)
+    for _ in range(2):
+        with pytest.raises(LLMError):
+            asyncio.run(client.generate(PARTS))
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(client.generate(PARTS))
+    assert fake.calls == 2 and client.stats()["rejected"] == 1
+
+    now[0] = 31.0
+    assert asyncio.run(client.generate(PARTS)) == "A delivery note lists shipped items"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_trial_call_reopens_the_circuit():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    now[0] = 10.0
+    assert breaker.allow()
+    assert not breaker.allow()  # one trial at a time
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.times_opened == 2
+
+
+def test_stream_is_retried_until_the_first_fragment(fake):
+    fake.fail_next(grpc.StatusCode.RESOURCE_EXHAUSTED)
+    client = client_for(fake)
+
+    async def run():
+        return [text async for text in client.stream(PARTS)]
+
+    assert "".join(asyncio.run(run())) == "A delivery note lists shipped items"
+    assert fake.calls == 2 and client.stats()["in_flight"] == 0
+
+
+def test_backoff_is_jittered_and_capped():
+    client = LLMClient(base_delay=0.5, max_delay=4.0)
+    delays = [client.backoff(attempt) for attempt in range(6) for _ in range(50)]
+    assert all(0 <= delay <= 4.0 for delay in delays)
+    assert len(set(delays)) > 1
+    assert max(client.backoff(0) for _ in range(50)) <= 0.5
+
+
+def test_token_bucket_spaces_calls_beyond_the_burst():
+    bucket = TokenBucket(rate=10, capacity=2)
+    waits = [bucket.reserve() for _ in range(4)]
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.1, abs=0.01)
+    assert waits[3] == pytest.approx(0.2, abs=0.01)
@@ -0,0 +1,217 @@
+import asyncio
+import json
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from corpus_store import CorpusStore
+from document_uploads import DocumentUploads
+from knowledge_base import KnowledgeBase
+from llm_client import LLMUnavailable
+from metrics import ServerTimingMiddleware
+
+
+@pytest.fixture(autouse=True)
+def empty_answer_cache():
+    main.answer_cache.clear()
+
+
+def test_ask_sends_retrieved_passages_to_llm(monkeypatch):
+    seen = {}
+
+    async def fake_llm(query, text_chunks, images):
+        seen["chunks"] = text_chunks
+        return "stub answer"
+
+    monkeypatch.setattr(main, "query_gemini_async", fake_llm)
+    response = TestClient(main.app).post("/ask/", data={"question": "delivery note header"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["answer"] == "stub answer"
+    assert body["source"] == "Document"
+    assert "Document" in body["timings"] and "LLM" in body["timings"]
+    assert len(seen["chunks"]) <= main.TOP_K_PASSAGES
+    assert body["prompt"]["passages"] == len(seen["chunks"])
+    assert body["prompt"]["tokens"] <= main.context_packer.budget
+    assert TestClient(main.app).get("/admin/prompts").json()["requests"] >= 1
+
+
+def test_metrics_and_server_timing_cover_the_request_spans(monkeypatch):
+    async def fake_llm(query, text_chunks, images):
+        return "stub answer"
+
+    monkeypatch.setattr(main, "query_gemini_async", fake_llm)
+    client = TestClient(ServerTimingMiddleware(main.app))
+    response = client.post("/ask/", data={"question": "delivery note header"})
+    timing = response.headers["server-timing"]
+    assert "retrieve;dur=" in timing and "prompt_build;dur=" in timing and "llm;dur=" in timing
+
+    metrics = client.get("/metrics")
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert 'dataposit_span_seconds_count{span="llm"}' in metrics.text
+    assert 'dataposit_coalesced_calls_total{flight="gemini"}' in metrics.text
+
+
+def test_ask_times_out_with_504(monkeypatch):
+    async def slow_llm(query, text_chunks, images):
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(main, "query_gemini_async", slow_llm)
+    monkeypatch.setattr(main, "ASK_TIMEOUT", 0.1)
+    response = TestClient(main.app).post("/ask/", data={"question": "delivery note header"})
+    assert response.status_code == 504
+
+
+def test_ask_stream_emits_tokens_then_sources(monkeypatch):
+    async def fake_stream(query, text_chunks, images):
+        for text in ("Linda ", "Luttah"):
+            yield text
+
+    monkeypatch.setattr(main, "stream_gemini_async", fake_stream)
+    response = TestClient(main.app).post("/ask/stream", data={"question": "delivery note header"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    names = [lines[0].removeprefix("event: ") for lines in events]
+    assert names == ["token", "token", "done"]
+    done = json.loads(events[-1][1].removeprefix("data: "))
+    assert done["answer"] == "Linda Luttah"
+    assert "DELIVERY NOTE HEADER 1.docx" in done["sources"]
+
+
+def test_repeated_question_is_served_from_cache(monkeypatch):
+    calls = []
+
+    async def fake_llm(query, text_chunks, images):
+        calls.append(query)
+        return "stub answer"
+
+    monkeypatch.setattr(main, "query_gemini_async", fake_llm)
+    client = TestClient(main.app)
+    for question in ("What is the delivery note header?", "what is the delivery note header"):
+        assert client.post("/ask/", data={"question": question}).json()["answer"] == "stub answer"
+    assert len(calls) == 1
+    assert client.get("/admin/cache").json()["hits"] == 1
+
+
+async def unavailable_llm(query, text_chunks, images):
+    raise LLMUnavailable("circuit open")
+
+
+def test_llm_failure_falls_back_to_retrieved_passages(monkeypatch):
+    monkeypatch.setattr(main, "query_gemini_async", unavailable_llm)
+    body = TestClient(main.app).post("/ask/", data={"question": "delivery note header"}).json()
+    assert body["degraded"] == "retrieval"
+    assert body["answer"].startswith(main.RETRIEVAL_ONLY_ANSWER)
+    assert "DELIVERY NOTE HEADER 1.docx" in body["answer"]
+
+
+def test_llm_failure_falls_back_to_an_earlier_answer(monkeypatch):
+    main.answer_cache.put("delivery note header", "older context", "earlier answer")
+    monkeypatch.setattr(main, "query_gemini_async", unavailable_llm)
+    body = TestClient(main.app).post("/ask/", data={"question": "Delivery note header?"}).json()
+    assert body["answer"] == "earlier answer" and body["degraded"] == "cached"
+
+
+def test_stream_falls_back_when_llm_fails_before_the_first_token(monkeypatch):
+    async def failing_stream(query, text_chunks, images):
+        raise LLMUnavailable("circuit open")
+        yield
+
+    monkeypatch.setattr(main, "stream_gemini_async", failing_stream)
+    response = TestClient(main.app).post("/ask/stream", data={"question": "delivery note header"})
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    assert [lines[0].removeprefix("event: ") for lines in events] == ["token", "done"]
+    done = json.loads(events[-1][1].removeprefix("data: "))
+    assert done["degraded"] == "retrieval"
+    assert TestClient(main.app).get("/admin/llm").json()["circuit"] == "closed"
+
+
+def test_ask_batch_streams_one_line_per_question_and_asks_duplicates_once(monkeypatch):
+    calls = []
+    in_flight = {"now": 0, "max": 0}
+
+    async def fake_llm(query, text_chunks, images):
+        calls.append(query)
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.02)
+        in_flight["now"] -= 1
+        return f"answer to {query}"
+
+    def no_single_searches(question, k=5):
+        raise AssertionError("batch retrieval should happen in one search_many pass")
+
+    monkeypatch.setattr(main, "query_gemini_async", fake_llm)
+    monkeypatch.setattr(main.knowledge_base, "search", no_single_searches)
+    monkeypatch.setattr(main, "BATCH_CONCURRENCY", 4)
+    distinct = [f"Delivery note header {n}?" for n in range(12)]
+    questions = distinct + [question.lower() for question in distinct]
+
+    response = TestClient(main.app).post("/ask/batch", json={"questions": questions})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == list(range(len(questions)))
+    for line in lines:
+        assert line["question"] == questions[line["index"]]
+        assert line["answer"] == f"answer to {distinct[line['index'] % len(distinct)]}"
+        assert line["source"] == "Document"
+    assert sorted(calls) == sorted(distinct)
+    assert 1 < in_flight["max"] <= 4
+
+    monkeypatch.setattr(main, "MAX_BATCH_QUESTIONS", 10)
+    assert TestClient(main.app).post("/ask/batch", json={"questions": questions}).status_code == 413
+
+
+def test_admin_index_reports_generation_and_files():
+    main.knowledge_base.refresh()
+    stats = TestClient(main.app).get("/admin/index").json()
+    assert stats["index_generation"] >= 1
+    assert stats["files"] == len(main.corpus)
+    assert {"last_ingest_seconds", "last_index_build_seconds", "passages"} <= set(stats)
+
+
+def test_admin_coalescing_reports_each_flight():
+    stats = TestClient(main.app).get("/admin/coalescing").json()
+    assert set(stats) == {"index_refresh", "learn_fetch", "gemini"}
+    assert {"calls", "collapsed", "collapse_rate"} <= set(stats["gemini"])
+
+
+def test_upload_document_returns_a_job_to_poll(tmp_path, monkeypatch):
+    corpus = CorpusStore(str(tmp_path / "Documents"), cache_dir=str(tmp_path / "corpus"), parse_workers=1)
+    kb = KnowledgeBase(corpus, embedding_cache_dir=str(tmp_path / "embeddings"))
+    monkeypatch.setattr(main, "document_uploads", DocumentUploads(corpus, kb, staging_dir=str(tmp_path / "staging")))
+    client = TestClient(main.app)
+
+    # Closed unless a token is configured, and then only with that token
+    monkeypatch.setattr(main, "UPLOAD_TOKEN", None)
+    assert client.post("/documents", files={"file": ("notes.txt", b"x")}).status_code == 403
+    monkeypatch.setattr(main, "UPLOAD_TOKEN", "s3cret")
+    assert client.post("/documents", files={"file": ("notes.txt", b"x")}).status_code == 401
+    assert client.post("/documents", files={"file": ("notes.txt", b"x")},
+                       headers={"X-Upload-Token": "wrong"}).status_code == 401
+    client.headers["X-Upload-Token"] = "s3cret"
+
+    response = client.post("/documents", files={"file": ("notes.txt", b"Reason codes are mandatory.")})
+    assert response.status_code == 202
+    main.document_uploads.join()
+    job = client.get(f"/documents/jobs/{response.json()['id']}").json()
+    assert job["status"] == "done" and job["filename"] == "notes.txt"
+
+    assert client.post("/documents", files={"file": ("setup.exe", b"MZ")}).status_code == 415
+    assert client.get("/documents/jobs/missing").status_code == 404
+
+
+def test_frontend_is_served_from_memory_and_the_repo_is_not():
+    client = TestClient(main.app)
+    page = client.get("/")
+    assert page.status_code == 200 and main.assets.url_for("script.js") in page.text
+    assert client.get(main.assets.url_for("auth.js")).headers["cache-control"].endswith("immutable")
+    assert client.get("/", headers={"If-None-Match": page.headers["etag"]}).status_code == 304
+    assert client.get("/static/main.py").status_code == 404
+    assert client.get("/static/.env.local").status_code == 404
@@ -0,0 +1,45 @@
+import math
+
+from metrics import Histogram, Registry, record, request_spans, server_timing, span
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("demo_seconds", "Demo", ["span"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, "parse")
+    lines = histogram.render()
+    assert lines[:2] == ["# HELP demo_seconds Demo", "# TYPE demo_seconds histogram"]
+    assert 'demo_seconds_bucket{span="parse",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{span="parse",le="1.0"} 3' in lines
+    assert 'demo_seconds_bucket{span="parse",le="+Inf"} 4' in lines
+    assert 'demo_seconds_count{span="parse"} 4' in lines
+    assert math.isclose(histogram.snapshot("parse")[1], 4.05)
+
+
+def test_callback_metrics_read_state_at_scrape_time():
+    registry = Registry()
+    hits = {"value": 1}
+    registry.counter("demo_hits_total", "Hits", lambda: hits["value"])
+    registry.gauge("demo_flights", "Flights", lambda: {("gemini",): 2, ('say "hi"',): 1}, ["flight"])
+    hits["value"] = 5
+    text = registry.render()
+    assert "# TYPE demo_hits_total counter\ndemo_hits_total 5\n" in text
+    assert 'demo_flights{flight="gemini"} 2' in text
+    assert 'demo_flights{flight="say \\"hi\\""} 1' in text
+
+
+def test_spans_reach_the_current_request_only():
+    record("retrieve", 0.5)  # outside a request: histogram only
+    spans = []
+    token = request_spans.set(spans)
+    try:
+        with span("parse") as timer:
+            pass
+        record("parse", 0.002)
+        record("llm", 1.25)
+    finally:
+        request_spans.reset(token)
+    assert [name for name, _ in spans] == ["parse", "parse", "llm"]
+    assert timer.milliseconds >= 0
+    header = server_timing([("parse", 0.001), ("parse", 0.002), ("llm", 1.25)])
+    assert header == "parse;dur=3.0, llm;dur=1250.0"
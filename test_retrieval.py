@@ -0,0 +1,49 @@
+from document_parser import PAGE_BREAK
+from retrieval import BM25Index, Passage, split_passages, tokenize
+
+
+def test_split_passages_overlap_and_preserves_text():
+    text = " ".join(f"w{i}" for i in range(24))
+    passages = split_passages(text, "doc.txt", size=10, overlap=3)
+    assert [p.text.split()[0] for p in passages] == ["w0", "w7", "w14"]
+    assert passages[-1].text.split()[-1] == "w23"
+    assert all(p.source == "doc.txt" for p in passages)
+    assert split_passages("", "empty.txt") == []
+
+
+def test_bm25_ranks_matching_passage_first():
+    passages = [
+        Passage("a", 0, "Inventory items are registered on the item card."),
+        Passage("b", 0, "The delivery note header lists the functional responsible: Linda (AVA)."),
+        Passage("c", 0, "Reason code and reason field are mandatory for GPL Uganda."),
+    ]
+    index = BM25Index(passages)
+    results = index.search("Functional Responsible for Delivery Note Header- AVA", k=2)
+    assert results[0][0].source == "b"
+    assert all(score > 0 for _, score in results)
+
+
+def test_bm25_returns_nothing_for_unknown_terms():
+    index = BM25Index([Passage("a", 0, "alpha beta")])
+    assert index.search("gamma", k=3) == []
+    assert BM25Index([]).search("alpha") == []
+
+
+def test_tokenize_drops_stopwords():
+    assert tokenize("What is the Delivery-Note?") == ["delivery", "note"]
+
+
+def test_paged_text_yields_passages_tagged_with_their_page():
+    text = PAGE_BREAK.join(["one two three", "", "four five six seven"])
+    passages = split_passages(text, "manual.pdf", size=3, overlap=1)
+    assert [(p.page, p.text) for p in passages] == [
+        (1, "one two three"), (3, "four five six"), (3, "six seven"),
+    ]
+    assert [p.index for p in passages] == [0, 1, 2]
+    assert split_passages("no pages here", "notes.txt")[0].page is None
+
+
+def test_paging_follows_the_document_type_not_its_content():
+    assert [p.page for p in split_passages("a single page", "manual.pdf")] == [1]
+    passages = split_passages(f"before{PAGE_BREAK}after", "notes.txt")
+    assert [(p.page, p.text) for p in passages] == [(None, f"before{PAGE_BREAK}after")]
@@ -0,0 +1,164 @@
+import asyncio
+import gc
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+import pytest
+
+import llm_utils
+from benchmarks.fake_gemini import FakeGemini
+from llm_client import LLMClient
+from single_flight import SingleFlight
+
+
+def test_concurrent_blocking_calls_share_one_result():
+    flight = SingleFlight("parse")
+    calls = []
+    started = threading.Event()
+
+    def parse(path):
+        calls.append(path)
+        started.set()
+        time.sleep(0.2)
+        return f"text of {path}"
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        first = pool.submit(flight.do, "a.docx", parse, "a.docx")
+        started.wait()
+        rest = [pool.submit(flight.do, "a.docx", parse, "a.docx") for _ in range(5)]
+        results = [f.result() for f in [first] + rest]
+
+    assert results == ["text of a.docx"] * 6
+    assert calls == ["a.docx"]
+    assert flight.stats() == {"calls": 1, "collapsed": 5, "collapse_rate": 5 / 6, "in_flight": 0}
+    # Nothing is cached: the next call does the work again
+    flight.do("a.docx", parse, "a.docx")
+    assert len(calls) == 2
+
+
+def test_blocking_failure_reaches_every_waiter():
+    flight = SingleFlight("fetch")
+    started = threading.Event()
+
+    def fetch():
+        started.set()
+        time.sleep(0.1)
+        raise ConnectionError("offline")
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(flight.do, "url", fetch)]
+        started.wait()
+        futures += [pool.submit(flight.do, "url", fetch) for _ in range(2)]
+        for future in futures:
+            with pytest.raises(ConnectionError):
+                future.result()
+    assert flight.calls == 1 and flight.collapsed == 2
+
+
+def test_coroutines_share_one_call_and_distinct_keys_do_not():
+    flight = SingleFlight("llm")
+    calls = []
+
+    async def answer(question):
+        calls.append(question)
+        await asyncio.sleep(0.05)
+        return question.upper()
+
+    async def run():
+        return await asyncio.gather(*(flight.do_async(q, answer, q) for q in ["a", "a", "a", "b"]))
+
+    assert asyncio.run(run()) == ["A", "A", "A", "B"]
+    assert sorted(calls) == ["a", "b"]
+    assert flight.stats()["collapsed"] == 2
+
+
+def test_cancelled_caller_leaves_the_shared_call_running():
+    flight = SingleFlight("llm")
+    finished = []
+
+    async def answer():
+        await asyncio.sleep(0.1)
+        finished.append(True)
+        return "answer"
+
+    async def run():
+        first = asyncio.ensure_future(flight.do_async("q", answer))
+        second = asyncio.ensure_future(flight.do_async("q", answer))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        result = await second
+
+        # When every caller is gone the call itself is cancelled
+        lonely = asyncio.ensure_future(flight.do_async("q", answer))
+        await asyncio.sleep(0.01)
+        lonely.cancel()
+        await asyncio.sleep(0.15)
+        return result
+
+    assert asyncio.run(run()) == "answer"
+    assert finished == [True]
+
+
+def test_caller_arriving_just_after_the_last_one_left_starts_a_new_call():
+    flight = SingleFlight("llm")
+
+    async def answer():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def run():
+        first = asyncio.ensure_future(flight.do_async("q", answer))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        # first leaves and cancels the shared task, which has not wound down yet
+        await asyncio.sleep(0)
+        return await flight.do_async("q", answer)
+
+    assert asyncio.run(run()) == "answer"
+    assert flight.stats()["calls"] == 2 and flight.stats()["in_flight"] == 0
+
+
+def test_failure_nobody_awaits_anymore_is_still_retrieved():
+    flight = SingleFlight("llm")
+    unretrieved = []
+
+    async def failing():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            # Cleanup after the cancel fails, so the call ends with an error nobody awaits
+            raise RuntimeError("could not close the Gemini stream")
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unretrieved.append(context))
+        caller = asyncio.ensure_future(flight.do_async("q", failing))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+        del caller
+        gc.collect()
+
+    asyncio.run(run())
+    assert unretrieved == []
+
+
+def test_identical_gemini_prompts_in_flight_make_one_call(monkeypatch):
+    with FakeGemini(answer="shared answer", delay=0.1) as fake:
+        monkeypatch.setattr(llm_utils, "llm", LLMClient(endpoint=fake.endpoint))
+
+        async def run():
+            return await asyncio.gather(
+                *(llm_utils.query_gemini_async("What is a bin?", ["[bins.docx]\nBins hold items"], [])
+                  for _ in range(5)),
+                llm_utils.query_gemini_async("What is a zone?", ["[bins.docx]\nBins hold items"], []),
+            )
+
+        answers = asyncio.run(run())
+    assert answers == ["shared answer"] * 6
+    assert fake.calls == 2
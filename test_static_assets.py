@@ -0,0 +1,82 @@
+import gzip
+import os
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from static_assets import IMMUTABLE, REVALIDATE, AssetStore, accepted_encodings
+
+PAGE = """<link rel="stylesheet" href="styles.css">
+<script>loadScript('app.js'); const note = "app.js is loaded above";</script>
+""" + "<p>filler</p>" * 100
+
+
+def make_client(tmp_path, **kwargs):
+    (tmp_path / "index.html").write_text(PAGE)
+    (tmp_path / "styles.css").write_text("body { color: #222; }\n" * 60)
+    (tmp_path / "app.js").write_text("console.log('hi');")
+    (tmp_path / "secret.env").write_text("GEMINI_API_KEY=abc")
+    store = AssetStore(str(tmp_path), names=("index.html", "styles.css", "app.js"), **kwargs)
+    app = FastAPI()
+
+    @app.get("/")
+    async def index(request: Request):
+        return store.response("index.html", request)
+
+    @app.get("/{name}")
+    async def plain(name: str, request: Request):
+        return store.response(name, request)
+
+    @app.get("/assets/{filename}")
+    async def hashed(filename: str, request: Request):
+        return store.hashed_response(filename, request)
+
+    return store, TestClient(app)
+
+
+def test_page_links_hashed_urls_that_are_cached_as_immutable(tmp_path):
+    store, client = make_client(tmp_path)
+    css_url, js_url = store.url_for("styles.css"), store.url_for("app.js")
+
+    page = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert page.headers["cache-control"] == REVALIDATE
+    assert f'href="{css_url}"' in page.text and f"loadScript('{js_url}')" in page.text
+    # Only exact quoted names are rewritten
+    assert '"app.js is loaded above"' in page.text
+
+    css = client.get(css_url, headers={"Accept-Encoding": "gzip, br;q=0"})
+    assert css.headers["cache-control"] == IMMUTABLE
+    assert css.headers["content-encoding"] == "gzip" and css.headers["vary"] == "Accept-Encoding"
+    assert css.text == (tmp_path / "styles.css").read_text()
+    assert int(css.headers["content-length"]) < len(css.text)
+
+    # Too small to be worth compressing
+    assert "content-encoding" not in client.get(js_url, headers={"Accept-Encoding": "gzip"}).headers
+    assert client.get("/secret.env").status_code == 404
+    assert client.get("/assets/styles.0000000000.css").status_code == 404
+
+
+def test_conditional_requests_get_304_until_the_content_changes(tmp_path):
+    store, client = make_client(tmp_path, reload=True)
+    first = client.get("/styles.css", headers={"Accept-Encoding": "gzip"})
+    etag = first.headers["etag"]
+    assert etag.startswith('"') and not etag.startswith("W/")
+
+    again = client.get("/styles.css", headers={"If-None-Match": f"W/{etag}", "Accept-Encoding": "gzip"})
+    assert again.status_code == 304 and again.content == b"" and again.headers["etag"] == etag
+    assert store.not_modified == 1
+
+    (tmp_path / "styles.css").write_text("body { color: red; }\n" * 60)
+    os.utime(tmp_path / "styles.css", ns=(0, 10**18))
+    changed = client.get("/styles.css", headers={"If-None-Match": etag, "Accept-Encoding": "gzip"})
+    assert changed.status_code == 200 and "red" in changed.text
+    assert store.url_for("styles.css") in client.get("/").text
+
+
+def test_variants_and_accept_encoding():
+    assert accepted_encodings("gzip;q=0.5, br;q=0, deflate") == {"gzip", "deflate"}
+    assert accepted_encodings(None) == set()
+    store = AssetStore(".", names=("styles.css",))
+    [asset] = store._served[0].values()
+    assert gzip.decompress(asset.bodies["gzip"]) == asset.bodies["identity"]
+    assert len(set(asset.etags.values())) == len(asset.bodies)
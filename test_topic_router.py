@@ -0,0 +1,37 @@
+from topic_router import KeywordMatcher, TfidfClassifier, TopicRouter
+
+
+def test_keywords_match_whole_words_only():
+    matcher = KeywordMatcher({"overview": ["bc"], "sales": ["sales"]})
+    assert matcher.best("what is bc?") == "overview"
+    assert matcher.best("abc def") is None
+
+
+def test_plural_and_phrase_weighting():
+    matcher = KeywordMatcher({
+        "sales": ["orders"],
+        "purchasing": ["purchase orders"],
+    })
+    assert matcher.best("open purchase orders") == "purchasing"
+    assert matcher.best("one order") == "sales"
+
+
+def test_ties_go_to_first_topic():
+    matcher = KeywordMatcher({"a": ["x"], "b": ["y"]})
+    assert matcher.best("y x") == "a"
+
+
+def test_tfidf_fallback_when_no_keyword_matches():
+    router = TopicRouter(
+        {"finance": ["ledger"], "warehouse": ["bin"]},
+        {"finance": ["fiscal year closing and budgets"], "warehouse": ["picks and put-aways"]},
+    )
+    assert router.route("where is the ledger") == ("finance", "keyword")
+    assert router.route("closing the fiscal year") == ("finance", "tfidf")
+    assert router.route("completely unrelated") == (None, None)
+
+
+def test_classifier_threshold():
+    classifier = TfidfClassifier({"a": ["apples"], "b": ["bananas"]}, min_similarity=0.5)
+    assert classifier.classify("apple")[0] == "a"
+    assert classifier.classify("cherries") == (None, 0.0)
@@ -0,0 +1,131 @@
+# topic_router.py
+
+import math
+import re
+
+from retrieval import tokenize
+
+
+def stem(token):
+    """Very light English suffix stripping so "invoices" and "invoice" share a feature"""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 5 and token.endswith("ing"):
+        return token[:-3]
+    if len(token) > 4 and token.endswith("ed"):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def features(text):
+    return [stem(token) for token in tokenize(text)]
+
+
+class KeywordMatcher:
+    """
+    All keywords of all topics compiled into one word-boundary regex.
+
+    A keyword only matches whole words ("bc" does not match inside "abc"),
+    singular and plural forms match each other, and longer phrases are tried
+    first.
+    Each keyword's weight grows with its word count, so "purchase orders"
+    outweighs "orders".
+    """
+
+    def __init__(self, keywords_by_topic):
+        self.topics = list(keywords_by_topic)
+        self._order = {topic: i for i, topic in enumerate(self.topics)}
+        self._variants = {}  # lowercase surface form -> [(topic, weight)]
+        for topic, keywords in keywords_by_topic.items():
+            for keyword in keywords:
+                keyword = keyword.lower().strip()
+                weight = 1.0 + 0.5 * (len(keyword.split()) - 1)
+                variants = {keyword, keyword + "s", keyword + "es"}
+                if keyword.endswith("s") and not keyword.endswith("ss"):
+                    variants.add(keyword[:-1])
+                for variant in variants:
+                    self._variants.setdefault(variant, []).append((topic, weight))
+
+        alternatives = sorted(self._variants, key=len, reverse=True)
+        self._pattern = re.compile(
+            r"(?<![a-z0-9])(?:" + "|".join(re.escape(v) for v in alternatives) + r")(?![a-z0-9])"
+        ) if alternatives else None
+
+    def scores(self, text):
+        """Return {topic: score} for the topics whose keywords occur in text"""
+        scores = {}
+        if self._pattern is None:
+            return scores
+        for match in self._pattern.finditer(text.lower()):
+            for topic, weight in self._variants[match.group(0)]:
+                scores[topic] = scores.get(topic, 0.0) + weight
+        return scores
+
+    def best(self, text):
+        """Highest-scoring topic, ties going to the topic defined first; None if nothing matched"""
+        scores = self.scores(text)
+        if not scores:
+            return None
+        return max(scores, key=lambda topic: (scores[topic], -self._order[topic]))
+
+
+class TfidfClassifier:
+    """
+    Nearest-centroid TF-IDF classifier over short topic descriptions.
+    Used when no keyword matches, instead of asking the LLM to pick a topic.
+    """
+
+    def __init__(self, texts_by_topic, min_similarity=0.1):
+        self.min_similarity = min_similarity
+        documents = {topic: features(" ".join(texts)) for topic, texts in texts_by_topic.items()}
+        df = {}
+        for tokens in documents.values():
+            for token in set(tokens):
+                df[token] = df.get(token, 0) + 1
+        n = len(documents)
+        self.idf = {token: math.log((1 + n) / (1 + count)) + 1.0 for token, count in df.items()}
+        self.centroids = {topic: self._vector(tokens) for topic, tokens in documents.items()}
+
+    def _vector(self, tokens):
+        counts = {}
+        for token in tokens:
+            if token in self.idf:
+                counts[token] = counts.get(token, 0) + 1
+        vector = {token: (1 + math.log(count)) * self.idf[token] for token, count in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {token: v / norm for token, v in vector.items()} if norm else {}
+
+    def classify(self, text):
+        """Return (topic, cosine similarity), or (None, 0.0) below min_similarity"""
+        query = self._vector(features(text))
+        best_topic, best_score = None, 0.0
+        for topic, centroid in self.centroids.items():
+            score = sum(weight * centroid.get(token, 0.0) for token, weight in query.items())
+            if score > best_score:
+                best_topic, best_score = topic, score
+        if best_score < self.min_similarity:
+            return None, 0.0
+        return best_topic, best_score
+
+
+class TopicRouter:
+    """Keyword matching first, then the TF-IDF classifier as the fallback"""
+
+    def __init__(self, keywords_by_topic, descriptions_by_topic=None, min_similarity=0.1):
+        self.matcher = KeywordMatcher(keywords_by_topic)
+        texts = {}
+        for topic, keywords in keywords_by_topic.items():
+            texts[topic] = [topic] + list(keywords) + list((descriptions_by_topic or {}).get(topic, []))
+        self.classifier = TfidfClassifier(texts, min_similarity)
+
+    def route(self, text):
+        """Return (topic, method) where method is "keyword", "tfidf" or None"""
+        topic = self.matcher.best(text)
+        if topic is not None:
+            return topic, "keyword"
+        topic, _ = self.classifier.classify(text)
+        if topic is not None:
+            return topic, "tfidf"
+        return None, None